@@ -1,5 +1,6 @@
 import argparse
 import json
+from typing import Optional
 
 from google.auth.credentials import Credentials
 
@@ -8,6 +9,8 @@ from quollio_core.helper.log_utils import configure_logging, error_handling_deco
 from quollio_core.profilers.bigquery import bigquery_table_lineage, bigquery_table_stats
 from quollio_core.repository import qdc
 from quollio_core.repository.bigquery import BigQueryClient, get_credentials, get_org_id
+from quollio_core.repository.fingerprint import FingerprintStore
+from quollio_core.repository.outbox import Outbox
 
 
 def initialize_credentials(credentials_json: str) -> Credentials:
@@ -30,6 +33,9 @@ def load_lineage(
     org_id: str,
     credentials: Credentials,
     qdc_client: qdc.QDCExternalAPIClient,
+    max_workers: int = 1,
+    discovery_mode: str = "search",
+    metadata_mode: str = "api",
 ) -> None:
     logger.info("Loading lineage data.")
     bigquery_table_lineage(
@@ -39,6 +45,9 @@ def load_lineage(
         regions=regions,
         credentials=credentials,
         org_id=org_id,
+        max_workers=max_workers,
+        discovery_mode=discovery_mode,
+        metadata_mode=metadata_mode,
     )
     logger.info("Lineage data loaded successfully.")
 
@@ -50,6 +59,10 @@ def load_stats(
     org_id: str,
     qdc_client: qdc.QDCExternalAPIClient,
     dataplex_stats_tables: list,
+    outbox: Optional[Outbox] = None,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    use_storage_api: bool = False,
 ) -> None:
     logger.info("Loading statistics data.")
     bigquery_table_stats(
@@ -58,6 +71,10 @@ def load_stats(
         tenant_id=tenant_id,
         org_id=org_id,
         dataplex_stats_tables=dataplex_stats_tables,
+        outbox=outbox,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        use_storage_api=use_storage_api,
     )
     logger.info("Statistics data loaded successfully.")
 
@@ -137,6 +154,79 @@ if __name__ == "__main__":
         required=False,
         help="The client secret that is created on Quollio console to let clients access Quollio External API",
     )
+    parser.add_argument(
+        "--qdc_max_workers",
+        type=int,
+        action=env_default("QDC_MAX_WORKERS"),
+        default=1,
+        required=False,
+        help="The number of threads that send requests to Quollio External API concurrently. Default value is 1",
+    )
+    parser.add_argument(
+        "--qdc_rate_limit",
+        type=float,
+        action=env_default("QDC_RATE_LIMIT"),
+        default=2.0,
+        required=False,
+        help="The maximum number of requests per second sent to Quollio External API. \
+              The rate is lowered automatically while the API responds with 429. Default value is 2.0",
+    )
+    parser.add_argument(
+        "--fingerprint_db",
+        type=str,
+        action=env_default("QUOLLIO_FINGERPRINT_DB"),
+        required=False,
+        help="The path to a local SQLite file that keeps fingerprints of the ingested lineage and stats. \
+              When it is set, assets whose payload is not changed since the last successful ingestion are skipped. \
+              Remove the file if you want to ingest all assets again.",
+    )
+    parser.add_argument(
+        "--journal_db",
+        type=str,
+        action=env_default("QUOLLIO_JOURNAL_DB"),
+        required=False,
+        help="The path to a local SQLite file that journals the payloads of `load_stats` and the assets \
+              which QDC acknowledged. Use it with `--resume` to restart a failed run where it stopped.",
+    )
+    parser.add_argument(
+        "--resume",
+        type=bool,
+        action=env_default("QUOLLIO_RESUME", store_true=True),
+        default=False,
+        required=False,
+        help="Whether to resume the last unfinished run recorded in `--journal_db` or not. \
+              A run is left unfinished when it stops or some assets fail to be ingested. Default value is False",
+    )
+    parser.add_argument(
+        "--lineage_concurrency",
+        type=int,
+        action=env_default("BIGQUERY_LINEAGE_CONCURRENCY"),
+        default=1,
+        required=False,
+        help="The number of threads that search Data Lineage API for the lineage of tables concurrently. \
+              Requests are retried with exponential backoff while the API quota is exhausted. Default value is 1",
+    )
+    parser.add_argument(
+        "--lineage_discovery_mode",
+        type=str,
+        choices=["search", "bulk"],
+        action=env_default("BIGQUERY_LINEAGE_DISCOVERY_MODE"),
+        default="search",
+        required=False,
+        help="How `load_lineage` discovers lineage. `search` searches links of every table in every region. \
+              `bulk` enumerates lineage processes, runs and events of each region once, which needs far fewer \
+              requests when most tables have no lineage. Default value is search",
+    )
+    parser.add_argument(
+        "--metadata_mode",
+        type=str,
+        choices=["api", "information_schema"],
+        action=env_default("BIGQUERY_METADATA_MODE"),
+        default="api",
+        required=False,
+        help="How `load_lineage` enumerates tables. `api` lists tables of every dataset through the REST API. \
+              `information_schema` runs one INFORMATION_SCHEMA query per region in `--regions`. Default value is api",
+    )
 
     parser.add_argument(
         "--dataplex_stats_tables",
@@ -145,24 +235,64 @@ if __name__ == "__main__":
         required=False,
         help="Comma-separated list of dataplex stats tables - <project_id>.<dataset_id>.<table_id>",
     )
+    parser.add_argument(
+        "--dataplex_stats_concurrency",
+        type=int,
+        action=env_default("DATAPLEX_STATS_CONCURRENCY"),
+        default=1,
+        required=False,
+        help="The number of BigQuery jobs that query Dataplex stats tables concurrently. Default value is 1",
+    )
+    parser.add_argument(
+        "--dataplex_stats_batch_size",
+        type=int,
+        action=env_default("DATAPLEX_STATS_BATCH_SIZE"),
+        default=1,
+        required=False,
+        help="The number of Dataplex stats tables in the same location which are UNION ALLed into one BigQuery job. \
+              The tables are queried one by one if the job fails. Default value is 1",
+    )
+    parser.add_argument(
+        "--use_storage_api",
+        type=bool,
+        action=env_default("BIGQUERY_USE_STORAGE_API", store_true=True),
+        default=False,
+        required=False,
+        help="Whether to read Dataplex stats through BigQuery Storage Read API as Arrow record batches or not. \
+              It is faster for large results and requires `quollio-core[bigquery-storage]`. Default value is False",
+    )
 
     args = parser.parse_args()
 
+    if args.resume and not args.journal_db:
+        parser.error("--journal_db is required when --resume is used")
+
     # Validate that dataplex_stats_tables is provided if load_stats is in commands
     if "load_stats" in args.commands and not args.dataplex_stats_tables:
         parser.error("--dataplex_stats_tables is required when 'load_stats' command is used")
 
     configure_logging(args.log_level)
+    fingerprint_store = FingerprintStore(args.fingerprint_db) if args.fingerprint_db else None
+    outbox = None
+    if args.journal_db and "load_stats" in args.commands:
+        outbox = Outbox(args.journal_db, command="bigquery:load_stats", resume=args.resume)
 
     credentials = initialize_credentials(args.credentials_json)
     org_id = initialize_org_id(args.credentials_json)
-    qdc_client = qdc.initialize_qdc_client(args.api_url, args.client_id, args.client_secret)
     bq_client = initialize_bq_client(credentials, args.project_id)
     if args.project_id is None:
         args.project_id = json.loads(args.credentials_json)["project_id"]
     regions = args.regions.split(",")
 
     if "load_lineage" in args.commands:
+        qdc_client = qdc.initialize_qdc_client(
+            api_url=args.api_url,
+            client_id=args.client_id,
+            client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
+        )
         load_lineage(
             tenant_id=args.tenant_id,
             project_id=args.project_id,
@@ -170,9 +300,21 @@ if __name__ == "__main__":
             org_id=org_id,
             credentials=credentials,
             qdc_client=qdc_client,
+            max_workers=args.lineage_concurrency,
+            discovery_mode=args.lineage_discovery_mode,
+            metadata_mode=args.metadata_mode,
         )
 
     if "load_stats" in args.commands:
+        qdc_client = qdc.initialize_qdc_client(
+            api_url=args.api_url,
+            client_id=args.client_id,
+            client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
+            outbox=outbox,
+        )
         tables = args.dataplex_stats_tables.split(",")
         load_stats(
             conn=bq_client,
@@ -180,4 +322,14 @@ if __name__ == "__main__":
             org_id=org_id,
             qdc_client=qdc_client,
             dataplex_stats_tables=tables,
+            outbox=outbox,
+            concurrency=args.dataplex_stats_concurrency,
+            batch_size=args.dataplex_stats_batch_size,
+            use_storage_api=args.use_storage_api,
         )
+        if outbox is not None:
+            outbox.finish()
+            outbox.close()
+
+    if fingerprint_store is not None:
+        fingerprint_store.close()
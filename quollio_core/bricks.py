@@ -14,6 +14,8 @@ from quollio_core.profilers.databricks import (
 from quollio_core.profilers.stats import get_column_stats_items
 from quollio_core.repository import databricks as db
 from quollio_core.repository import dbt, qdc
+from quollio_core.repository.fingerprint import FingerprintStore
+from quollio_core.repository.outbox import Outbox
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +75,7 @@ def load_lineage(
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
     enable_column_lineage: bool = False,
+    use_arrow: bool = False,
 ) -> None:
     logger.info("Generate Databricks table to table lineage.")
     databricks_table_level_lineage(
@@ -81,6 +84,7 @@ def load_lineage(
         qdc_client=qdc_client,
         tenant_id=tenant_id,
         dbt_table_name="quollio_lineage_table_level",
+        use_arrow=use_arrow,
     )
 
     if enable_column_lineage:
@@ -220,6 +224,49 @@ if __name__ == "__main__":
         required=False,
         help="The client secrete that is created on Quollio console to let clients access Quollio External API",
     )
+    parser.add_argument(
+        "--qdc_max_workers",
+        type=int,
+        action=env_default("QDC_MAX_WORKERS"),
+        default=1,
+        required=False,
+        help="The number of threads that send requests to Quollio External API concurrently. Default value is 1",
+    )
+    parser.add_argument(
+        "--qdc_rate_limit",
+        type=float,
+        action=env_default("QDC_RATE_LIMIT"),
+        default=2.0,
+        required=False,
+        help="The maximum number of requests per second sent to Quollio External API. \
+              The rate is lowered automatically while the API responds with 429. Default value is 2.0",
+    )
+    parser.add_argument(
+        "--fingerprint_db",
+        type=str,
+        action=env_default("QUOLLIO_FINGERPRINT_DB"),
+        required=False,
+        help="The path to a local SQLite file that keeps fingerprints of the ingested lineage and stats. \
+              When it is set, assets whose payload is not changed since the last successful ingestion are skipped. \
+              Remove the file if you want to ingest all assets again.",
+    )
+    parser.add_argument(
+        "--journal_db",
+        type=str,
+        action=env_default("QUOLLIO_JOURNAL_DB"),
+        required=False,
+        help="The path to a local SQLite file that journals the payloads of `load_stats` and the assets \
+              which QDC acknowledged. Use it with `--resume` to restart a failed run where it stopped.",
+    )
+    parser.add_argument(
+        "--resume",
+        type=bool,
+        action=env_default("QUOLLIO_RESUME", store_true=True),
+        default=False,
+        required=False,
+        help="Whether to resume the last unfinished run recorded in `--journal_db` or not. \
+              A run is left unfinished when it stops or some assets fail to be ingested. Default value is False",
+    )
     parser.add_argument(
         "--tenant_id",
         type=str,
@@ -248,6 +295,24 @@ if __name__ == "__main__":
               This is used to identify the monitoring tables created by the databricks monitoring tool. \
               Default value is _profile_metrics",
     )
+    parser.add_argument(
+        "--stats_concurrency",
+        type=int,
+        action=env_default("DATABRICKS_STATS_CONCURRENCY"),
+        default=1,
+        required=False,
+        help="The number of connections that query monitoring tables concurrently. \
+              All queries share these connections. Default value is 1",
+    )
+    parser.add_argument(
+        "--stats_batch_size",
+        type=int,
+        action=env_default("DATABRICKS_STATS_BATCH_SIZE"),
+        default=1,
+        required=False,
+        help="The number of monitoring tables aggregated in one query with UNION ALL. \
+              A larger value reduces the number of statements queued in the SQL warehouse. Default value is 1",
+    )
     parser.add_argument(
         "--enable_column_lineage",
         type=bool,
@@ -256,6 +321,15 @@ if __name__ == "__main__":
         required=False,
         help="Whether to ingest column lineage into QDIC or not. Default value is False",
     )
+    parser.add_argument(
+        "--use_arrow",
+        type=bool,
+        action=env_default("DATABRICKS_USE_ARROW", store_true=True),
+        default=False,
+        required=False,
+        help="Whether to fetch table lineage as Arrow record batches instead of a dict per row or not. \
+              It requires `quollio-core[arrow]`. Default value is False",
+    )
 
     stats_items = get_column_stats_items()
     parser.add_argument(
@@ -271,7 +345,11 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
+
+    if args.resume and not args.journal_db:
+        parser.error("--journal_db is required when --resume is used")
     set_log_level(level=args.log_level)
+    fingerprint_store = FingerprintStore(args.fingerprint_db) if args.fingerprint_db else None
 
     conn = db.DatabricksConnectionConfig(
         # MEMO: Metadata agent allows the string 'https://' as a host name but is not allowed by intelligence agent.
@@ -296,7 +374,12 @@ if __name__ == "__main__":
 
     if "load_lineage" in args.commands:
         qdc_client = qdc.QDCExternalAPIClient(
-            base_url=args.api_url, client_id=args.client_id, client_secret=args.client_secret
+            base_url=args.api_url,
+            client_id=args.client_id,
+            client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
         )
         load_lineage(
             conn=conn,
@@ -304,11 +387,21 @@ if __name__ == "__main__":
             qdc_client=qdc_client,
             tenant_id=args.tenant_id,
             enable_column_lineage=args.enable_column_lineage,
+            use_arrow=args.use_arrow,
         )
 
     if "load_stats" in args.commands:
+        outbox = (
+            Outbox(args.journal_db, command="databricks:load_stats", resume=args.resume) if args.journal_db else None
+        )
         qdc_client = qdc.QDCExternalAPIClient(
-            base_url=args.api_url, client_id=args.client_id, client_secret=args.client_secret
+            base_url=args.api_url,
+            client_id=args.client_id,
+            client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
+            outbox=outbox,
         )
         databricks_column_stats(
             conn=conn,
@@ -317,4 +410,13 @@ if __name__ == "__main__":
             tenant_id=args.tenant_id,
             stats_items=args.target_stats_items,
             monitoring_table_suffix=args.monitoring_table_suffix,
+            outbox=outbox,
+            concurrency=args.stats_concurrency,
+            batch_size=args.stats_batch_size,
         )
+        if outbox is not None:
+            outbox.finish()
+            outbox.close()
+
+    if fingerprint_store is not None:
+        fingerprint_store.close()
@@ -2,28 +2,49 @@
 {%- set identifier = model['alias'] %}
 {%- set target_relations = [] %}
 {%- set grant_config = config.get('grants') %}
+-- MEMO: Views are divided into `stats_shard_count` shard models, which dbt builds in parallel threads.
+-- A stats table is built by the first shard only, because every shard would delete the rows of the others.
+{%- set is_table_materialization = var("stats_materialization", "view") == "table" -%}
+{%- set stats_shard_count = 1 if is_table_materialization else var("stats_shard_count", 1) | int -%}
+{%- set stats_shard_index = config.get("shard_index", 0) -%}
+{%- set stats_view_prefix = config.get("stats_view_prefix", model['name']) -%}
 
 {{ run_hooks(pre_hooks, inside_transaction=False) }}
 -- `BEGIN` happens here:
 {{ run_hooks(pre_hooks, inside_transaction=True) }}
 
--- fetch target_tables
-{%- set query_stats_target_tables -%}
+-- fetch the columns of all target tables at once, and group them by table.
+{%- set query_stats_target_columns -%}
     SELECT
-      distinct
       database_name
       , schema_name
       , table_name
+      , column_name
+      , is_bool
+      , is_calculable
     FROM
       {{ ref('quollio_stats_profiling_columns') }}
     WHERE
       table_name not like 'quollio_%%'
+    ORDER BY
+      database_name
+      , schema_name
+      , table_name
+      , column_name
 {%- endset -%}
-{%- set results = run_query(query_stats_target_tables) -%}
-{%- if execute -%}
-{%- set stats_target_tables = results.rows -%}
-{%- else -%}
+{%- set results = run_query(query_stats_target_columns) -%}
 {%- set stats_target_tables = [] -%}
+{%- set stats_target_columns_by_table = {} -%}
+{%- if execute -%}
+{%- for row in results.rows -%}
+  {%- set table_key = "%s.%s.%s" | format(row[0], row[1], row[2]) -%}
+  {%- if table_key not in stats_target_columns_by_table -%}
+    {%- do stats_target_tables.append([row[0], row[1], row[2]]) -%}
+    {%- do stats_target_columns_by_table.update({table_key: []}) -%}
+  {%- endif -%}
+  {%- do stats_target_columns_by_table[table_key].append(row) -%}
+{%- endfor -%}
+{%- set stats_target_tables = stats_target_tables[stats_shard_index::stats_shard_count] if stats_shard_index < stats_shard_count else [] -%}
 {%- endif -%}
 
 -- skip creating views if the target profiling columns don't exist.
@@ -36,29 +57,99 @@
   {%- set should_revoke = should_revoke(target_relation, full_refresh_mode) %}
 {%- endif -%}
 
--- build sql
-{%- for stats_target_table in stats_target_tables -%}
-  -- get columns for statistics. 
-  -- LISTAGG function can't be used for sys table, then it's necessary to get column for each table. 
-  -- See https://docs.aws.amazon.com/redshift/latest/dg/c_join_PG.html.
-  {%- set stats_target_columns %}
-      SELECT
-        database_name
-        , schema_name
-        , table_name
-        , column_name
-        , is_bool
-        , is_calculable
-      FROM
-        {{ ref('quollio_stats_profiling_columns') }}
-      WHERE
-        database_name = '{{stats_target_table[0]}}'
-        AND schema_name = '{{stats_target_table[1]}}'
-        AND table_name = '{{stats_target_table[2]}}'
+-- prepare a physical table and the watermarks of profiled tables if stats are materialized as a table.
+{%- set stored_watermarks = {} -%}
+{%- set source_watermarks = {} -%}
+{%- if is_table_materialization and stats_target_tables | length > 0 -%}
+  {%- set stats_table_relation = api.Relation.create(identifier=identifier, schema=schema, database=database, type='table') %}
+  {%- if should_full_refresh() -%}
+    {%- do run_query("DROP TABLE IF EXISTS " ~ stats_table_relation) -%}
+  {%- endif -%}
+  {%- set create_stats_table -%}
+    CREATE TABLE IF NOT EXISTS {{ stats_table_relation }} (
+      db_name varchar(256)
+      , schema_name varchar(256)
+      , table_name varchar(256)
+      , column_name varchar(256)
+      , max_value varchar(65535)
+      , min_value varchar(65535)
+      , null_count integer
+      , cardinality bigint
+      , avg_value varchar(65535)
+      , median_value varchar(65535)
+      , mode_value varchar(65535)
+      , stddev_value integer
+      , source_watermark varchar(256)
+      , profiled_at timestamp
+    )
   {%- endset -%}
+  {%- do run_query(create_stats_table) -%}
 
-  {%- set results = run_query(stats_target_columns) -%}
-  {%- set stats_target_columns = results.rows -%}
+  {%- set query_stored_watermarks -%}
+    SELECT DISTINCT db_name, schema_name, table_name, source_watermark FROM {{ stats_table_relation }}
+  {%- endset -%}
+  {%- for row in run_query(query_stored_watermarks).rows -%}
+    {%- do stored_watermarks.update({"%s.%s.%s" | format(row[0], row[1], row[2]): row[3]}) -%}
+  {%- endfor -%}
+
+  -- MEMO: svv_table_info can't be joined with pg_table_def which runs only on the leader node.
+  {%- set query_source_watermarks -%}
+    SELECT
+      "database"
+      , "schema"
+      , "table"
+      , tbl_rows::varchar || '/' || size::varchar
+    FROM
+      svv_table_info
+    WHERE
+      "schema" NOT IN ('information_schema')
+      AND "schema" NOT LIKE 'pg_%%'
+  {%- endset -%}
+  {%- for row in run_query(query_source_watermarks).rows -%}
+    {%- do source_watermarks.update({"%s.%s.%s" | format(row[0], row[1], row[2]): row[3]}) -%}
+  {%- endfor -%}
+{%- endif -%}
+
+-- MEMO: A view stores the fingerprint of its SQL in its comment, which covers the columns and `aggregate_all`.
+-- The view is not replaced if the fingerprint is not changed since the last build.
+{%- set stored_view_fingerprints = {} -%}
+{%- set created_relations = [] -%}
+{%- if not is_table_materialization and stats_target_tables | length > 0 and not should_full_refresh() -%}
+  {%- set query_view_fingerprints -%}
+    SELECT
+      c.relname
+      , d.description
+    FROM
+      pg_class c
+    INNER JOIN
+      pg_namespace n
+    ON
+      n.oid = c.relnamespace
+    INNER JOIN
+      pg_description d
+    ON
+      d.objoid = c.oid
+      AND d.objsubid = 0
+    WHERE
+      n.nspname = '{{ schema | lower }}'
+      AND c.relkind = 'v'
+      AND c.relname LIKE '{{ stats_view_prefix | lower }}_%%'
+      AND d.description LIKE 'quollio_fingerprint:%%'
+  {%- endset -%}
+  {%- for row in run_query(query_view_fingerprints).rows -%}
+    {%- do stored_view_fingerprints.update({row[0] | lower: row[1]}) -%}
+  {%- endfor -%}
+{%- endif -%}
+
+-- MEMO: CREATE VIEW statements are sent in batches, which run in the transaction begun above.
+{%- set view_ddl_batch_size = var("view_ddl_batch_size", 100) -%}
+{%- set view_ddls = [] -%}
+{%- set pending_relations = [] -%}
+
+-- build sql
+{%- for stats_target_table in stats_target_tables -%}
+  -- MEMO: Columns are sorted by name so that the SQL and its fingerprint are the same in every build.
+  {%- set stats_target_columns = stats_target_columns_by_table["%s.%s.%s" | format(stats_target_table[0], stats_target_table[1], stats_target_table[2])] | sort(attribute="3") -%}
 
   {%- set sql_for_column_stats %}
   {%- for stats_target_column in stats_target_columns -%}
@@ -115,19 +206,86 @@
     ) mode
   {% endfor -%}
   {%- endset %}
+  {%- if is_table_materialization %}
+  -- refresh the rows of the table only if it's changed since the last build.
+  {%- set table_key = "%s.%s.%s" | format(stats_target_table[0], stats_target_table[1], stats_target_table[2]) %}
+  -- MEMO: The watermark has the fingerprint of the stats SQL, so that changed columns or settings refresh the rows too.
+  {%- set source_watermark = source_watermarks.get(table_key, "") %}
+  {%- set stats_watermark = source_watermark ~ "/" ~ local_md5(sql_for_column_stats) %}
+  {%- if source_watermark != "" and stored_watermarks.get(table_key) == stats_watermark %}
+    {{ log("Skip profiling " ~ table_key ~ " because it's not changed since the last build.", info=True) }}
+  {%- else %}
+    {%- set delete_stale_stats -%}
+      DELETE FROM {{ stats_table_relation }}
+      WHERE db_name = '{{stats_target_table[0]}}' AND schema_name = '{{stats_target_table[1]}}' AND table_name = '{{stats_target_table[2]}}'
+    {%- endset -%}
+    {%- do run_query(delete_stale_stats) -%}
+    {% call statement("main") %}
+      INSERT INTO {{ stats_table_relation }}
+      SELECT
+        stats.*
+        , '{{ stats_watermark }}'
+        , getdate()
+      FROM (
+        {{ sql_for_column_stats }}
+      ) stats
+    {% endcall %}
+  {%- endif %}
+  {%- else %}
   -- create a view with a index as suffix
-  {%- set target_identifier = "%s_%s_%s_%s"|format(model['name'], stats_target_table[0], stats_target_table[1], stats_target_table[2]) %}
+  {%- set target_identifier = "%s_%s_%s_%s"|format(stats_view_prefix, stats_target_table[0], stats_target_table[1], stats_target_table[2]) %}
   {%- set target_relation = api.Relation.create(identifier=target_identifier, schema=schema, database=database, type='view') %}
-  -- {{ drop_relation_if_exists(target_relation) }}
+  {%- set stats_view_fingerprint = "quollio_fingerprint:" ~ local_md5(sql_for_column_stats) %}
+  {%- if stored_view_fingerprints.get(target_identifier | lower) == stats_view_fingerprint %}
+    {{ log("Skip creating " ~ target_relation ~ " because its columns are not changed since the last build.", info=True) }}
+    -- MEMO: Grants are applied to skipped views too, so that changed grants in the config are reflected.
+    {%- set should_revoke = should_revoke(target_relation, should_full_refresh()) %}
+    {%- do apply_grants(target_relation, grant_config, should_revoke) %}
+    {%- do target_relations.append(target_relation) %}
+  {%- else %}
+  {%- do view_ddls.append(get_replace_view_sql(target_relation, sql_for_column_stats)) %}
+  {%- do view_ddls.append("comment on view " ~ target_relation ~ " is '" ~ stats_view_fingerprint ~ "';") %}
+  {%- do pending_relations.append(target_relation) %}
+  {%- endif %}
+  {%- if pending_relations | length >= view_ddl_batch_size or (loop.last and pending_relations | length > 0) %}
   {% call statement("main") %}
-    {{ get_replace_view_sql(target_relation, sql_for_column_stats) }}
+    {{ view_ddls | join("\n") }}
   {% endcall %}
+  {%- for pending_relation in pending_relations %}
   {%- set full_refresh_mode = (should_full_refresh()) -%}
-  {%- set should_revoke = should_revoke(target_relation, full_refresh_mode) %}
-  {%- do apply_grants(target_relation, grant_config, should_revoke) %}
-  {%- set target_relations = target_relations.append(target_relation) %}
+  {%- set should_revoke = should_revoke(pending_relation, full_refresh_mode) %}
+  {%- do apply_grants(pending_relation, grant_config, should_revoke) %}
+  {%- do target_relations.append(pending_relation) %}
+  {%- do created_relations.append(pending_relation) %}
+  {%- endfor %}
+  {%- do view_ddls.clear() %}
+  {%- do pending_relations.clear() %}
+  {%- endif %}
+  {%- endif %}
 {%- endfor -%}
 
+{%- if not is_table_materialization and stats_target_tables | length > 0 and created_relations | length == 0 %}
+  {% call statement("main") %}
+    {{ log("All views are up to date. Just execute select stmt for skipping call statement.", info=True) }}
+    select null
+  {% endcall %}
+{%- endif %}
+
+{%- if is_table_materialization and stats_target_tables | length > 0 %}
+  -- remove the rows of tables which are no longer profiled.
+  {% call statement("main") %}
+    DELETE FROM {{ stats_table_relation }}
+    WHERE db_name || '.' || schema_name || '.' || table_name NOT IN (
+    {%- for stats_target_table in stats_target_tables %}
+      {% if not loop.first %}, {% endif %}'{{ "%s.%s.%s" | format(stats_target_table[0], stats_target_table[1], stats_target_table[2]) }}'
+    {%- endfor %}
+    )
+  {% endcall %}
+  {%- set should_revoke = should_revoke(stats_table_relation, should_full_refresh()) %}
+  {%- do apply_grants(stats_table_relation, grant_config, should_revoke) %}
+  {%- set target_relations = target_relations.append(stats_table_relation) %}
+{%- endif %}
+
 {{ run_hooks(post_hooks, inside_transaction=True) }}
 {{ adapter.commit() }}
 {{ run_hooks(post_hooks, inside_transaction=False) }}
@@ -0,0 +1,8 @@
+{{
+    config(
+        materialized='divided_view',
+        shard_index=5,
+        stats_view_prefix='quollio_stats_columns'
+    )
+}}
+-- depends_on: {{ ref('quollio_stats_profiling_columns') }}
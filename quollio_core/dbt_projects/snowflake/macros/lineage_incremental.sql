@@ -0,0 +1,72 @@
+{#
+  Limits ACCESS_HISTORY to the queries after the latest query which is already merged into the incremental
+  lineage model. ACCESS_HISTORY lags behind by up to 3 hours, so the window goes back `lineage_lookback_hours`
+  from the watermark. Re-reading the overlap is harmless because rows of a downstream are replaced as a whole.
+#}
+{% macro lineage_watermark_filter(column) %}
+  {%- if is_incremental() %}
+    AND {{ column }} > (
+        SELECT
+            DATEADD(
+                hour
+                , -{{ var('lineage_lookback_hours', 3) }}
+                , COALESCE(MAX(LAST_QUERY_START_TIME), '1970-01-01'::timestamp_ltz)
+            )
+        FROM
+            {{ this }}
+    )
+  {%- endif %}
+{% endmacro %}
+
+{#
+  Removes lineage of downstream objects which were dropped after their rows were merged.
+  A full rebuild drops them by joining ACCOUNT_USAGE.TABLES, but an incremental run only touches new rows.
+#}
+{% macro delete_dropped_lineage_downstreams() %}
+  {%- if is_incremental() %}
+    DELETE FROM {{ this }}
+    WHERE DOWNSTREAM_TABLE_NAME NOT IN (
+        SELECT
+            CONCAT(TABLE_CATALOG, '.', TABLE_SCHEMA, '.', TABLE_NAME)
+        FROM
+            {{ source('account_usage', 'TABLES') }}
+        WHERE
+            DELETED IS NULL
+    )
+  {%- else %}
+    SELECT 1
+  {%- endif %}
+{% endmacro %}
+
+{#
+  Joins the rows of the previous build whose upstream set is the same, so that LAST_CHANGED_AT moves
+  only when the upstreams of a downstream change. UPSTREAM_FINGERPRINT is an order independent HASH_AGG of them.
+#}
+{% macro join_previous_lineage(alias, keys) %}
+  {%- if is_incremental() %}
+LEFT JOIN (
+    SELECT
+        {{ keys | join(', ') }}
+        , UPSTREAM_FINGERPRINT
+        , MAX(LAST_CHANGED_AT) AS LAST_CHANGED_AT
+    FROM
+        {{ this }}
+    GROUP BY
+        {{ keys | join(', ') }}
+        , UPSTREAM_FINGERPRINT
+) prev
+ON
+    {%- for key in keys %}
+    {{ alias }}.{{ key }} = prev.{{ key }} AND
+    {%- endfor %}
+    {{ alias }}.UPSTREAM_FINGERPRINT = prev.UPSTREAM_FINGERPRINT
+  {%- endif %}
+{% endmacro %}
+
+{% macro lineage_last_changed_at() %}
+  {%- if is_incremental() %}
+    , COALESCE(prev.LAST_CHANGED_AT, CURRENT_TIMESTAMP()) AS LAST_CHANGED_AT
+  {%- else %}
+    , CURRENT_TIMESTAMP() AS LAST_CHANGED_AT
+  {%- endif %}
+{% endmacro %}
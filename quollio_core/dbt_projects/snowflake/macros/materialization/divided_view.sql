@@ -2,6 +2,12 @@
 {%- set identifier = model['alias'] %}
 {%- set target_relations = [] %}
 {%- set grant_config = config.get('grants') %}
+-- MEMO: Views are divided into `stats_shard_count` shard models, which dbt builds in parallel threads.
+-- A stats table is built by the first shard only, because every shard would delete the rows of the others.
+{%- set is_table_materialization = var("stats_materialization", "view") == "table" -%}
+{%- set stats_shard_count = 1 if is_table_materialization else var("stats_shard_count", 1) | int -%}
+{%- set stats_shard_index = config.get("shard_index", 0) -%}
+{%- set stats_view_prefix = config.get("stats_view_prefix", model['name']) -%}
 
 {{ run_hooks(pre_hooks, inside_transaction=False) }}
 -- `BEGIN` happens here:
@@ -21,10 +27,14 @@
       TABLE_CATALOG
       , TABLE_SCHEMA
       , TABLE_NAME
+    ORDER BY
+      TABLE_CATALOG
+      , TABLE_SCHEMA
+      , TABLE_NAME
 {%- endset -%}
 {%- set results = run_query(query_stats_target_tables) -%}
 {%- if execute -%}
-{%- set stats_target_tables = results.rows -%}
+{%- set stats_target_tables = (results.rows | list)[stats_shard_index::stats_shard_count] if stats_shard_index < stats_shard_count else [] -%}
 {%- else -%}
 {%- set stats_target_tables = [] -%}
 {%- endif -%}
@@ -39,11 +49,128 @@
   {%- set should_revoke = should_revoke(target_relation, full_refresh_mode) %}
 {%- endif -%}
 
+-- prepare a physical table and the watermarks of profiled tables if stats are materialized as a table.
+{%- set stored_watermarks = {} -%}
+{%- set source_watermarks = {} -%}
+{%- if is_table_materialization and stats_target_tables | length > 0 -%}
+  {%- set stats_table_relation = api.Relation.create(identifier=identifier | upper, schema=schema, database=database, type='table') %}
+  {%- if should_full_refresh() -%}
+    {%- do run_query("DROP TABLE IF EXISTS " ~ stats_table_relation) -%}
+  {%- endif -%}
+  {%- set create_stats_table -%}
+    CREATE TABLE IF NOT EXISTS {{ stats_table_relation }} (
+      db_name STRING
+      , schema_name STRING
+      , table_name STRING
+      , column_name STRING
+      , max_value STRING
+      , min_value STRING
+      , null_count NUMBER
+      , cardinality NUMBER
+      , avg_value FLOAT
+      , median_value FLOAT
+      , mode_value VARIANT
+      , stddev_value FLOAT
+      , source_watermark STRING
+      , profiled_at TIMESTAMP_LTZ
+    )
+  {%- endset -%}
+  {%- do run_query(create_stats_table) -%}
+
+  {%- set query_stored_watermarks -%}
+    SELECT DISTINCT db_name, schema_name, table_name, source_watermark FROM {{ stats_table_relation }}
+  {%- endset -%}
+  {%- for row in run_query(query_stored_watermarks).rows -%}
+    {%- do stored_watermarks.update({"%s.%s.%s" | format(row[0], row[1], row[2]): row[3]}) -%}
+  {%- endfor -%}
+
+  -- MEMO: ACCOUNT_USAGE.TABLES has latency, so a change is picked up by the next build at worst.
+  {%- set query_source_watermarks -%}
+    SELECT
+      tbls.TABLE_CATALOG
+      , tbls.TABLE_SCHEMA
+      , tbls.TABLE_NAME
+      , COALESCE(TO_VARCHAR(MAX(tbls.LAST_ALTERED)), '') || '/' || COALESCE(TO_VARCHAR(MAX(tbls.ROW_COUNT)), '')
+    FROM
+      {{ source('account_usage', 'TABLES') }} tbls
+    INNER JOIN
+      (SELECT DISTINCT TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME FROM {{ ref('quollio_stats_profiling_columns') }}) cols
+    ON
+      tbls.TABLE_CATALOG = cols.TABLE_CATALOG
+      AND tbls.TABLE_SCHEMA = cols.TABLE_SCHEMA
+      AND tbls.TABLE_NAME = cols.TABLE_NAME
+    WHERE
+      tbls.DELETED IS NULL
+    GROUP BY
+      tbls.TABLE_CATALOG
+      , tbls.TABLE_SCHEMA
+      , tbls.TABLE_NAME
+  {%- endset -%}
+  {%- for row in run_query(query_source_watermarks).rows -%}
+    {%- do source_watermarks.update({"%s.%s.%s" | format(row[0], row[1], row[2]): row[3]}) -%}
+  {%- endfor -%}
+{%- endif -%}
+
+-- MEMO: A view stores the fingerprint of its SQL in its comment, which covers the columns and the sample method.
+-- The view is not replaced if the fingerprint is not changed since the last build.
+{%- set stored_view_fingerprints = {} -%}
+{%- set created_relations = [] -%}
+{%- if not is_table_materialization and stats_target_tables | length > 0 and not should_full_refresh() -%}
+  {%- set query_view_fingerprints -%}
+    SELECT
+      TABLE_NAME
+      , COMMENT
+    FROM
+      "{{ database }}".INFORMATION_SCHEMA.VIEWS
+    WHERE
+      TABLE_SCHEMA = '{{ schema }}'
+      AND startswith(TABLE_NAME, '{{ stats_view_prefix | upper }}_')
+      AND startswith(COMMENT, 'quollio_fingerprint:')
+  {%- endset -%}
+  {%- for row in run_query(query_view_fingerprints).rows -%}
+    {%- do stored_view_fingerprints.update({row[0]: row[1]}) -%}
+  {%- endfor -%}
+{%- endif -%}
+
 -- create view for each table
 {%- for stats_target_table in stats_target_tables -%}
   -- build sql for column value aggregation.
   {%- set sql_for_column_stats %}
   {% set columns_json = fromjson(stats_target_table[3]) %}
+  {%- if var("stats_profiling_mode", "union") == "single_scan" %}
+    -- aggregate all columns in one scan of the table, and reshape them into a record per column.
+    SELECT
+      '{{stats_target_table[0]}}' as db_name
+      , '{{stats_target_table[1]}}' as schema_name
+      , '{{stats_target_table[2]}}' as table_name
+      , col_stats.key as column_name
+      , col_stats.value:max_value::STRING AS max_value
+      , col_stats.value:min_value::STRING AS min_value
+      , col_stats.value:null_count::NUMBER AS null_count
+      , col_stats.value:cardinality::NUMBER AS cardinality
+      , col_stats.value:avg_value::FLOAT AS avg_value
+      , col_stats.value:median_value::FLOAT AS median_value
+      , col_stats.value:mode_value AS mode_value
+      , col_stats.value:stddev_value::FLOAT AS stddev_value
+    FROM (
+      SELECT
+        OBJECT_CONSTRUCT_KEEP_NULL(
+        {%- for col_name, is_calclable in columns_json.items() %}
+          {% if not loop.first %}, {% endif %}'{{col_name}}', OBJECT_CONSTRUCT_KEEP_NULL(
+            'max_value', {% if is_calclable == True %}CAST(MAX("{{col_name}}") AS STRING){% else %}NULL{% endif %}
+            , 'min_value', {% if is_calclable == True %}CAST(MIN("{{col_name}}") AS STRING){% else %}NULL{% endif %}
+            , 'null_count', COUNT_IF("{{col_name}}" IS NULL)
+            , 'cardinality', APPROX_COUNT_DISTINCT("{{col_name}}")
+            , 'avg_value', {% if is_calclable == True %}AVG("{{col_name}}"){% else %}NULL{% endif %}
+            , 'median_value', {% if is_calclable == True %}MEDIAN("{{col_name}}"){% else %}NULL{% endif %}
+            , 'mode_value', {% if is_calclable == True %}APPROX_TOP_K("{{col_name}}")[0][0]{% else %}NULL{% endif %}
+            , 'stddev_value', {% if is_calclable == True %}STDDEV("{{col_name}}"){% else %}NULL{% endif %}
+          )
+        {%- endfor %}
+        ) AS columns_stats
+      FROM "{{stats_target_table[0]}}"."{{stats_target_table[1]}}"."{{stats_target_table[2]}}" {{ var("sample_method") }}
+    ) aggregated, LATERAL FLATTEN(input => aggregated.columns_stats) col_stats
+  {%- else %}
   {%- for col_name, is_calclable in columns_json.items() -%}
     {%- if not loop.first %}UNION{% endif %}
     SELECT
@@ -62,22 +189,78 @@
       , {% if is_calclable == True %}STDDEV("{{col_name}}"){% else %}NULL{% endif %} AS stddev_value
     FROM "{{stats_target_table[0]}}"."{{stats_target_table[1]}}"."{{stats_target_table[2]}}" {{ var("sample_method") }}
   {% endfor -%}
+  {%- endif %}
   {%- endset %}
 
+  {%- if is_table_materialization %}
+  -- refresh the rows of the table only if it's changed since the last build.
+  {%- set table_key = "%s.%s.%s" | format(stats_target_table[0], stats_target_table[1], stats_target_table[2]) %}
+  -- MEMO: The watermark has the fingerprint of the stats SQL, so that changed columns or settings refresh the rows too.
+  {%- set source_watermark = source_watermarks.get(table_key, "") %}
+  {%- set stats_watermark = source_watermark ~ "/" ~ local_md5(sql_for_column_stats) %}
+  {%- if source_watermark != "" and stored_watermarks.get(table_key) == stats_watermark %}
+    {{ log("Skip profiling " ~ table_key ~ " because it's not changed since the last build.", info=True) }}
+  {%- else %}
+    {%- set delete_stale_stats -%}
+      DELETE FROM {{ stats_table_relation }}
+      WHERE db_name = '{{stats_target_table[0]}}' AND schema_name = '{{stats_target_table[1]}}' AND table_name = '{{stats_target_table[2]}}'
+    {%- endset -%}
+    {%- do run_query(delete_stale_stats) -%}
+    {% call statement("main") %}
+      INSERT INTO {{ stats_table_relation }}
+      SELECT
+        stats.*
+        , '{{ stats_watermark }}'
+        , CURRENT_TIMESTAMP()
+      FROM (
+        {{ sql_for_column_stats }}
+      ) stats
+    {% endcall %}
+  {%- endif %}
+  {%- else %}
   -- create a view with a index as suffix
-  {%- set stats_view_identifier = "\"%s_%s_%s_%s\"" | format(model['name'], stats_target_table[0], stats_target_table[1], stats_target_table[2]) | upper %}
+  {%- set stats_view_identifier = "\"%s_%s_%s_%s\"" | format(stats_view_prefix, stats_target_table[0], stats_target_table[1], stats_target_table[2]) | upper %}
   {%- set schema_name = "\"%s\""|format(schema) %}
   {%- set db_name = "\"%s\""|format(database) %}
   {%- set target_relation = api.Relation.create(identifier=stats_view_identifier, schema=schema_name, database=db_name, type='view') %}
+  {%- set stats_view_fingerprint = "quollio_fingerprint:" ~ local_md5(sql_for_column_stats) %}
+  {%- if stored_view_fingerprints.get(stats_view_identifier[1:-1]) == stats_view_fingerprint %}
+    {{ log("Skip creating " ~ target_relation ~ " because its columns are not changed since the last build.", info=True) }}
+  {%- else %}
   {% call statement("main") %}
     {{ get_create_view_as_sql(target_relation, sql_for_column_stats) }}
   {% endcall %}
+  {%- do run_query("COMMENT ON VIEW " ~ target_relation ~ " IS '" ~ stats_view_fingerprint ~ "'") %}
+  {%- do created_relations.append(target_relation) %}
+  {%- endif %}
+  -- MEMO: Grants are applied to skipped views too, so that changed grants in the config are reflected.
   {%- set full_refresh_mode = (should_full_refresh()) -%}
   {%- set should_revoke = should_revoke(target_relation, full_refresh_mode) %}
   {%- do apply_grants(target_relation, grant_config, should_revoke) %}
   {%- set target_relations = target_relations.append(target_relation) %}
+  {%- endif %}
 {%- endfor -%}
 
+{%- if not is_table_materialization and stats_target_tables | length > 0 and created_relations | length == 0 %}
+  {% call statement("main") %}
+    {{ log("All views are up to date. Just execute select stmt for skipping call statement.", info=True) }}
+    select null
+  {% endcall %}
+{%- endif %}
+
+{%- if is_table_materialization and stats_target_tables | length > 0 %}
+  -- remove the rows of tables which are no longer profiled.
+  {% call statement("main") %}
+    DELETE FROM {{ stats_table_relation }}
+    WHERE (db_name, schema_name, table_name) NOT IN (
+      SELECT DISTINCT TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME FROM {{ ref('quollio_stats_profiling_columns') }}
+    )
+  {% endcall %}
+  {%- set should_revoke = should_revoke(stats_table_relation, should_full_refresh()) %}
+  {%- do apply_grants(stats_table_relation, grant_config, should_revoke) %}
+  {%- set target_relations = target_relations.append(stats_table_relation) %}
+{%- endif %}
+
 {{ run_hooks(post_hooks, inside_transaction=True) }}
 -- `COMMIT` happens here:
 {{ adapter.commit() }}
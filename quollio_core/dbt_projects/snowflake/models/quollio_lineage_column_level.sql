@@ -1,9 +1,18 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='DOWNSTREAM_TABLE_NAME',
+        post_hook='{{ delete_dropped_lineage_downstreams() }}'
+    )
+}}
 WITH column_lineage_history as (
     SELECT
       directSources.value: "objectName"::varchar as upstream_object_name
       , directSources.value: "columnName"::varchar as upstream_column_name
       , om.value: "objectName"::varchar as downstream_table_name
       , columns_modified.value: "columnName"::varchar as downstream_column_name
+      , ah.query_start_time
       , rank() over (partition by downstream_table_name order by query_start_time desc) as query_exec_time_rank
     FROM
       {{ source('account_usage', 'ACCESS_HISTORY') }} ah
@@ -17,8 +26,7 @@ WITH column_lineage_history as (
 		AND om.value:"objectName" NOT LIKE '%.GE_TMP_%'
 		AND om.value:"objectName" NOT LIKE '%.GE_TEMP_%'
 		AND om.value:"objectName" NOT LIKE '%QUOLLIO_%'
-		-- AND ah.query_start_time >= to_timestamp_ltz({start_time_millis}, 3)
-		-- AND ah.query_start_time < to_timestamp_ltz({end_time_millis}, 3)
+		{{ lineage_watermark_filter('ah.query_start_time') }}
 		AND (
 			NOT RLIKE (
 				upstream_object_name,
@@ -47,6 +55,7 @@ UNION
       , baseSources.value: "columnName"::varchar as upstream_column_name
       , om.value: "objectName"::varchar as downstream_table_name
       , columns_modified.value: "columnName"::varchar as downstream_column_name
+      , ah.query_start_time
       , rank() over (partition by downstream_table_name order by query_start_time desc) as query_exec_time_rank
     FROM
       {{ source('account_usage', 'ACCESS_HISTORY') }} ah
@@ -60,8 +69,7 @@ UNION
 		AND om.value:"objectName" NOT LIKE '%.GE_TMP_%'
 		AND om.value:"objectName" NOT LIKE '%.GE_TEMP_%'
 		AND om.value:"objectName" NOT LIKE '%QUOLLIO_%'
-		-- AND ah.query_start_time >= to_timestamp_ltz({start_time_millis}, 3)
-		-- AND ah.query_start_time < to_timestamp_ltz({end_time_millis}, 3)
+		{{ lineage_watermark_filter('ah.query_start_time') }}
 		AND (
 			NOT RLIKE (
 				upstream_object_name,
@@ -107,6 +115,8 @@ UNION
 				, upstream_column_name
 			)
 		) AS upstream_columns
+		, MAX(query_start_time) AS last_query_start_time
+		, HASH_AGG(DISTINCT upstream_object_name, upstream_column_name) AS upstream_fingerprint
 	FROM
 	    column_lineage_history clh
     INNER JOIN
@@ -118,12 +128,19 @@ UNION
     GROUP BY
         downstream_table_name
         , downstream_column_name
+), lineage AS (
+    SELECT
+        *
+    FROM
+        exists_upstream_column_lineage eucl
+    INNER JOIN
+    	table_exists_in_account tes
+    ON
+    	eucl.downstream_table_name = tes.TABLE_FQDN
 )
 SELECT
-    *
+    l.*
+    {{ lineage_last_changed_at() }}
 FROM
-    exists_upstream_column_lineage eucl
-INNER JOIN
-	table_exists_in_account tes
-ON
-	eucl.downstream_table_name = tes.TABLE_FQDN
+    lineage l
+{{ join_previous_lineage('l', ['DOWNSTREAM_TABLE_NAME', 'DOWNSTREAM_COLUMN_NAME']) }}
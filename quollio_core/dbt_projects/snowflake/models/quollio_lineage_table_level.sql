@@ -1,9 +1,18 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='DOWNSTREAM_TABLE_NAME',
+        post_hook='{{ delete_dropped_lineage_downstreams() }}'
+    )
+}}
 WITH table_lineage_history AS (
 	SELECT
 		doa.value:"objectName"::varchar AS upstream_table_name
 		, doa.value:"objectDomain"::varchar AS upstream_table_domain
 		, om.value:"objectName"::varchar AS downstream_table_name
 		, om.value:"objectDomain"::varchar AS downstream_table_domain
+		, ah.query_start_time
 		, rank() over (partition by downstream_table_name order by query_start_time desc) as query_exec_time_rank
 	FROM
         {{ source('account_usage', 'ACCESS_HISTORY') }} as ah
@@ -16,6 +25,7 @@ WITH table_lineage_history AS (
 		AND om.value:"objectName" NOT LIKE '%.GE_TEMP_%'
 		AND om.value:"objectName" NOT LIKE '%QUOLLIO_%'
 		AND doa.value:"objectDomain" = 'Table'
+		{{ lineage_watermark_filter('ah.query_start_time') }}
 		AND (
 			NOT RLIKE (
 				upstream_table_name,
@@ -61,6 +71,8 @@ WITH table_lineage_history AS (
     			upstream_table_domain
     		)
     	) as "UPSTREAM_TABLES"
+    	, MAX(query_start_time) as "LAST_QUERY_START_TIME"
+    	, HASH_AGG(DISTINCT upstream_table_name) as "UPSTREAM_FINGERPRINT"
     FROM
     	table_lineage_history tlh
     INNER JOIN
@@ -76,6 +88,8 @@ WITH table_lineage_history AS (
     	DOWNSTREAM_TABLE_NAME
     	, DOWNSTREAM_TABLE_DOMAIN
     	, UPSTREAM_TABLES
+    	, LAST_QUERY_START_TIME
+    	, UPSTREAM_FINGERPRINT
     FROM
     	upstream_exists_table uet
     INNER JOIN
@@ -88,6 +102,7 @@ WITH table_lineage_history AS (
        , ombd.this:"objectName"::varchar downstream_object_name
        , doa.value:"objectName"::varchar AS upstream_object_name
        , doa.value:"objectDomain"::varchar AS upstream_object_domain
+       , ah.query_start_time
        , rank() over (partition by downstream_object_name order by query_start_time desc) as query_exec_time_rank
     FROM
         {{ source('account_usage', 'ACCESS_HISTORY') }} ah
@@ -100,6 +115,7 @@ WITH table_lineage_history AS (
         AND doa.value:"objectName" NOT LIKE '%.GE_TMP_%'
         AND doa.value:"objectName" NOT LIKE '%.GE_TEMP_%'
         AND ombd.this:"objectName" NOT LIKE '%QUOLLIO_%'
+        {{ lineage_watermark_filter('ah.query_start_time') }}
         AND (
     		NOT RLIKE (
     			upstream_object_name,
@@ -122,6 +138,8 @@ WITH table_lineage_history AS (
                , upstream_object_domain
            )
        ) AS upstream_tables
+       , max(query_start_time) AS last_query_start_time
+       , hash_agg(DISTINCT upstream_object_name) AS upstream_fingerprint
     FROM 
         view_lineage_history vlh
     INNER JOIN
@@ -138,23 +156,32 @@ WITH table_lineage_history AS (
        downstream_object_name
        , downstream_object_domain
        , upstream_tables
+       , last_query_start_time
+       , upstream_fingerprint
     FROM 
         upstream_exists_view uev
     INNER JOIN
         table_exists_in_account tes
     ON
         uev.downstream_object_name = tes.TABLE_FQDN
+), lineage AS (
+    SELECT
+        *
+    FROM
+        table_lineage
+    WHERE
+        DOWNSTREAM_TABLE_DOMAIN in ('Table', 'View', 'Materialized view')
+    UNION
+    SELECT
+        *
+    FROM
+        view_lineage
+    WHERE
+        downstream_object_domain in ('Table', 'View', 'Materialized view')
 )
 SELECT
-    *
-FROM
-    table_lineage
-WHERE
-    DOWNSTREAM_TABLE_DOMAIN in ('Table', 'View', 'Materialized view')
-UNION
-SELECT
-    *
+    l.*
+    {{ lineage_last_changed_at() }}
 FROM
-    view_lineage
-WHERE
-    downstream_object_domain in ('Table', 'View', 'Materialized view')
+    lineage l
+{{ join_previous_lineage('l', ['DOWNSTREAM_TABLE_NAME']) }}
@@ -1,21 +1,22 @@
-from typing import Dict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
 
 import yaml
 from blake3 import blake3
 from jinja2 import Environment, FileSystemLoader
 
+GLOBAL_ID_PREFIXES = {
+    "schema": "schm-",
+    "table": "tbl-",
+    "column": "clmn-",
+    "bigroup": "bgrp-",
+    "dashboard": "dsbd-",
+    "sheet": "sht-",
+}
+
 
 def new_global_id(tenant_id: str, cluster_id: str, data_id: str, data_type: str) -> str:
-    prefix = ""
-    data_types = {
-        "schema": "schm-",
-        "table": "tbl-",
-        "column": "clmn-",
-        "bigroup": "bgrp-",
-        "dashboard": "dsbd-",
-        "sheet": "sht-",
-    }
-    prefix = data_types[data_type]
+    prefix = GLOBAL_ID_PREFIXES[data_type]
 
     data_to_hash = f"{tenant_id}{cluster_id}{data_id}"
     hashed = blake3(data_to_hash.encode()).digest()
@@ -23,6 +24,39 @@ def new_global_id(tenant_id: str, cluster_id: str, data_id: str, data_type: str)
     return global_id
 
 
+class GlobalIdFactory:
+    """
+    Generates the same global ids as new_global_id for one (tenant_id, cluster_id).
+    The constant part is fed into a hasher once and the hasher is copied per data_id,
+    and recently generated hashes are kept in an LRU because the same upstreams appear in many lineages.
+    """
+
+    def __init__(self, tenant_id: str, cluster_id: str, max_cache_size: int = 100000) -> None:
+        self._hasher = blake3(f"{tenant_id}{cluster_id}".encode())
+        self._hash = lru_cache(maxsize=max_cache_size)(self._hash_data_id)
+
+    def _hash_data_id(self, data_id: str) -> str:
+        hasher = self._hasher.copy()
+        hasher.update(data_id.encode())
+        return hasher.digest()[:16].hex()
+
+    def new_global_id(self, data_id: str, data_type: str) -> str:
+        return GLOBAL_ID_PREFIXES[data_type] + self._hash(data_id)
+
+    def new_global_ids(self, data_ids: Iterable[str], data_type: str) -> List[str]:
+        prefix = GLOBAL_ID_PREFIXES[data_type]
+        return [prefix + self._hash(data_id) for data_id in data_ids]
+
+
+def get_record_batch_columns(batch: Any, names: List[str]) -> List[List[Any]]:
+    """
+    Return the columns of an Arrow record batch as Python lists in the order of `names`.
+    Column names are matched case-insensitively because warehouses differ in the case they return.
+    """
+    indexes = {name.upper(): i for i, name in enumerate(batch.schema.names)}
+    return [batch.column(indexes[name.upper()]).to_pylist() for name in names]
+
+
 def setup_dbt_profile(connections_json: Dict[str, str], template_path: str, template_name: str) -> None:
     profile_path = f"{template_path}/profiles.yml"
     loader = Environment(loader=(FileSystemLoader(template_path, encoding="utf-8")))
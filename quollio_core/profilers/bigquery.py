@@ -1,12 +1,19 @@
-from typing import Dict, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+from google.api_core.exceptions import GoogleAPICallError
 from google.auth.credentials import Credentials
 
 from quollio_core.helper.log_utils import error_handling_decorator, logger
-from quollio_core.profilers.lineage import gen_table_lineage_payload, parse_bigquery_table_lineage
-from quollio_core.profilers.stats import gen_table_stats_payload
+from quollio_core.profilers.lineage import gen_lineage_requests, gen_table_lineage_payload, parse_bigquery_table_lineage
+from quollio_core.profilers.stats import (
+    gen_stats_requests,
+    gen_table_stats_payload,
+    gen_table_stats_payload_from_record_batches,
+)
 from quollio_core.repository import qdc
 from quollio_core.repository.bigquery import BigQueryClient, GCPLineageClient, get_entitiy_reference, get_search_request
+from quollio_core.repository.outbox import Outbox
 
 
 @error_handling_decorator
@@ -17,31 +24,26 @@ def bigquery_table_lineage(
     regions: list,
     org_id: str,
     credentials: Credentials,
+    max_workers: int = 1,
+    discovery_mode: str = "search",
+    metadata_mode: str = "api",
 ) -> None:
     lineage_client = GCPLineageClient(credentials)
     bq_client = BigQueryClient(credentials, project_id)
 
-    datasets = bq_client.list_dataset_ids()
-    all_tables = generate_table_list(bq_client, datasets)
-    lineage_links = generate_lineage_links(all_tables, lineage_client, project_id, regions)
+    if metadata_mode == "information_schema":
+        all_tables = generate_table_list_from_information_schema(bq_client, regions)
+    else:
+        datasets = bq_client.list_dataset_ids()
+        all_tables = generate_table_list(bq_client, datasets)
+    lineage_links = generate_lineage_links(all_tables, lineage_client, project_id, regions, max_workers, discovery_mode)
     lineage_links = parse_bigquery_table_lineage(lineage_links)
     logger.debug("The following resources will be ingested. %s", lineage_links)
 
     update_table_lineage_inputs = gen_table_lineage_payload(tenant_id=tenant_id, endpoint=org_id, tables=lineage_links)
 
     req_count = 0
-    for update_table_lineage_input in update_table_lineage_inputs:
-        logger.info(
-            "Generating table lineage. downstream: %s -> %s -> %s. upstream: %s",
-            update_table_lineage_input.downstream_database_name,
-            update_table_lineage_input.downstream_schema_name,
-            update_table_lineage_input.downstream_table_name,
-            update_table_lineage_input.upstreams.as_dict(),
-        )
-        status_code = qdc_client.update_lineage_by_id(
-            global_id=update_table_lineage_input.downstream_global_id,
-            payload=update_table_lineage_input.upstreams.as_dict(),
-        )
+    for _, status_code in qdc_client.update_lineage_by_ids(gen_lineage_requests(update_table_lineage_inputs)):
         if status_code == 200:
             req_count += 1
     logger.info("Generating table lineage is finished. %s lineages are ingested.", req_count)
@@ -54,28 +56,103 @@ def bigquery_table_stats(
     tenant_id: str,
     org_id: str,
     dataplex_stats_tables: list,
+    outbox: Optional[Outbox] = None,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    use_storage_api: bool = False,
 ) -> None:
-    profiling_results = []
+    tables = list()
     for table in dataplex_stats_tables:
-        logger.info("Profiling columns using Dataplex stats table: %s", table)
-        profiling_results.extend(column_stats_from_dataplex(bq_client, table))
+        if outbox is not None and outbox.is_unit_done(unit=table):
+            logger.info("Skip %s because its stats were ingested before the resume.", table)
+            continue
+        tables.append(table)
+    batches = _gen_dataplex_stats_batches(bq_client, tables, batch_size)
 
-    stats = gen_table_stats_payload(tenant_id, org_id, profiling_results)
+    for batch, rows in _iter_dataplex_stats_results(bq_client, batches, concurrency):
+        logger.info("Profiling columns using Dataplex stats table: %s", ", ".join(batch))
+        # MEMO: Rows are paged from the job result while the payloads are uploaded.
+        if use_storage_api:
+            stats = gen_table_stats_payload_from_record_batches(tenant_id, org_id, bq_client.read_record_batches(rows))
+        else:
+            stats = gen_table_stats_payload(tenant_id, org_id, (dict(row) for row in rows))
 
-    for stat in stats:
-        status_code = qdc_client.update_stats_by_id(
-            global_id=stat.global_id,
-            payload=stat.body.as_dict(),
-        )
-        if status_code == 200:
-            logger.info(
-                "Stats for column %s -> %s -> %s -> %s is successfully ingested.",
-                stat.db,
-                stat.schema,
-                stat.table,
-                stat.column,
+        is_all_ingested = True
+        for global_id, status_code in qdc_client.update_stats_by_ids(
+            gen_stats_requests(stats, include_table_stats=True)
+        ):
+            if status_code == 200:
+                logger.debug("Stats for column id %s is successfully ingested.", global_id)
+            else:
+                is_all_ingested = False
+        if outbox is not None and is_all_ingested:
+            for table in batch:
+                outbox.mark_unit_done(unit=table)
+
+
+def _gen_dataplex_stats_batches(bq_client: BigQueryClient, tables: List[str], batch_size: int) -> List[List[str]]:
+    if batch_size <= 1:
+        return [[table] for table in tables]
+
+    # MEMO: A query job runs in one location, so only the tables in the same location are UNION ALLed.
+    locations: Dict[str, str] = dict()
+    tables_by_location: Dict[str, List[str]] = dict()
+    for table in tables:
+        dataset_id = table.rsplit(".", 1)[0]
+        if dataset_id not in locations:
+            locations[dataset_id] = str(bq_client.get_dataset_location(dataset_id)).lower()
+        tables_by_location.setdefault(locations[dataset_id], []).append(table)
+    return [
+        location_tables[i : i + batch_size]  # noqa: E203
+        for location_tables in tables_by_location.values()
+        for i in range(0, len(location_tables), batch_size)
+    ]
+
+
+def _iter_dataplex_stats_results(
+    bq_client: BigQueryClient, batches: List[List[str]], concurrency: int = 1
+) -> Iterator[Tuple[List[str], Iterable[Any]]]:
+    """
+    Run a query per batch of Dataplex stats tables and yield (batch, rows) in the order the jobs complete.
+    When a query of many tables fails, the tables are queried one by one.
+    """
+
+    def _run(batch: List[str]) -> Iterable[Any]:
+        query = _gen_dataplex_stats_query(batch)
+        logger.debug(f"Executing Query: {query}")
+        return bq_client.client.query(query).result()
+
+    def _query(batch: List[str]) -> List[Tuple[List[str], Iterable[Any]]]:
+        try:
+            return [(batch, _run(batch))]
+        except GoogleAPICallError as e:
+            if len(batch) == 1:
+                raise
+            logger.warning(
+                "Failed to query Dataplex stats tables %s at once. Query them one by one. error: %s",
+                ", ".join(batch),
+                e,
             )
-            logger.debug("Stats for column id %s is successfully ingested.", stat.global_id)
+            return [([table], _run([table])) for table in batch]
+
+    if concurrency <= 1:
+        for batch in batches:
+            yield from _query(batch)
+        return
+
+    # MEMO: Bound the number of jobs in flight so that the results of all batches are not held at once.
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+        for batch in batches:
+            if len(in_flight) >= concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+            in_flight.add(executor.submit(_query, batch))
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
 
 
 def generate_table_list(bq_client: BigQueryClient, datasets: List[str]) -> List[str]:
@@ -96,35 +173,98 @@ def generate_table_list(bq_client: BigQueryClient, datasets: List[str]) -> List[
     return all_table_names
 
 
+def generate_table_list_from_information_schema(bq_client: BigQueryClient, regions: List[str]) -> List[str]:
+    return [
+        f"{bq_client.client.project}.{table['dataset_id']}.{table['table_id']}"
+        for table in bq_client.list_tables_from_information_schema(regions)
+        if table["table_type"] in ["TABLE", "VIEW", "MATERIALIZED_VIEW"]
+    ]
+
+
 def generate_lineage_links(
     all_tables: List[str],
     lineage_client: GCPLineageClient,
     project_id: str,
     regions: List[str],
-) -> Dict[str, List[str]]:
-    lineage_links = {}
-    for table in all_tables:
-        if "quollio" in table.lower():
-            continue
+    max_workers: int = 1,
+    discovery_mode: str = "search",
+) -> Dict[str, Set[str]]:
+    """
+    Build a map of downstream table -> upstream tables.
+    `search` searches links of every table in every region. `bulk` pages through all lineage processes,
+    runs and events of each region once, and searches per table only in regions where the enumeration failed.
+    """
+    lineage_links: Dict[str, Set[str]] = {}
+    target_tables = [table for table in all_tables if "quollio" not in table.lower()]
+    search_regions = regions
+    if discovery_mode == "bulk":
+        search_regions = []
+        target_table_set = set(target_tables)
+        for region in regions:
+            try:
+                links = _enumerate_links(lineage_client, project_id, region, max_workers)
+            except GoogleAPICallError as e:
+                logger.warning("Failed to enumerate lineage processes in %s. Search links per table. %s", region, e)
+                search_regions.append(region)
+                continue
+            _merge_links(lineage_links, links, target_table_set)
+
+    if len(search_regions) > 0:
+        targets = [(table, region) for table in target_tables for region in search_regions]
+        _merge_links(lineage_links, _search_links(lineage_client, project_id, targets, max_workers))
+    return lineage_links
+
+
+def _search_links(
+    lineage_client: GCPLineageClient, project_id: str, targets: List[Tuple[str, str]], max_workers: int = 1
+) -> Iterator[Any]:
+    def _search(table: str, region: str) -> list:
         downstream = get_entitiy_reference()
         downstream.fully_qualified_name = f"bigquery:{table}"
+        request = get_search_request(downstream_table=downstream, project_id=project_id, region=region)
+        return lineage_client.get_links(request=request)
 
-        for region in regions:
-            request = get_search_request(downstream_table=downstream, project_id=project_id, region=region)
-            response = lineage_client.get_links(request=request)
-            for lineage in response:
-                target_table = str(lineage.target.fully_qualified_name).replace("bigquery:", "")
-                source_table = str(lineage.source.fully_qualified_name).replace("bigquery:", "")
-                if target_table not in lineage_links:
-                    lineage_links[target_table] = []
-                if source_table not in lineage_links[target_table]:
-                    lineage_links[target_table].append(source_table)
+    if max_workers <= 1:
+        for table, region in targets:
+            yield from _search(table, region)
+        return
 
-    return lineage_links
+    # MEMO: Each search is a blocking gRPC call. Run them concurrently and merge the links in the caller's thread.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_search, table, region) for table, region in targets]
+        for i, future in enumerate(as_completed(futures), start=1):
+            yield from future.result()
+            if i % 1000 == 0:
+                logger.info("Searched lineage of %s/%s tables and regions.", i, len(futures))
+
+
+def _enumerate_links(lineage_client: GCPLineageClient, project_id: str, region: str, max_workers: int = 1) -> List[Any]:
+    process_names = lineage_client.list_process_names(project_id=project_id, region=region)
+    logger.info("Found %s lineage processes in %s.", len(process_names), region)
+    if max_workers <= 1:
+        return [link for process_name in process_names for link in lineage_client.get_process_links(process_name)]
 
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda process_name: list(lineage_client.get_process_links(process_name)), process_names)
+        return [link for links in results for link in links]
 
-def column_stats_from_dataplex(bq_client: BigQueryClient, profiling_table: str) -> List[Dict]:
-    query = f"""
+
+def _merge_links(
+    lineage_links: Dict[str, Set[str]], links: Iterable[Any], target_tables: Optional[Set[str]] = None
+) -> None:
+    for lineage in links:
+        target_table = str(lineage.target.fully_qualified_name).replace("bigquery:", "")
+        source_table = str(lineage.source.fully_qualified_name).replace("bigquery:", "")
+        # MEMO: Processes also write to tables out of the target list, e.g. other projects or quollio tables.
+        if target_tables is not None and target_table not in target_tables:
+            continue
+        lineage_links.setdefault(target_table, set()).add(source_table)
+
+
+def _gen_dataplex_stats_query(profiling_tables: List[str]) -> str:
+    # MEMO: Many Dataplex stats tables are UNION ALLed into one job so that they don't wait in the job queue one by one.
+    return "\n    UNION ALL".join(
+        f"""
     SELECT
         data_source.table_project_id AS DB_NAME,
         data_source.dataset_id AS SCHEMA_NAME,
@@ -140,8 +280,5 @@ def column_stats_from_dataplex(bq_client: BigQueryClient, profiling_table: str)
         CAST((percent_unique / 100) * job_rows_scanned AS INT) as CARDINALITY
     FROM `{profiling_table}`
     """
-    logger.debug(f"Executing Query: {query}")
-    results = bq_client.client.query(query).result()
-
-    # Convert RowIterator to a list of dictionaries
-    return [dict(row) for row in results]
+        for profiling_table in profiling_tables
+    )
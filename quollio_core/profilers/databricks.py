@@ -1,13 +1,22 @@
+import itertools
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from quollio_core.profilers.lineage import (
     gen_column_lineage_payload,
+    gen_lineage_requests,
     gen_table_lineage_payload,
+    gen_table_lineage_payload_from_record_batches,
     parse_databricks_table_lineage,
 )
-from quollio_core.profilers.stats import gen_table_stats_payload, get_is_target_stats_items, render_sql_for_stats
+from quollio_core.profilers.stats import (
+    gen_stats_requests,
+    gen_table_stats_payload,
+    get_is_target_stats_items,
+    render_sql_for_stats,
+)
 from quollio_core.repository import databricks, qdc
+from quollio_core.repository.outbox import Outbox
 
 logger = logging.getLogger(__name__)
 
@@ -18,35 +27,34 @@ def databricks_table_level_lineage(
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
     dbt_table_name: str = "quollio_lineage_table_level",
+    use_arrow: bool = False,
 ) -> None:
     with databricks.DatabricksQueryExecutor(config=conn) as databricks_executor:
-        results = databricks_executor.get_query_results(
-            query=f"""
+        query = f"""
             SELECT
                 DOWNSTREAM_TABLE_NAME,
                 UPSTREAM_TABLES
             FROM {conn.catalog}.{conn.schema}.{dbt_table_name}
             """
-        )
-        tables = parse_databricks_table_lineage(results)
-        update_table_lineage_inputs = gen_table_lineage_payload(
-            tenant_id=tenant_id,
-            endpoint=endpoint,
-            tables=tables,
-        )
-
-        req_count = 0
-        for update_table_lineage_input in update_table_lineage_inputs:
-            logger.info(
-                "Generating table lineage. downstream: %s -> %s-> %s",
-                update_table_lineage_input.downstream_database_name,
-                update_table_lineage_input.downstream_schema_name,
-                update_table_lineage_input.downstream_table_name,
+        # MEMO: Rows are fetched in chunks and uploaded as they are converted,
+        # so the whole lineage table is never held in memory.
+        if use_arrow:
+            update_table_lineage_inputs = gen_table_lineage_payload_from_record_batches(
+                tenant_id=tenant_id,
+                endpoint=endpoint,
+                batches=databricks_executor.iter_record_batches(query=query),
             )
-            status_code = qdc_client.update_lineage_by_id(
-                global_id=update_table_lineage_input.downstream_global_id,
-                payload=update_table_lineage_input.upstreams.as_dict(),
+        else:
+            results = itertools.chain.from_iterable(databricks_executor.iter_query_results(query=query))
+            tables = parse_databricks_table_lineage(results)
+            update_table_lineage_inputs = gen_table_lineage_payload(
+                tenant_id=tenant_id,
+                endpoint=endpoint,
+                tables=tables,
             )
+
+        req_count = 0
+        for _, status_code in qdc_client.update_lineage_by_ids(gen_lineage_requests(update_table_lineage_inputs)):
             if status_code == 200:
                 req_count += 1
         logger.info("Generating table lineage is finished. %s lineages are ingested.", req_count)
@@ -61,36 +69,27 @@ def databricks_column_level_lineage(
     dbt_table_name: str = "quollio_lineage_column_level",
 ) -> None:
     with databricks.DatabricksQueryExecutor(config=conn) as databricks_executor:
-        results = databricks_executor.get_query_results(
-            query=f"""
+        results = itertools.chain.from_iterable(
+            databricks_executor.iter_query_results(
+                query=f"""
             SELECT
                 *
             FROM
                 {conn.catalog}.{conn.schema}.{dbt_table_name}
             """
+            )
         )
 
-    update_column_lineage_inputs = gen_column_lineage_payload(
-        tenant_id=tenant_id,
-        endpoint=endpoint,
-        columns=results,
-    )
-
-    req_count = 0
-    for update_column_lineage_input in update_column_lineage_inputs:
-        logger.info(
-            "Generating column lineage. downstream: %s -> %s -> %s -> %s",
-            update_column_lineage_input.downstream_database_name,
-            update_column_lineage_input.downstream_schema_name,
-            update_column_lineage_input.downstream_table_name,
-            update_column_lineage_input.downstream_column_name,
-        )
-        status_code = qdc_client.update_lineage_by_id(
-            global_id=update_column_lineage_input.downstream_global_id,
-            payload=update_column_lineage_input.upstreams.as_dict(),
+        update_column_lineage_inputs = gen_column_lineage_payload(
+            tenant_id=tenant_id,
+            endpoint=endpoint,
+            columns=results,
         )
-        if status_code == 200:
-            req_count += 1
+
+        req_count = 0
+        for _, status_code in qdc_client.update_lineage_by_ids(gen_lineage_requests(update_column_lineage_inputs)):
+            if status_code == 200:
+                req_count += 1
     logger.info(
         "Generating column lineage is finished. %s lineages are ingested.",
         req_count,
@@ -99,7 +98,9 @@ def databricks_column_level_lineage(
 
 
 def _get_monitoring_tables(
-    conn: databricks.DatabricksConnectionConfig, monitoring_table_suffix: str = "_profile_metrics"
+    conn: databricks.DatabricksConnectionConfig,
+    monitoring_table_suffix: str = "_profile_metrics",
+    executor_pool: Optional[databricks.DatabricksExecutorPool] = None,
 ) -> List[Dict[str, str]]:
     tables = []
     query = f"""
@@ -114,8 +115,11 @@ def _get_monitoring_tables(
             table_name LIKE "%{monitoring_table_suffix}"
             AND table_name NOT LIKE ('quollio_%')
         """
-    with databricks.DatabricksQueryExecutor(config=conn) as databricks_executor:
-        tables = databricks_executor.get_query_results(query)
+    if executor_pool is not None:
+        tables = executor_pool.get_query_results(query)
+    else:
+        with databricks.DatabricksQueryExecutor(config=conn) as databricks_executor:
+            tables = databricks_executor.get_query_results(query)
     if len(tables) > 0:
         logger.info("Found %s monitoring tables.", len(tables))
         return tables
@@ -128,63 +132,108 @@ def _get_column_stats(
     conn: databricks.DatabricksConnectionConfig,
     stats_items: List[str],
     monitoring_table_suffix: str = "_profile_metrics",
-) -> List[Dict[str, str]]:
-    tables = _get_monitoring_tables(conn, monitoring_table_suffix)
-    if not tables:
-        return []
-    stats = []
-    is_aggregate_items = get_is_target_stats_items(stats_items=stats_items)
+    outbox: Optional[Outbox] = None,
+    concurrency: int = 1,
+    batch_size: int = 1,
+) -> List[List[Dict[str, str]]]:
+    # MEMO: Opening a connection costs an OAuth handshake and a warehouse session.
+    # Share a few connections among all monitoring tables instead of opening one per table.
+    with databricks.DatabricksExecutorPool(config=conn, size=concurrency) as executor_pool:
+        tables = _get_monitoring_tables(conn, monitoring_table_suffix, executor_pool)
+        if not tables:
+            return []
+        queries = _gen_column_stats_queries(tables, stats_items, outbox, batch_size)
+        # MEMO: A query can return the stats of many tables when they are batched. Group them by table.
+        stats: Dict[Tuple[str, str, str], List[Dict[str, str]]] = dict()
+        for _, results in executor_pool.get_query_results_concurrently(queries):
+            for result in results:
+                stats.setdefault((result["db_name"], result["schema_name"], result["table_name"]), []).append(result)
+        return list(stats.values())
+
+
+def _gen_column_stats_queries(
+    tables: List[Dict[str, str]],
+    stats_items: List[str],
+    outbox: Optional[Outbox] = None,
+    batch_size: int = 1,
+) -> Dict[str, str]:
+    profile_records = list()
     for table in tables:
         monitored_table = table["table_fqdn"].removesuffix("_profile_metrics")
         monitored_table = monitored_table.split(".")
         if len(monitored_table) != 3:
             raise ValueError(f"Invalid table name: {table['table_fqdn']}")
-        with databricks.DatabricksQueryExecutor(config=conn) as databricks_executor:
-            cte = """
-            WITH profile_record_history AS (
-                SELECT
-                    COLUMN_NAME
-                    , distinct_count as cardinality
-                    , MAX as max_value
-                    , MIN as min_value
-                    , AVG as avg_value
-                    , MEDIAN as median_value
-                    , STDDEV as stddev_value
-                    , NUM_NULLS as null_count
-                    , get(frequent_items, 0).item AS mode_value
-                    , row_number() over(partition by column_name order by window desc) rownum
-                FROM
-                    {monitoring_table}
-                WHERE
-                    column_name not in (':table')
-            ), profile_record AS (
+        if outbox is not None and outbox.is_unit_done(unit=".".join(monitored_table)):
+            logger.info("Skip %s because its stats were ingested before the resume.", ".".join(monitored_table))
+            continue
+        profile_records.append((".".join(monitored_table), _gen_profile_record_query(table, monitored_table)))
+
+    queries = dict()
+    is_aggregate_items = get_is_target_stats_items(stats_items=stats_items)
+    batch_size = max(1, batch_size)
+    for i in range(0, len(profile_records), batch_size):
+        batch = profile_records[i : i + batch_size]  # noqa: E203
+        # MEMO: UNION ALL the latest window of many monitoring tables so that the warehouse doesn't queue
+        # thousands of tiny statements.
+        cte = """
+        WITH profile_record_history AS ({profile_records}
+        ), profile_record AS (
+        SELECT
+            db_name
+            , schema_name
+            , table_name
+            , column_name
+            , max_value
+            , min_value
+            , null_count
+            , cardinality
+            , avg_value
+            , median_value
+            , mode_value
+            , stddev_value
+        FROM
+            profile_record_history
+        WHERE
+            rownum = 1
+        )""".format(
+            profile_records="\n            UNION ALL".join(query for _, query in batch)
+        )
+        query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn="profile_record", cte=cte)
+        logger.debug(f"The following sql will be fetched to retrieve stats values. {query}")
+        key = (
+            batch[0][0]
+            if len(batch) == 1
+            else "{first} and {count} tables".format(first=batch[0][0], count=len(batch) - 1)
+        )
+        queries[key] = query
+    return queries
+
+
+def _gen_profile_record_query(table: Dict[str, str], monitored_table: List[str]) -> str:
+    return """
             SELECT
                 "{monitored_table_catalog}" as db_name
                 , "{monitored_table_schema}" as schema_name
                 , "{monitored_table_name}" as table_name
-                , column_name
-                , max_value
-                , min_value
-                , null_count
-                , cardinality
-                , avg_value
-                , median_value
-                , mode_value
-                , stddev_value
+                , COLUMN_NAME
+                , distinct_count as cardinality
+                , MAX as max_value
+                , MIN as min_value
+                , AVG as avg_value
+                , MEDIAN as median_value
+                , STDDEV as stddev_value
+                , NUM_NULLS as null_count
+                , get(frequent_items, 0).item AS mode_value
+                , row_number() over(partition by column_name order by window desc) rownum
             FROM
-                profile_record_history
+                {monitoring_table}
             WHERE
-                rownum = 1
-            )""".format(
-                monitoring_table=table["table_fqdn"],
-                monitored_table_catalog=monitored_table[0],
-                monitored_table_schema=monitored_table[1],
-                monitored_table_name=monitored_table[2],
-            )
-            query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn="profile_record", cte=cte)
-            logger.debug(f"The following sql will be fetched to retrieve stats values. {query}")
-            stats.append(databricks_executor.get_query_results(query))
-    return stats
+                column_name not in (':table')""".format(
+        monitoring_table=table["table_fqdn"],
+        monitored_table_catalog=monitored_table[0],
+        monitored_table_schema=monitored_table[1],
+        monitored_table_name=monitored_table[2],
+    )
 
 
 def databricks_column_stats(
@@ -194,16 +243,24 @@ def databricks_column_stats(
     tenant_id: str,
     stats_items: List[str],
     monitoring_table_suffix: str = "_profile_metrics",
+    outbox: Optional[Outbox] = None,
+    concurrency: int = 1,
+    batch_size: int = 1,
 ) -> None:
-    table_stats = _get_column_stats(conn, stats_items, monitoring_table_suffix)
+    table_stats = _get_column_stats(conn, stats_items, monitoring_table_suffix, outbox, concurrency, batch_size)
     for table in table_stats:
         logger.debug("Table %s will be aggregated.", table)
         stats = gen_table_stats_payload(tenant_id=tenant_id, endpoint=endpoint, stats=table)
-        for stat in stats:
-            status_code = qdc_client.update_stats_by_id(
-                global_id=stat.global_id,
-                payload=stat.body.as_dict(),
-            )
+        is_all_ingested = True
+        for global_id, status_code in qdc_client.update_stats_by_ids(
+            gen_stats_requests(stats, include_table_stats=True)
+        ):
             if status_code == 200:
-                logger.info("Stats for %s is successfully ingested.", stat.global_id)
+                logger.info("Stats for %s is successfully ingested.", global_id)
+            else:
+                is_all_ingested = False
+        if outbox is not None and is_all_ingested and len(table) > 0:
+            outbox.mark_unit_done(
+                unit="{}.{}.{}".format(table[0]["db_name"], table[0]["schema_name"], table[0]["table_name"])
+            )
     return
@@ -1,8 +1,12 @@
+import itertools
 import json
+import logging
 from dataclasses import asdict, dataclass
-from typing import Dict, List, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from quollio_core.helper.core import new_global_id
+from quollio_core.helper.core import GlobalIdFactory, get_record_batch_columns
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -24,47 +28,81 @@ class LineageInputs:
 
 
 def gen_table_lineage_payload(
-    tenant_id: str, endpoint: str, tables: List[Dict[str, Union[Dict[str, str], str]]]
-) -> List[LineageInputs]:
-    payload = list()
+    tenant_id: str, endpoint: str, tables: Iterable[Dict[str, Union[Dict[str, str], str]]]
+) -> Iterator[LineageInputs]:
+    global_id_factory = GlobalIdFactory(tenant_id=tenant_id, cluster_id=endpoint)
     for table in tables:
-        downstream_table_fqdn = table["DOWNSTREAM_TABLE_NAME"].split(".")
-        if len(downstream_table_fqdn) != 3:
+        lineage_inputs = _gen_table_lineage_inputs(
+            global_id_factory=global_id_factory,
+            downstream_table_name=table["DOWNSTREAM_TABLE_NAME"],
+            upstream_tables=table["UPSTREAM_TABLES"],
+        )
+        if lineage_inputs is not None:
+            yield lineage_inputs
+
+
+def gen_table_lineage_payload_from_record_batches(
+    tenant_id: str, endpoint: str, batches: Iterable[Any]
+) -> Iterator[LineageInputs]:
+    """
+    Same as gen_table_lineage_payload, but reads the DOWNSTREAM_TABLE_NAME and UPSTREAM_TABLES columns
+    of Arrow record batches directly. UPSTREAM_TABLES can be either a JSON string or a list of structs.
+    """
+    global_id_factory = GlobalIdFactory(tenant_id=tenant_id, cluster_id=endpoint)
+    for batch in batches:
+        downstream_table_names, upstream_tables_list = get_record_batch_columns(
+            batch, ["DOWNSTREAM_TABLE_NAME", "UPSTREAM_TABLES"]
+        )
+        for downstream_table_name, upstream_tables in zip(downstream_table_names, upstream_tables_list):
+            if isinstance(upstream_tables, str):
+                upstream_tables = json.loads(upstream_tables)
+            lineage_inputs = _gen_table_lineage_inputs(
+                global_id_factory=global_id_factory,
+                downstream_table_name=downstream_table_name,
+                upstream_tables=upstream_tables or [],
+            )
+            if lineage_inputs is not None:
+                yield lineage_inputs
+
+
+def _gen_table_lineage_inputs(
+    global_id_factory: GlobalIdFactory, downstream_table_name: str, upstream_tables: List[Dict[str, str]]
+) -> Optional[LineageInputs]:
+    downstream_table_fqdn = downstream_table_name.split(".")
+    if len(downstream_table_fqdn) != 3:
+        return None
+    global_id_arg = "{db}{schema}{table}".format(
+        db=downstream_table_fqdn[0], schema=downstream_table_fqdn[1], table=downstream_table_fqdn[2]
+    )
+    downstream_table_global_id = global_id_factory.new_global_id(data_id=global_id_arg, data_type="table")
+    upstream_global_id_args = list()
+    for upstream_table in upstream_tables:
+        upstream_table_fqdn = upstream_table["upstream_object_name"].split(".")
+        if len(upstream_table_fqdn) != 3:
             continue
         else:
-            global_id_arg = "{db}{schema}{table}".format(
-                db=downstream_table_fqdn[0], schema=downstream_table_fqdn[1], table=downstream_table_fqdn[2]
-            )
-            downstream_table_global_id = new_global_id(
-                tenant_id=tenant_id, cluster_id=endpoint, data_id=global_id_arg, data_type="table"
-            )
-            lineage_input = LineageInput(upstream=[])
-            for upstream_table in table["UPSTREAM_TABLES"]:
-                upstream_table_fqdn = upstream_table["upstream_object_name"].split(".")
-                if len(upstream_table_fqdn) != 3:
-                    continue
-                else:
-                    upstream_global_id_arg = "{db}{schema}{table}".format(
-                        db=upstream_table_fqdn[0], schema=upstream_table_fqdn[1], table=upstream_table_fqdn[2]
-                    )
-                    upstream_table_global_id = new_global_id(
-                        tenant_id=tenant_id, cluster_id=endpoint, data_id=upstream_global_id_arg, data_type="table"
-                    )
-                    lineage_input.upstream.append(upstream_table_global_id)
-            lineage_inputs = LineageInputs(
-                downstream_global_id=downstream_table_global_id,
-                downstream_database_name=downstream_table_fqdn[0],
-                downstream_schema_name=downstream_table_fqdn[1],
-                downstream_table_name=downstream_table_fqdn[2],
-                downstream_column_name="",
-                upstreams=lineage_input,
+            upstream_global_id_args.append(
+                "{db}{schema}{table}".format(
+                    db=upstream_table_fqdn[0], schema=upstream_table_fqdn[1], table=upstream_table_fqdn[2]
+                )
             )
-            payload.append(lineage_inputs)
-    return payload
+    lineage_input = LineageInput(
+        upstream=global_id_factory.new_global_ids(data_ids=upstream_global_id_args, data_type="table")
+    )
+    return LineageInputs(
+        downstream_global_id=downstream_table_global_id,
+        downstream_database_name=downstream_table_fqdn[0],
+        downstream_schema_name=downstream_table_fqdn[1],
+        downstream_table_name=downstream_table_fqdn[2],
+        downstream_column_name="",
+        upstreams=lineage_input,
+    )
 
 
-def gen_column_lineage_payload(tenant_id: str, endpoint: str, columns: List[Dict[str, str]]) -> List[LineageInputs]:
-    payload = list()
+def gen_column_lineage_payload(
+    tenant_id: str, endpoint: str, columns: Iterable[Dict[str, str]]
+) -> Iterator[LineageInputs]:
+    global_id_factory = GlobalIdFactory(tenant_id=tenant_id, cluster_id=endpoint)
     for column in columns:
         downstream_table_fqdn = column["DOWNSTREAM_TABLE_NAME"].split(".")
         if len(downstream_table_fqdn) != 3:
@@ -76,11 +114,9 @@ def gen_column_lineage_payload(tenant_id: str, endpoint: str, columns: List[Dict
                 table=downstream_table_fqdn[2],
                 column=column["DOWNSTREAM_COLUMN_NAME"],
             )
-            downstream_column_global_id = new_global_id(
-                tenant_id=tenant_id, cluster_id=endpoint, data_id=global_id_arg, data_type="column"
-            )
+            downstream_column_global_id = global_id_factory.new_global_id(data_id=global_id_arg, data_type="column")
             upstream_columns: List[Dict[str, str]] = json.loads(column["UPSTREAM_COLUMNS"])
-            lineage_input = LineageInput(upstream=[])
+            upstream_global_id_args = list()
             for upstream_column in upstream_columns:
                 upstream_table_fqdn = upstream_column["upstream_table_name"].split(".")
                 if len(upstream_table_fqdn) != 3:
@@ -88,16 +124,17 @@ def gen_column_lineage_payload(tenant_id: str, endpoint: str, columns: List[Dict
                 elif not upstream_column.get("upstream_column_name"):
                     continue
                 else:
-                    upstream_global_id_arg = "{db}{schema}{table}{column}".format(
-                        db=upstream_table_fqdn[0],
-                        schema=upstream_table_fqdn[1],
-                        table=upstream_table_fqdn[2],
-                        column=upstream_column["upstream_column_name"],
-                    )
-                    upstream_column_global_id = new_global_id(
-                        tenant_id=tenant_id, cluster_id=endpoint, data_id=upstream_global_id_arg, data_type="column"
+                    upstream_global_id_args.append(
+                        "{db}{schema}{table}{column}".format(
+                            db=upstream_table_fqdn[0],
+                            schema=upstream_table_fqdn[1],
+                            table=upstream_table_fqdn[2],
+                            column=upstream_column["upstream_column_name"],
+                        )
                     )
-                    lineage_input.upstream.append(upstream_column_global_id)
+            lineage_input = LineageInput(
+                upstream=global_id_factory.new_global_ids(data_ids=upstream_global_id_args, data_type="column")
+            )
             lineage_inputs = LineageInputs(
                 downstream_global_id=downstream_column_global_id,
                 downstream_database_name=downstream_table_fqdn[0],
@@ -106,8 +143,55 @@ def gen_column_lineage_payload(tenant_id: str, endpoint: str, columns: List[Dict
                 downstream_column_name=column["DOWNSTREAM_COLUMN_NAME"],
                 upstreams=lineage_input,
             )
-            payload.append(lineage_inputs)
-    return payload
+            yield lineage_inputs
+
+
+def gen_lineage_requests(lineage_inputs: Iterable[LineageInputs]) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+    # Converts lineage inputs to (downstream global id, payload) tuples which QDCExternalAPIClient accepts.
+    for lineage_input in lineage_inputs:
+        if lineage_input.downstream_column_name:
+            logger.info(
+                "Generating column lineage. downstream: %s -> %s -> %s -> %s",
+                lineage_input.downstream_database_name,
+                lineage_input.downstream_schema_name,
+                lineage_input.downstream_table_name,
+                lineage_input.downstream_column_name,
+            )
+        else:
+            logger.info(
+                "Generating table lineage. downstream: %s -> %s -> %s",
+                lineage_input.downstream_database_name,
+                lineage_input.downstream_schema_name,
+                lineage_input.downstream_table_name,
+            )
+        yield lineage_input.downstream_global_id, lineage_input.upstreams.as_dict()
+
+
+def merge_lineage_inputs(lineage_inputs: Iterable[LineageInputs]) -> List[LineageInputs]:
+    # MEMO: A PUT overwrites the upstreams of the downstream asset. Union the upstreams of every input
+    # which has the same downstream so that one request per downstream keeps all of them.
+    merged: Dict[str, LineageInputs] = dict()
+    upstream_ids: Dict[str, Dict[str, None]] = dict()
+    input_count = 0
+    for lineage_input in lineage_inputs:
+        input_count += 1
+        global_id = lineage_input.downstream_global_id
+        if global_id not in merged:
+            merged[global_id] = LineageInputs(
+                downstream_global_id=global_id,
+                downstream_database_name=lineage_input.downstream_database_name,
+                downstream_schema_name=lineage_input.downstream_schema_name,
+                downstream_table_name=lineage_input.downstream_table_name,
+                downstream_column_name=lineage_input.downstream_column_name,
+                upstreams=LineageInput(upstream=[]),
+            )
+            upstream_ids[global_id] = dict()
+        # dict keeps the first seen order of upstreams unlike set.
+        upstream_ids[global_id].update(dict.fromkeys(lineage_input.upstreams.upstream))
+    for global_id, lineage_input in merged.items():
+        lineage_input.upstreams.upstream = list(upstream_ids[global_id])
+    logger.debug("%s lineage inputs are merged into %s downstreams.", input_count, len(merged))
+    return list(merged.values())
 
 
 def gen_table_lineage_payload_inputs(input_data: Tuple[List[str]]) -> List[Dict[str, Union[str, List[Dict[str, str]]]]]:
@@ -132,27 +216,37 @@ def gen_table_lineage_payload_inputs(input_data: Tuple[List[str]]) -> List[Dict[
     return list(result.values())
 
 
-def parse_snowflake_results(results: List[Dict[str, str]]):
-    payloads = list()
+def gen_sorted_table_lineage_payload_inputs(
+    input_data: Iterable[Tuple[str, str]],
+) -> Iterator[Dict[str, Union[str, List[Dict[str, str]]]]]:
+    """
+    Same as gen_table_lineage_payload_inputs, but expects rows sorted by the downstream table
+    and yields its upstreams as soon as the next downstream table comes.
+    """
+    for downstream_table_name, items in itertools.groupby(input_data, key=lambda item: item[0]):
+        yield {
+            "DOWNSTREAM_TABLE_NAME": downstream_table_name,
+            "UPSTREAM_TABLES": [{"upstream_object_name": item[1]} for item in items],
+        }
+
+
+def parse_snowflake_results(results: Iterable[Dict[str, str]]) -> Iterator[Dict[str, Union[str, List[Dict]]]]:
     for result in results:
         payload = dict()
         payload["DOWNSTREAM_TABLE_NAME"] = result["DOWNSTREAM_TABLE_NAME"]
         payload["DOWNSTREAM_TABLE_DOMAIN"] = result["DOWNSTREAM_TABLE_DOMAIN"]
         payload["UPSTREAM_TABLES"] = json.loads(result["UPSTREAM_TABLES"])
-        payloads.append(payload)
-    return payloads
+        yield payload
 
 
-def parse_databricks_table_lineage(results: List) -> List[Dict[str, Dict]]:
+def parse_databricks_table_lineage(results: Iterable) -> Iterator[Dict[str, Dict]]:
     # Parses results from Quollio Databricks lineage table
     # Returns tuple of downstream_table_name (0) and upstream_tables (1)
-    payloads = list()
     for result in results:
         payload = dict()
         payload["DOWNSTREAM_TABLE_NAME"] = result["DOWNSTREAM_TABLE_NAME"]
         payload["UPSTREAM_TABLES"] = json.loads(result["UPSTREAM_TABLES"])
-        payloads.append(payload)
-    return payloads
+        yield payload
 
 
 def parse_bigquery_table_lineage(tables: Dict) -> List[Dict[str, Dict]]:
@@ -1,14 +1,23 @@
+import itertools
 import logging
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from quollio_core.profilers.lineage import gen_table_lineage_payload, gen_table_lineage_payload_inputs
+from quollio_core.profilers.lineage import (
+    gen_lineage_requests,
+    gen_sorted_table_lineage_payload_inputs,
+    gen_table_lineage_payload,
+    merge_lineage_inputs,
+)
 from quollio_core.profilers.sqllineage import SQLLineage
 from quollio_core.profilers.stats import (
+    gen_stats_requests,
     gen_table_stats_payload_from_tuple,
     get_is_target_stats_items,
     render_sql_for_stats,
 )
 from quollio_core.repository import qdc, redshift
+from quollio_core.repository.outbox import Outbox
+from quollio_core.repository.parse_cache import ParseCache
 
 logger = logging.getLogger(__name__)
 
@@ -20,19 +29,26 @@ def redshift_table_level_lineage(
     dbt_table_name: str,
 ) -> None:
     with redshift.RedshiftQueryExecutor(config=conn) as redshift_executor:
-        results = redshift_executor.get_query_results(
-            query="""
+        # MEMO: Rows are fetched in chunks and ordered by the downstream table,
+        # so that the upstreams of a table are grouped without holding the whole lineage table.
+        results = itertools.chain.from_iterable(
+            redshift_executor.iter_query_results(
+                query="""
             SELECT
-                *
+                downstream_table_name
+                , upstream_table_name
             FROM
                 {db}.{schema}.{table}
+            ORDER BY
+                downstream_table_name
             """.format(
-                db=conn.database,
-                schema=conn.schema,
-                table=dbt_table_name,
+                    db=conn.database,
+                    schema=conn.schema,
+                    table=dbt_table_name,
+                )
             )
         )
-        lineage_payload_inputs = gen_table_lineage_payload_inputs(input_data=results)
+        lineage_payload_inputs = gen_sorted_table_lineage_payload_inputs(input_data=results)
 
         update_table_lineage_inputs = gen_table_lineage_payload(
             tenant_id=tenant_id,
@@ -41,18 +57,7 @@ def redshift_table_level_lineage(
         )
 
         req_count = 0
-        for update_table_lineage_input in update_table_lineage_inputs:
-            logger.info(
-                "Generating table lineage. downstream: {db} -> {schema} -> {table}".format(
-                    db=update_table_lineage_input.downstream_database_name,
-                    schema=update_table_lineage_input.downstream_schema_name,
-                    table=update_table_lineage_input.downstream_table_name,
-                )
-            )
-            status_code = qdc_client.update_lineage_by_id(
-                global_id=update_table_lineage_input.downstream_global_id,
-                payload=update_table_lineage_input.upstreams.as_dict(),
-            )
+        for _, status_code in qdc_client.update_lineage_by_ids(gen_lineage_requests(update_table_lineage_inputs)):
             if status_code == 200:
                 req_count += 1
         logger.info(f"Generating table lineage is finished. {req_count} lineages are ingested.")
@@ -82,48 +87,91 @@ def redshift_table_stats(
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
     stats_items: List[str],
+    outbox: Optional[Outbox] = None,
+    stats_source: str = "view",
 ) -> None:
     is_aggregate_items = get_is_target_stats_items(stats_items=stats_items)
     with redshift.RedshiftQueryExecutor(config=conn) as redshift_executor:
-        stats_query = _gen_get_stats_views_query(
-            db=conn.database,
-            schema=conn.schema,
-        )
-        stats_views = redshift_executor.get_query_results(query=stats_query)
-        logger.info("Found %s for table statistics.", len(stats_views))
+        if stats_source == "table":
+            stats_results = _get_materialized_stats_results(
+                redshift_executor=redshift_executor, conn=conn, is_aggregate_items=is_aggregate_items, outbox=outbox
+            )
+        else:
+            stats_results = _get_stats_views_results(
+                redshift_executor=redshift_executor, conn=conn, is_aggregate_items=is_aggregate_items, outbox=outbox
+            )
 
         req_count = 0
-        for stats_view in stats_views:
-            table_fqn = "{catalog}.{schema}.{table}".format(
-                catalog=stats_view[0], schema=stats_view[1], table=stats_view[2]
-            )
-            stats_query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn=table_fqn)
-            logger.debug(f"The following sql will be fetched to retrieve stats values. {stats_query}")
-            stats_result = redshift_executor.get_query_results(query=stats_query)
+        for table_fqn, stats_result in stats_results:
             payloads = gen_table_stats_payload_from_tuple(tenant_id=tenant_id, endpoint=conn.host, stats=stats_result)
-            for payload in payloads:
-                logger.info(
-                    "Generating table stats. asset: {db} -> {schema} -> {table} -> {column}".format(
-                        db=payload.db,
-                        schema=payload.schema,
-                        table=payload.table,
-                        column=payload.column,
-                    )
-                )
-                status_code = qdc_client.update_stats_by_id(
-                    global_id=payload.global_id,
-                    payload=payload.body.get_column_stats(),
-                )
+            is_all_ingested = True
+            for _, status_code in qdc_client.update_stats_by_ids(gen_stats_requests(payloads)):
                 if status_code == 200:
                     req_count += 1
+                else:
+                    is_all_ingested = False
+            if outbox is not None and is_all_ingested:
+                outbox.mark_unit_done(unit=table_fqn)
     logger.info(f"Generating table stats is finished. {req_count} stats are ingested.")
     return
 
 
+def _get_stats_views_results(
+    redshift_executor: redshift.RedshiftQueryExecutor,
+    conn: redshift.RedshiftConnectionConfig,
+    is_aggregate_items: Dict[str, bool],
+    outbox: Optional[Outbox] = None,
+) -> Iterator[Tuple[str, List[Tuple[str]]]]:
+    stats_query = _gen_get_stats_views_query(
+        db=conn.database,
+        schema=conn.schema,
+    )
+    stats_views = redshift_executor.get_query_results(query=stats_query)
+    logger.info("Found %s for table statistics.", len(stats_views))
+
+    for stats_view in stats_views:
+        table_fqn = "{catalog}.{schema}.{table}".format(
+            catalog=stats_view[0], schema=stats_view[1], table=stats_view[2]
+        )
+        if outbox is not None and outbox.is_unit_done(unit=table_fqn):
+            logger.info(f"Skip {table_fqn} because its stats were ingested before the resume.")
+            continue
+        stats_query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn=table_fqn)
+        logger.debug(f"The following sql will be fetched to retrieve stats values. {stats_query}")
+        yield (table_fqn, redshift_executor.get_query_results(query=stats_query))
+
+
+def _get_materialized_stats_results(
+    redshift_executor: redshift.RedshiftQueryExecutor,
+    conn: redshift.RedshiftConnectionConfig,
+    is_aggregate_items: Dict[str, bool],
+    outbox: Optional[Outbox] = None,
+) -> Iterator[Tuple[str, List[Tuple[str]]]]:
+    # MEMO: The stats table is built by `divided_view` with `stats_materialization: table`.
+    # All stats are read with one query, then grouped by the profiled table to keep the same unit as views.
+    stats_table_fqn = "{db}.{schema}.quollio_stats_columns".format(db=conn.database, schema=conn.schema)
+    stats_query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn=stats_table_fqn)
+    logger.debug(f"The following sql will be fetched to retrieve stats values. {stats_query}")
+    stats_result = redshift_executor.get_query_results(query=stats_query)
+
+    stats_per_table: Dict[str, List[Tuple[str]]] = dict()
+    for stat in stats_result:
+        table_fqn = "{db}.{schema}.{table}".format(db=stat[0], schema=stat[1], table=stat[2])
+        stats_per_table.setdefault(table_fqn, []).append(stat)
+    logger.info("Found precomputed stats of %s tables in %s.", len(stats_per_table), stats_table_fqn)
+    for table_fqn, stats in stats_per_table.items():
+        if outbox is not None and outbox.is_unit_done(unit=table_fqn):
+            logger.info(f"Skip {table_fqn} because its stats were ingested before the resume.")
+            continue
+        yield (table_fqn, stats)
+
+
 def redshift_table_level_sqllineage(
     conn: redshift.RedshiftConnectionConfig,
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
+    parse_cache: Optional[ParseCache] = None,
+    parse_processes: int = 1,
 ) -> None:
     redshift_connector = redshift.RedshiftQueryExecutor(conn)
     results = redshift_connector.get_query_results(
@@ -140,32 +188,22 @@ def redshift_table_level_sqllineage(
         )
     )
     update_table_lineage_inputs_list = list()
-    sql_lineage = SQLLineage()
-    for result in results:
-        src_tables, dest_table = sql_lineage.get_table_level_lineage_source(
-            sql=result[2],
-            dialect="redshift",
-            dest_db=result[0],
-            dest_schema=result[1],
-        )
+    sql_lineage = SQLLineage(cache=parse_cache)
+    statements = [
+        dict(sql=result[2], dialect="redshift", dest_db=result[0], dest_schema=result[1]) for result in results
+    ]
+    for _, src_tables, dest_table in sql_lineage.get_table_level_lineage_sources(
+        statements=statements, processes=parse_processes
+    ):
         update_table_lineage_inputs = sql_lineage.gen_lineage_input(
             tenant_id=tenant_id, endpoint=conn.host, src_tables=src_tables, dest_table=dest_table
         )
         update_table_lineage_inputs_list.append(update_table_lineage_inputs)
 
     req_count = 0
-    for update_table_lineage_input in update_table_lineage_inputs_list:
-        logger.info(
-            "Generating table lineage. downstream: {db} -> {schema} -> {table}".format(
-                db=update_table_lineage_input.downstream_database_name,
-                schema=update_table_lineage_input.downstream_schema_name,
-                table=update_table_lineage_input.downstream_table_name,
-            )
-        )
-        status_code = qdc_client.update_lineage_by_id(
-            global_id=update_table_lineage_input.downstream_global_id,
-            payload=update_table_lineage_input.upstreams.as_dict(),
-        )
+    for _, status_code in qdc_client.update_lineage_by_ids(
+        gen_lineage_requests(merge_lineage_inputs(update_table_lineage_inputs_list))
+    ):
         if status_code == 200:
             req_count += 1
     logger.info(f"Generating table lineage is finished. {req_count} lineages are ingested.")
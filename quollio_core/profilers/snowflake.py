@@ -1,14 +1,27 @@
+import itertools
 import logging
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from quollio_core.helper.core import get_record_batch_columns
 from quollio_core.profilers.lineage import (
     gen_column_lineage_payload,
+    gen_lineage_requests,
     gen_table_lineage_payload,
+    gen_table_lineage_payload_from_record_batches,
+    merge_lineage_inputs,
     parse_snowflake_results,
 )
 from quollio_core.profilers.sqllineage import SQLLineage
-from quollio_core.profilers.stats import gen_table_stats_payload, get_is_target_stats_items, render_sql_for_stats
+from quollio_core.profilers.stats import (
+    gen_stats_requests,
+    gen_table_stats_payload,
+    gen_table_stats_payload_from_record_batches,
+    get_is_target_stats_items,
+    render_sql_for_stats,
+)
 from quollio_core.repository import qdc, snowflake
+from quollio_core.repository.outbox import Outbox
+from quollio_core.repository.parse_cache import ParseCache
 
 logger = logging.getLogger(__name__)
 
@@ -17,106 +30,150 @@ def snowflake_table_to_table_lineage(
     conn: snowflake.SnowflakeConnectionConfig,
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
-) -> None:
+    since: Optional[str] = None,
+    use_arrow: bool = False,
+) -> Optional[str]:
+    """
+    Upload table lineage changed after `since` (all lineage if it's None), and return the latest
+    LAST_CHANGED_AT of the uploaded lineage when all of them are ingested. It's the `since` of the next run.
+    With `use_arrow`, the lineage is fetched as Arrow record batches instead of a dict per row.
+    """
     with snowflake.SnowflakeQueryExecutor(conn) as sf_executor:
-        results, err = sf_executor.get_query_results(
-            query="""
-            SELECT
-                *
-            FROM
-               {db}.{schema}.QUOLLIO_LINEAGE_TABLE_LEVEL
-            """.format(
-                db=conn.account_database,
-                schema=conn.account_schema,
+        # MEMO: Rows are fetched in chunks and uploaded as they are converted,
+        # so the whole lineage table is never held in memory.
+        query = _gen_get_lineage_query(conn=conn, table="QUOLLIO_LINEAGE_TABLE_LEVEL", since=since)
+        if use_arrow:
+            results = sf_executor.iter_record_batches(query=query)
+        else:
+            results = _iter_query_rows(sf_executor=sf_executor, query=query)
+        first_result = next(results, None)
+        if first_result is None:
+            _warn_no_lineage(table="QUOLLIO_LINEAGE_TABLE_LEVEL", since=since)
+            return None
+        last_changed_at = LastChangedAt()
+        if use_arrow:
+            update_table_lineage_inputs = gen_table_lineage_payload_from_record_batches(
+                tenant_id=tenant_id,
+                endpoint=conn.account_id,
+                batches=last_changed_at.observe_batches(itertools.chain([first_result], results)),
             )
-        )
-        if err is not None:
-            handle_error(err=err)
-        if len(results) == 0:
-            logger.warning(
-                "No lineage data in ACCOUNT_USAGE.SNOWFLAKE. Please check the data in `QUOLLIO_LINEAGE_TABLE_LEVEL`."
+        else:
+            parsed_results = parse_snowflake_results(
+                results=last_changed_at.observe(itertools.chain([first_result], results))
+            )
+            update_table_lineage_inputs = gen_table_lineage_payload(
+                tenant_id=tenant_id,
+                endpoint=conn.account_id,
+                tables=parsed_results,
             )
-            return
-        parsed_results = parse_snowflake_results(results=results)
-        update_table_lineage_inputs = gen_table_lineage_payload(
-            tenant_id=tenant_id,
-            endpoint=conn.account_id,
-            tables=parsed_results,
-        )
 
         req_count = 0
-        for update_table_lineage_input in update_table_lineage_inputs:
-            logger.info(
-                "Generating table lineage. downstream: {db} -> {schema} -> {table}".format(
-                    db=update_table_lineage_input.downstream_database_name,
-                    schema=update_table_lineage_input.downstream_schema_name,
-                    table=update_table_lineage_input.downstream_table_name,
-                )
-            )
-            status_code = qdc_client.update_lineage_by_id(
-                global_id=update_table_lineage_input.downstream_global_id,
-                payload=update_table_lineage_input.upstreams.as_dict(),
-            )
+        is_all_ingested = True
+        for _, status_code in qdc_client.update_lineage_by_ids(gen_lineage_requests(update_table_lineage_inputs)):
             if status_code == 200:
                 req_count += 1
+            else:
+                is_all_ingested = False
         logger.info(f"Generating table lineage is finished. {req_count} lineages are ingested.")
-    return
+    return last_changed_at.checkpoint() if is_all_ingested else None
 
 
 def snowflake_column_to_column_lineage(
     conn: snowflake.SnowflakeConnectionConfig,
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
-) -> None:
+    since: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Upload column lineage changed after `since` (all lineage if it's None), and return the latest
+    LAST_CHANGED_AT of the uploaded lineage when all of them are ingested.
+    """
     with snowflake.SnowflakeQueryExecutor(conn) as sf_executor:
-        results, err = sf_executor.get_query_results(
-            query="""
-            SELECT
-                *
-            FROM
-                {db}.{schema}.QUOLLIO_LINEAGE_COLUMN_LEVEL
-            """.format(
-                db=conn.account_database,
-                schema=conn.account_schema,
-            )
+        results = _iter_query_rows(
+            sf_executor=sf_executor,
+            query=_gen_get_lineage_query(conn=conn, table="QUOLLIO_LINEAGE_COLUMN_LEVEL", since=since),
         )
-        if err is not None:
-            handle_error(err=err)
-        if len(results) == 0:
-            logger.warning(
-                "No lineage data in ACCOUNT_USAGE.SNOWFLAKE. Please check the data in `QUOLLIO_LINEAGE_COLUMN_LEVEL`."
-            )
-            return
+        first_result = next(results, None)
+        if first_result is None:
+            _warn_no_lineage(table="QUOLLIO_LINEAGE_COLUMN_LEVEL", since=since)
+            return None
+        last_changed_at = LastChangedAt()
         update_column_lineage_inputs = gen_column_lineage_payload(
             tenant_id=tenant_id,
             endpoint=conn.account_id,
-            columns=results,
+            columns=last_changed_at.observe(itertools.chain([first_result], results)),
         )
 
         req_count = 0
-        for update_column_lineage_input in update_column_lineage_inputs:
-            logger.info(
-                "Generating column lineage. downstream: {db} -> {schema} -> {table} -> {column}".format(
-                    db=update_column_lineage_input.downstream_database_name,
-                    schema=update_column_lineage_input.downstream_schema_name,
-                    table=update_column_lineage_input.downstream_table_name,
-                    column=update_column_lineage_input.downstream_column_name,
-                )
-            )
-            status_code = qdc_client.update_lineage_by_id(
-                global_id=update_column_lineage_input.downstream_global_id,
-                payload=update_column_lineage_input.upstreams.as_dict(),
-            )
+        is_all_ingested = True
+        for _, status_code in qdc_client.update_lineage_by_ids(gen_lineage_requests(update_column_lineage_inputs)):
             if status_code == 200:
                 req_count += 1
+            else:
+                is_all_ingested = False
         logger.info(f"Generating column lineage is finished. {req_count} lineages are ingested.")
-    return
+    return last_changed_at.checkpoint() if is_all_ingested else None
+
+
+class LastChangedAt:
+    """
+    Keeps the latest LAST_CHANGED_AT of lineage rows which pass through `observe`.
+    """
+
+    def __init__(self) -> None:
+        self.value = None
+
+    def observe(self, rows: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+        for row in rows:
+            self._update(row.get("LAST_CHANGED_AT"))
+            yield row
+
+    def observe_batches(self, batches: Iterable[Any]) -> Iterator[Any]:
+        for batch in batches:
+            if "LAST_CHANGED_AT" in [name.upper() for name in batch.schema.names]:
+                for changed_at in get_record_batch_columns(batch, ["LAST_CHANGED_AT"])[0]:
+                    self._update(changed_at)
+            yield batch
+
+    def _update(self, changed_at: Any) -> None:
+        if changed_at is not None and (self.value is None or changed_at > self.value):
+            self.value = changed_at
+
+    def checkpoint(self) -> Optional[str]:
+        if self.value is None:
+            return None
+        return self.value.isoformat() if hasattr(self.value, "isoformat") else str(self.value)
+
+
+def _gen_get_lineage_query(conn: snowflake.SnowflakeConnectionConfig, table: str, since: Optional[str] = None) -> str:
+    query = """
+            SELECT
+                *
+            FROM
+                {db}.{schema}.{table}
+            """.format(
+        db=conn.account_database,
+        schema=conn.account_schema,
+        table=table,
+    )
+    if since is not None:
+        query += "WHERE LAST_CHANGED_AT > '{since}'::TIMESTAMP_LTZ".format(since=since)
+    return query
+
+
+def _warn_no_lineage(table: str, since: Optional[str] = None) -> None:
+    if since is not None:
+        logger.info(f"No lineage in `{table}` is changed since {since}.")
+        return
+    logger.warning(f"No lineage data in ACCOUNT_USAGE.SNOWFLAKE. Please check the data in `{table}`.")
 
 
 def snowflake_table_level_sqllineage(
     conn: snowflake.SnowflakeConnectionConfig,
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
+    parse_cache: Optional[ParseCache] = None,
+    parse_processes: int = 1,
 ) -> None:
     with snowflake.SnowflakeQueryExecutor(conn) as sf_executor:
         results, err = sf_executor.get_query_results(
@@ -140,32 +197,28 @@ def snowflake_table_level_sqllineage(
             )
             return
         update_table_lineage_inputs_list = list()
-        sql_lineage = SQLLineage()
-        for result in results:
-            src_tables, dest_table = sql_lineage.get_table_level_lineage_source(
+        sql_lineage = SQLLineage(cache=parse_cache)
+        statements = [
+            dict(
                 sql=result["QUERY_TEXT"],
                 dialect="snowflake",
                 dest_db=result["DATABASE_NAME"],
                 dest_schema=result["SCHEMA_NAME"],
             )
+            for result in results
+        ]
+        for _, src_tables, dest_table in sql_lineage.get_table_level_lineage_sources(
+            statements=statements, processes=parse_processes
+        ):
             update_table_lineage_inputs = sql_lineage.gen_lineage_input(
                 tenant_id=tenant_id, endpoint=conn.account_id, src_tables=src_tables, dest_table=dest_table
             )
             update_table_lineage_inputs_list.append(update_table_lineage_inputs)
 
         req_count = 0
-        for update_table_lineage_input in update_table_lineage_inputs_list:
-            logger.info(
-                "Generating table lineage. downstream: {db} -> {schema} -> {table}".format(
-                    db=update_table_lineage_input.downstream_database_name,
-                    schema=update_table_lineage_input.downstream_schema_name,
-                    table=update_table_lineage_input.downstream_table_name,
-                )
-            )
-            status_code = qdc_client.update_lineage_by_id(
-                global_id=update_table_lineage_input.downstream_global_id,
-                payload=update_table_lineage_input.upstreams.as_dict(),
-            )
+        for _, status_code in qdc_client.update_lineage_by_ids(
+            gen_lineage_requests(merge_lineage_inputs(update_table_lineage_inputs_list))
+        ):
             if status_code == 200:
                 req_count += 1
         logger.info(f"Generating table lineage is finished. {req_count} lineages are ingested.")
@@ -177,31 +230,27 @@ def snowflake_table_stats(
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
     stats_items: List[str],
+    outbox: Optional[Outbox] = None,
+    concurrency: int = 1,
+    stats_source: str = "view",
+    use_arrow: bool = False,
 ) -> None:
     with snowflake.SnowflakeQueryExecutor(conn) as sf_executor:
-        get_stats_view_query = _gen_get_stats_views_query(
-            db=conn.account_database,
-            schema=conn.account_schema,
-        )
-        stats_views, err = sf_executor.get_query_results(query=get_stats_view_query)
-        if err is not None:
-            handle_error(err=err)
-        if len(stats_views) == 0:
-            logger.warning(
-                f"No target table for stats aggregation. Please see the error message above \
-and fix it or grant usage permission to both `{conn.account_database}` and `{conn.account_schema}` \
-and select permissions to views begins with `QUOLLIO_STATS_COLUMNS_`."
-            )
-            return
-        req_count = 0
         is_aggregate_items = get_is_target_stats_items(stats_items=stats_items)
-        for stats_view in stats_views:
-            table_fqn = '"{catalog}"."{schema}"."{table}"'.format(
-                catalog=stats_view["TABLE_CATALOG"], schema=stats_view["TABLE_SCHEMA"], table=stats_view["TABLE_NAME"]
+        if stats_source == "table":
+            # MEMO: The rows of the stats table are grouped by table as dicts, so they are not fetched as Arrow.
+            use_arrow = False
+            stats_results = _get_materialized_stats_results(
+                sf_executor=sf_executor, conn=conn, is_aggregate_items=is_aggregate_items, outbox=outbox
+            )
+        else:
+            stats_queries = _gen_stats_queries(
+                sf_executor=sf_executor, conn=conn, is_aggregate_items=is_aggregate_items, outbox=outbox
             )
-            stats_query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn=table_fqn)
-            logger.debug(f"The following sql will be fetched to retrieve stats values. {stats_query}")
-            stats_result, err = sf_executor.get_query_results(query=stats_query)
+            stats_results = _get_stats_results(sf_executor, stats_queries, concurrency, use_arrow)
+
+        req_count = 0
+        for table_fqn, stats_result, err in stats_results:
             if err is not None:
                 handle_error(err=err, force_skip=True)
             if len(stats_result) == 0:
@@ -210,26 +259,117 @@ and select permissions to views begins with `QUOLLIO_STATS_COLUMNS_`."
 or user has select permission to it."
                 )
                 continue
-            payloads = gen_table_stats_payload(tenant_id=tenant_id, endpoint=conn.account_id, stats=stats_result)
-            for payload in payloads:
-                logger.info(
-                    "Generating table stats. asset: {db} -> {schema} -> {table} -> {column}".format(
-                        db=payload.db,
-                        schema=payload.schema,
-                        table=payload.table,
-                        column=payload.column,
-                    )
-                )
-                status_code = qdc_client.update_stats_by_id(
-                    global_id=payload.global_id,
-                    payload=payload.body.get_column_stats(),
+            if use_arrow:
+                payloads = gen_table_stats_payload_from_record_batches(
+                    tenant_id=tenant_id, endpoint=conn.account_id, batches=stats_result
                 )
+            else:
+                payloads = gen_table_stats_payload(tenant_id=tenant_id, endpoint=conn.account_id, stats=stats_result)
+            is_all_ingested = True
+            for _, status_code in qdc_client.update_stats_by_ids(gen_stats_requests(payloads)):
                 if status_code == 200:
                     req_count += 1
+                else:
+                    is_all_ingested = False
+            if outbox is not None and is_all_ingested:
+                outbox.mark_unit_done(unit=table_fqn)
         logger.info(f"Generating table stats is finished. {req_count} stats are ingested.")
     return
 
 
+def _gen_stats_queries(
+    sf_executor: snowflake.SnowflakeQueryExecutor,
+    conn: snowflake.SnowflakeConnectionConfig,
+    is_aggregate_items: Dict[str, bool],
+    outbox: Optional[Outbox] = None,
+) -> Dict[str, str]:
+    get_stats_view_query = _gen_get_stats_views_query(
+        db=conn.account_database,
+        schema=conn.account_schema,
+    )
+    stats_views, err = sf_executor.get_query_results(query=get_stats_view_query)
+    if err is not None:
+        handle_error(err=err)
+    if len(stats_views) == 0:
+        logger.warning(
+            f"No target table for stats aggregation. Please see the error message above \
+and fix it or grant usage permission to both `{conn.account_database}` and `{conn.account_schema}` \
+and select permissions to views begins with `QUOLLIO_STATS_COLUMNS_`."
+        )
+        return dict()
+    stats_queries = dict()
+    for stats_view in stats_views:
+        table_fqn = '"{catalog}"."{schema}"."{table}"'.format(
+            catalog=stats_view["TABLE_CATALOG"], schema=stats_view["TABLE_SCHEMA"], table=stats_view["TABLE_NAME"]
+        )
+        if outbox is not None and outbox.is_unit_done(unit=table_fqn):
+            logger.info(f"Skip {table_fqn} because its stats were ingested before the resume.")
+            continue
+        stats_query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn=table_fqn)
+        logger.debug(f"The following sql will be fetched to retrieve stats values. {stats_query}")
+        stats_queries[table_fqn] = stats_query
+    return stats_queries
+
+
+def _get_stats_results(
+    sf_executor: snowflake.SnowflakeQueryExecutor,
+    stats_queries: Dict[str, str],
+    concurrency: int,
+    use_arrow: bool = False,
+) -> Iterator[Tuple[str, List[Any], Exception]]:
+    # MEMO: Each result is a list of Arrow record batches with `use_arrow`, or a list of dicts without it.
+    if concurrency <= 1:
+        for table_fqn, stats_query in stats_queries.items():
+            if use_arrow:
+                stats_result, err = _get_record_batches(sf_executor=sf_executor, query=stats_query)
+            else:
+                stats_result, err = sf_executor.get_query_results(query=stats_query)
+            yield (table_fqn, stats_result, err)
+        return
+    # MEMO: Stats queries are submitted as async queries so that a multi-cluster warehouse can run them in parallel.
+    logger.info(f"Stats queries are executed with concurrency {concurrency}.")
+    yield from sf_executor.get_query_results_concurrently(
+        queries=stats_queries, concurrency=concurrency, as_arrow=use_arrow
+    )
+
+
+def _get_record_batches(sf_executor: snowflake.SnowflakeQueryExecutor, query: str) -> Tuple[List[Any], Exception]:
+    try:
+        return (list(sf_executor.iter_record_batches(query=query)), None)
+    except Exception as e:
+        return ([], e)
+
+
+def _get_materialized_stats_results(
+    sf_executor: snowflake.SnowflakeQueryExecutor,
+    conn: snowflake.SnowflakeConnectionConfig,
+    is_aggregate_items: Dict[str, bool],
+    outbox: Optional[Outbox] = None,
+) -> Iterator[Tuple[str, List[Dict[str, str]], Exception]]:
+    # MEMO: The stats table is built by `divided_view` with `stats_materialization: table`.
+    # All stats are read with one query, then grouped by the profiled table to keep the same unit as views.
+    stats_table_fqn = "{db}.{schema}.QUOLLIO_STATS_COLUMNS".format(db=conn.account_database, schema=conn.account_schema)
+    stats_query = render_sql_for_stats(is_aggregate_items=is_aggregate_items, table_fqn=stats_table_fqn)
+    logger.debug(f"The following sql will be fetched to retrieve stats values. {stats_query}")
+    stats_result, err = sf_executor.get_query_results(query=stats_query)
+    if err is not None:
+        yield (stats_table_fqn, [], err)
+        return
+
+    stats_per_table: Dict[str, List[Dict[str, str]]] = dict()
+    for stat in stats_result:
+        table_fqn = '"{db}"."{schema}"."{table}"'.format(
+            db=stat["DB_NAME"], schema=stat["SCHEMA_NAME"], table=stat["TABLE_NAME"]
+        )
+        stats_per_table.setdefault(table_fqn, []).append(stat)
+    logger.info(f"Found precomputed stats of {len(stats_per_table)} tables in {stats_table_fqn}.")
+    for table_fqn, stats in stats_per_table.items():
+        if outbox is not None and outbox.is_unit_done(unit=table_fqn):
+            logger.info(f"Skip {table_fqn} because its stats were ingested before the resume.")
+            continue
+        yield (table_fqn, stats, None)
+
+
 def _gen_get_stats_views_query(db: str, schema: str) -> str:
     query = """
         SELECT
@@ -248,6 +388,14 @@ def _gen_get_stats_views_query(db: str, schema: str) -> str:
     return query
 
 
+def _iter_query_rows(sf_executor: snowflake.SnowflakeQueryExecutor, query: str) -> Iterator[Dict[str, str]]:
+    for rows, err in sf_executor.iter_query_results(query=query):
+        if err is not None:
+            handle_error(err=err)
+            return
+        yield from rows
+
+
 def handle_error(err: Exception, force_skip: bool = False):
     if err.errno == 2037:
         logger.warning(
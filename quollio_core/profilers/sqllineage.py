@@ -1,14 +1,18 @@
 import functools
 import logging
-from typing import List, Optional, Set, Tuple
+import multiprocessing
+import os
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 import sqlglot
+from blake3 import blake3
 from pydantic import BaseModel
 from sqlglot import exp, optimizer
 from sqlglot.errors import ParseError
 
 from quollio_core.helper.core import new_global_id
 from quollio_core.profilers.lineage import LineageInput, LineageInputs
+from quollio_core.repository.parse_cache import ParseCache
 
 logger = logging.getLogger(__name__)
 
@@ -42,8 +46,9 @@ class Table(_FrozenModel):
 
 
 class SQLLineage:
-    def __init__(self):
+    def __init__(self, cache: Optional[ParseCache] = None):
         self.dialects_use_uppercase_normally = ["oracle", "snowflake"]
+        self.cache = cache
 
     def get_table_level_lineage_source(
         self,
@@ -54,17 +59,121 @@ class SQLLineage:
         dest_db: str = None,
         dest_schema: str = None,
     ) -> Tuple[Set[Table], Table]:
-        try:
-            statement: sqlglot.Expression = sqlglot.parse_one(sql=sql, error_level=sqlglot.ErrorLevel.RAISE)
-        except ParseError as e:
-            logger.error("SQL parse error.\nSQL statement:{sql} \nError:{err}\n".format(sql=sql, err=e))
-            raise
+        src_db, src_schema, dest_db, dest_schema = self._normalize_names(
+            dialect, src_db, src_schema, dest_db, dest_schema
+        )
+        if self.cache is None:
+            return self._parse_table_level_lineage_source(sql, dialect, src_db, src_schema, dest_db, dest_schema)
+
+        # MEMO: Scheduled ETL statements are the same run by run. Skip sqlglot if the statement was resolved before.
+        cache_key = gen_parse_cache_key(sql, dialect, src_db, src_schema, dest_db, dest_schema)
+        cached = self.cache.get(key=cache_key)
+        if cached is not None:
+            return _from_compact(cached["src"], cached["dest"])
+
+        source_tables, dest_table = self._parse_table_level_lineage_source(
+            sql, dialect, src_db, src_schema, dest_db, dest_schema
+        )
+        compact_src, compact_dest = _to_compact(source_tables, dest_table)
+        self.cache.put(key=cache_key, value={"src": compact_src, "dest": compact_dest})
+        return source_tables, dest_table
 
+    def get_table_level_lineage_sources(
+        self,
+        statements: List[Dict[str, str]],
+        processes: int = 1,
+        chunksize: int = 64,
+        ordered: bool = True,
+    ) -> Iterator[Tuple[int, Set[Table], Table]]:
+        """
+        Resolve the lineage of many statements and yield (index of the statement, source tables, dest table).
+        Each statement is a dict of the arguments of `get_table_level_lineage_source`.
+        Statements which are not in the cache are parsed by `processes` worker processes (0 means all cores),
+        and the results are yielded in the input order if `ordered`, otherwise as soon as they are parsed.
+        """
+        cached_results: Dict[int, Tuple[Set[Table], Table]] = dict()
+        cache_keys: Dict[int, str] = dict()
+        tasks: List[Tuple[int, Tuple]] = list()
+        for index, statement in enumerate(statements):
+            dialect = statement["dialect"]
+            names = self._normalize_names(
+                dialect,
+                statement.get("src_db"),
+                statement.get("src_schema"),
+                statement.get("dest_db"),
+                statement.get("dest_schema"),
+            )
+            task = (statement["sql"], dialect) + names
+            if self.cache is not None:
+                cache_keys[index] = gen_parse_cache_key(*task)
+                cached = self.cache.get(key=cache_keys[index])
+                if cached is not None:
+                    if ordered:
+                        cached_results[index] = _from_compact(cached["src"], cached["dest"])
+                    else:
+                        yield (index,) + _from_compact(cached["src"], cached["dest"])
+                    continue
+            tasks.append((index, task))
+
+        processes = processes or os.cpu_count() or 1
+        if processes <= 1 or len(tasks) <= 1:
+            yield from self.__collect(map(_parse_in_worker, tasks), cached_results, cache_keys)
+            return
+
+        logger.info("Parse %s statements with %s processes.", len(tasks), processes)
+        # MEMO: spawn doesn't inherit the locks of the parent threads (e.g. DB connectors), which fork may deadlock on.
+        with multiprocessing.get_context("spawn").Pool(processes=processes) as pool:
+            imap = pool.imap if ordered else pool.imap_unordered
+            parsed = imap(_parse_in_worker, tasks, chunksize=chunksize)
+            yield from self.__collect(parsed, cached_results, cache_keys)
+
+    def __collect(
+        self,
+        parsed: Iterator[Tuple[int, Optional[List[List[str]]], Optional[List[str]], Optional[str]]],
+        cached_results: Dict[int, Tuple[Set[Table], Table]],
+        cache_keys: Dict[int, str],
+    ) -> Iterator[Tuple[int, Set[Table], Table]]:
+        # MEMO: cached_results is empty unless the order is kept.
+        # Then, the cached results before each parsed statement are yielded first.
+        cached_indexes = iter(sorted(cached_results))
+        next_cached_index = next(cached_indexes, None)
+        for index, compact_src, compact_dest, err in parsed:
+            while next_cached_index is not None and next_cached_index < index:
+                yield (next_cached_index,) + cached_results[next_cached_index]
+                next_cached_index = next(cached_indexes, None)
+            if err is not None:
+                raise ParseError(err)
+            if index in cache_keys:
+                self.cache.put(key=cache_keys[index], value={"src": compact_src, "dest": compact_dest})
+            yield (index,) + _from_compact(compact_src, compact_dest)
+        while next_cached_index is not None:
+            yield (next_cached_index,) + cached_results[next_cached_index]
+            next_cached_index = next(cached_indexes, None)
+
+    def _normalize_names(
+        self, dialect: str, src_db: str = None, src_schema: str = None, dest_db: str = None, dest_schema: str = None
+    ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
         if dialect in self.dialects_use_uppercase_normally:
             src_db = src_db.upper() if src_db is not None else None
             src_schema = src_schema.upper() if src_schema is not None else None
             dest_db = dest_db.upper() if dest_db is not None else None
             dest_schema = dest_schema.upper() if dest_schema is not None else None
+        return src_db, src_schema, dest_db, dest_schema
+
+    def _parse_table_level_lineage_source(
+        self,
+        sql: str,
+        dialect: str,
+        src_db: str = None,
+        src_schema: str = None,
+        dest_db: str = None,
+        dest_schema: str = None,
+    ) -> Tuple[Set[Table], Table]:
+        try:
+            statement: sqlglot.Expression = sqlglot.parse_one(sql=sql, error_level=sqlglot.ErrorLevel.RAISE)
+        except ParseError as e:
+            logger.error("SQL parse error.\nSQL statement:{sql} \nError:{err}\n".format(sql=sql, err=e))
+            raise
 
         # MEMO: Complement sql with dialect, source database and source schema info.
         optimized_stmt: sqlglot.Expression = optimizer.qualify.qualify(
@@ -129,3 +238,44 @@ class SQLLineage:
             upstreams=lineage_input,
         )
         return lineage_inputs
+
+
+def gen_parse_cache_key(
+    sql: str,
+    dialect: str,
+    src_db: str = None,
+    src_schema: str = None,
+    dest_db: str = None,
+    dest_schema: str = None,
+) -> str:
+    # MEMO: Whitespaces don't change the lineage, so collapse them to share the cache among reformatted statements.
+    normalized_sql = " ".join(sql.split())
+    key = "\x1f".join([normalized_sql, dialect, src_db or "", src_schema or "", dest_db or "", dest_schema or ""])
+    return blake3(key.encode()).hexdigest()
+
+
+def _to_compact(source_tables: Set[Table], dest_table: Table) -> Tuple[List[List[str]], List[str]]:
+    return [[t.db, t.db_schema, t.table] for t in source_tables], [
+        dest_table.db,
+        dest_table.db_schema,
+        dest_table.table,
+    ]
+
+
+def _from_compact(compact_src: List[List[str]], compact_dest: List[str]) -> Tuple[Set[Table], Table]:
+    source_tables = {Table(db=t[0], db_schema=t[1], table=t[2]) for t in compact_src}
+    return source_tables, Table(db=compact_dest[0], db_schema=compact_dest[1], table=compact_dest[2])
+
+
+def _parse_in_worker(
+    indexed_task: Tuple[int, Tuple],
+) -> Tuple[int, Optional[List[List[str]]], Optional[List[str]], Optional[str]]:
+    # MEMO: Return plain lists instead of pydantic models to keep the pickled results small.
+    index, (sql, dialect, src_db, src_schema, dest_db, dest_schema) = indexed_task
+    try:
+        source_tables, dest_table = SQLLineage()._parse_table_level_lineage_source(
+            sql, dialect, src_db, src_schema, dest_db, dest_schema
+        )
+    except ParseError as e:
+        return index, None, None, str(e)
+    return (index,) + _to_compact(source_tables, dest_table) + (None,)
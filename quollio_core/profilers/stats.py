@@ -1,11 +1,11 @@
 import logging
 from dataclasses import asdict, dataclass, fields
 from decimal import ROUND_HALF_UP, Decimal
-from typing import Dict, List, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 from jinja2 import Template
 
-from quollio_core.helper.core import new_global_id
+from quollio_core.helper.core import get_record_batch_columns, new_global_id
 
 logger = logging.getLogger(__name__)
 
@@ -70,8 +70,7 @@ def convert_value_type(obj, cast_str: bool = False):
     return obj
 
 
-def gen_table_stats_payload(tenant_id: str, endpoint: str, stats: List[Dict[str, str]]) -> List[StatsRequest]:
-    payloads = list()
+def gen_table_stats_payload(tenant_id: str, endpoint: str, stats: Iterable[Dict[str, str]]) -> Iterator[StatsRequest]:
     for stat in stats:
         db_name = stat.get("DB_NAME", stat.get("db_name"))
         schema_name = stat.get("SCHEMA_NAME", stat.get("schema_name"))
@@ -107,14 +106,12 @@ def gen_table_stats_payload(tenant_id: str, endpoint: str, stats: List[Dict[str,
                 table_stats=TableStatsInput(count=0, size=0.0),
             ),
         )
-        payloads.append(stats_request)
-    return payloads
+        yield stats_request
 
 
 def gen_table_stats_payload_from_tuple(
-    tenant_id: str, endpoint: str, stats: Tuple[List[str]]
-) -> List[Dict[str, Union[str, List[Dict[str, str]]]]]:
-    payloads = list()
+    tenant_id: str, endpoint: str, stats: Iterable[Tuple[str]]
+) -> Iterator[StatsRequest]:
     for stat in stats:
         global_id_arg = "{db}{schema}{table}{column}".format(db=stat[0], schema=stat[1], table=stat[2], column=stat[3])
         table_global_id = new_global_id(
@@ -143,8 +140,54 @@ def gen_table_stats_payload_from_tuple(
                 table_stats=TableStatsInput(count=0, size=0.0),
             ),
         )
-        payloads.append(stats_request)
-    return payloads
+        yield stats_request
+
+
+# MEMO: The column order which gen_table_stats_payload_from_tuple expects.
+STATS_COLUMNS = [
+    "DB_NAME",
+    "SCHEMA_NAME",
+    "TABLE_NAME",
+    "COLUMN_NAME",
+    "MAX_VALUE",
+    "MIN_VALUE",
+    "NULL_COUNT",
+    "CARDINALITY",
+    "AVG_VALUE",
+    "MEDIAN_VALUE",
+    "MODE_VALUE",
+    "STDDEV_VALUE",
+]
+
+
+def gen_table_stats_payload_from_record_batches(
+    tenant_id: str, endpoint: str, batches: Iterable[Any]
+) -> Iterator[StatsRequest]:
+    """
+    Same as gen_table_stats_payload, but reads the stats columns of Arrow record batches directly
+    and zips them into tuples instead of building a dict per row.
+    """
+    for batch in batches:
+        columns = get_record_batch_columns(batch, STATS_COLUMNS)
+        yield from gen_table_stats_payload_from_tuple(tenant_id=tenant_id, endpoint=endpoint, stats=zip(*columns))
+
+
+def gen_stats_requests(
+    stats_requests: Iterable[StatsRequest], include_table_stats: bool = False
+) -> Iterator[Tuple[str, Dict[str, Dict[str, str]]]]:
+    # Converts stats requests to (global id, payload) tuples which QDCExternalAPIClient accepts.
+    for stats_request in stats_requests:
+        logger.info(
+            "Generating table stats. asset: %s -> %s -> %s -> %s",
+            stats_request.db,
+            stats_request.schema,
+            stats_request.table,
+            stats_request.column,
+        )
+        if include_table_stats:
+            yield stats_request.global_id, stats_request.body.as_dict()
+        else:
+            yield stats_request.global_id, stats_request.body.get_column_stats()
 
 
 def render_sql_for_stats(is_aggregate_items: Dict[str, bool], table_fqn: str, cte: str = "") -> str:
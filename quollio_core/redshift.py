@@ -2,6 +2,7 @@ import argparse
 import logging
 import os
 import shutil
+from typing import Optional
 
 from quollio_core.helper.core import setup_dbt_profile
 from quollio_core.helper.env_default import env_default
@@ -13,6 +14,9 @@ from quollio_core.profilers.redshift import (
 )
 from quollio_core.profilers.stats import get_column_stats_items
 from quollio_core.repository import dbt, qdc, redshift
+from quollio_core.repository.fingerprint import FingerprintStore
+from quollio_core.repository.outbox import Outbox
+from quollio_core.repository.parse_cache import ParseCache
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +27,8 @@ def build_view(
     target_tables: str = "",
     log_level: str = "info",
     dbt_macro_source: str = "hub",
+    stats_materialization: str = "view",
+    full_refresh: bool = False,
 ) -> None:
     logger.info("Build profiler views using dbt")
     # set parameters
@@ -31,10 +37,16 @@ def build_view(
     project_path = f"{current_dir}/dbt_projects/redshift"
     template_path = f"{current_dir}/dbt_projects/redshift/profiles"
     template_name = "profiles_template.yml"
-    options = '{{"query_user": {query_user}, "aggregate_all": {aggregate_all}, "target_database": {database}}}'.format(
+    stats_shard_count = dbt.get_stats_shard_count(conn.threads)
+    options = (
+        '{{"query_user": {query_user}, "aggregate_all": {aggregate_all}, "target_database": {database}, '
+        '"stats_materialization": {stats_materialization}, "stats_shard_count": {stats_shard_count}}}'
+    ).format(
         query_user=conn.query_user,
         aggregate_all=aggregate_all,
         database=conn.database,
+        stats_materialization=stats_materialization,
+        stats_shard_count=stats_shard_count,
     )
     new_package_file = f"{project_path}/packages.yml"
     if dbt_macro_source == "local":
@@ -59,9 +71,13 @@ def build_view(
         options=["--no-use-colors", "--log-level", log_level, "--vars", options, "--source", dbt_macro_source],
     )
     run_options = ["--no-use-colors", "--log-level", log_level, "--vars", options]
+    if full_refresh:
+        # MEMO: Stats views are skipped if their fingerprints are not changed. Recreate all of them.
+        run_options.append("--full-refresh")
     if target_tables is not None:
         if "quollio_stats_columns" in target_tables:
             target_tables.append("quollio_stats_profiling_columns")
+            target_tables.extend(dbt.get_stats_shard_models(stats_shard_count))
         target_tables_str = " ".join(target_tables)
         run_options.append("--select")
         run_options.append(target_tables_str)
@@ -109,6 +125,8 @@ def load_stats(
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
     stats_items: str,
+    outbox: Optional[Outbox] = None,
+    stats_source: str = "view",
 ) -> None:
     logger.info("Generate redshift stats.")
 
@@ -121,6 +139,8 @@ def load_stats(
         qdc_client=qdc_client,
         tenant_id=tenant_id,
         stats_items=stats_items,
+        outbox=outbox,
+        stats_source=stats_source,
     )
 
     logger.info("Stats data is successfully loaded.")
@@ -131,12 +151,16 @@ def load_sqllineage(
     conn: redshift.RedshiftConnectionConfig,
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
+    parse_cache: Optional[ParseCache] = None,
+    parse_processes: int = 1,
 ) -> None:
     logger.info("Generate Redshift sqllineage.")
     redshift_table_level_sqllineage(
         conn=conn,
         qdc_client=qdc_client,
         tenant_id=tenant_id,
+        parse_cache=parse_cache,
+        parse_processes=parse_processes,
     )
 
     logger.info("sqllineage data is successfully loaded.")
@@ -285,6 +309,86 @@ if __name__ == "__main__":
         required=False,
         help="The client secrete that is created on Quollio console to let clients access Quollio External API",
     )
+    parser.add_argument(
+        "--qdc_max_workers",
+        type=int,
+        action=env_default("QDC_MAX_WORKERS"),
+        default=1,
+        required=False,
+        help="The number of threads that send requests to Quollio External API concurrently. Default value is 1",
+    )
+    parser.add_argument(
+        "--qdc_rate_limit",
+        type=float,
+        action=env_default("QDC_RATE_LIMIT"),
+        default=2.0,
+        required=False,
+        help="The maximum number of requests per second sent to Quollio External API. \
+              The rate is lowered automatically while the API responds with 429. Default value is 2.0",
+    )
+    parser.add_argument(
+        "--fingerprint_db",
+        type=str,
+        action=env_default("QUOLLIO_FINGERPRINT_DB"),
+        required=False,
+        help="The path to a local SQLite file that keeps fingerprints of the ingested lineage and stats. \
+              When it is set, assets whose payload is not changed since the last successful ingestion are skipped. \
+              Remove the file if you want to ingest all assets again.",
+    )
+    parser.add_argument(
+        "--stats_materialization",
+        type=str,
+        choices=["view", "table"],
+        action=env_default("REDSHIFT_STATS_MATERIALIZATION"),
+        default="view",
+        required=False,
+        help="How `build_view` materializes column stats, and where `load_stats` reads them. \
+              `view` creates a view per table which aggregates stats on every `load_stats`. \
+              `table` writes aggregated stats into a table and refreshes only changed tables. Default value is view",
+    )
+    parser.add_argument(
+        "--full_refresh",
+        type=bool,
+        action=env_default("REDSHIFT_FULL_REFRESH", store_true=True),
+        default=False,
+        required=False,
+        help="Whether `build_view` recreates all stats views even if their columns are not changed or not. \
+              Default value is False",
+    )
+    parser.add_argument(
+        "--sqllineage_cache_db",
+        type=str,
+        action=env_default("QUOLLIO_SQLLINEAGE_CACHE_DB"),
+        required=False,
+        help="The path to a local SQLite file that caches the lineage resolved from SQL statements. \
+              When it is set, statements parsed in previous runs of `load_sqllineage` are not parsed again.",
+    )
+    parser.add_argument(
+        "--sqllineage_processes",
+        type=int,
+        action=env_default("QUOLLIO_SQLLINEAGE_PROCESSES"),
+        default=1,
+        required=False,
+        help="The number of processes that parse SQL statements for `load_sqllineage`. \
+              0 uses all CPU cores. Default value is 1",
+    )
+    parser.add_argument(
+        "--journal_db",
+        type=str,
+        action=env_default("QUOLLIO_JOURNAL_DB"),
+        required=False,
+        help="The path to a local SQLite file that journals the payloads of `load_stats` and the assets \
+              which QDC acknowledged. Use it with `--resume` to restart a failed run where it stopped.",
+    )
+    parser.add_argument(
+        "--resume",
+        type=bool,
+        action=env_default("QUOLLIO_RESUME", store_true=True),
+        default=False,
+        required=False,
+        help="Whether to resume the last unfinished run recorded in `--journal_db` or not. \
+              A run is left unfinished when it stops or some assets fail to be ingested. Default value is False",
+    )
 
     stats_items = get_column_stats_items()
     parser.add_argument(
@@ -299,7 +403,11 @@ if __name__ == "__main__":
               You can choose the items to be aggregated for stats. All items are selected by default.",
     )
     args = parser.parse_args()
+
+    if args.resume and not args.journal_db:
+        parser.error("--journal_db is required when --resume is used")
     set_log_level(level=args.log_level)
+    fingerprint_store = FingerprintStore(args.fingerprint_db) if args.fingerprint_db else None
 
     conn = redshift.RedshiftConnectionConfig(
         host=args.host,
@@ -322,12 +430,17 @@ if __name__ == "__main__":
             target_tables=args.target_tables,
             log_level=args.log_level,
             dbt_macro_source=args.dbt_macro_source,
+            stats_materialization=args.stats_materialization,
+            full_refresh=args.full_refresh,
         )
     if "load_lineage" in args.commands:
         qdc_client = qdc.QDCExternalAPIClient(
             client_id=args.client_id,
             client_secret=args.client_secret,
             base_url=args.api_url,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
         )
         load_lineage(
             conn=conn,
@@ -335,25 +448,45 @@ if __name__ == "__main__":
             tenant_id=args.tenant_id,
         )
     if "load_stats" in args.commands:
+        outbox = Outbox(args.journal_db, command="redshift:load_stats", resume=args.resume) if args.journal_db else None
         qdc_client = qdc.QDCExternalAPIClient(
             client_id=args.client_id,
             client_secret=args.client_secret,
             base_url=args.api_url,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
+            outbox=outbox,
         )
         load_stats(
             conn=conn,
             qdc_client=qdc_client,
             tenant_id=args.tenant_id,
             stats_items=args.target_stats_items,
+            outbox=outbox,
+            stats_source=args.stats_materialization,
         )
+        if outbox is not None:
+            outbox.finish()
+            outbox.close()
     if "load_sqllineage" in args.commands:
         qdc_client = qdc.QDCExternalAPIClient(
             base_url=args.api_url,
             client_id=args.client_id,
             client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
         )
+        parse_cache = ParseCache(path=args.sqllineage_cache_db)
         load_sqllineage(
             conn=conn,
             qdc_client=qdc_client,
             tenant_id=args.tenant_id,
+            parse_cache=parse_cache,
+            parse_processes=args.sqllineage_processes,
         )
+        parse_cache.close()
+
+    if fingerprint_store is not None:
+        fingerprint_store.close()
@@ -1,23 +1,66 @@
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List
 
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted, ServiceUnavailable
+from google.api_core.retry import Retry, if_exception_type
 from google.cloud.bigquery import Client
+from google.cloud.bigquery.table import RowIterator
 from google.cloud.datacatalog_lineage_v1 import EntityReference, LineageClient, SearchLinksRequest
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 
 from quollio_core.helper.log_utils import logger  # Importing the logger from logging_utils
 
+if TYPE_CHECKING:
+    import pyarrow
+
+# MEMO: INFORMATION_SCHEMA names table types in Standard SQL, while the REST API which list_tables uses
+# names them in legacy SQL.
+INFORMATION_SCHEMA_TABLE_TYPES = {
+    "BASE TABLE": "TABLE",
+    "CLONE": "TABLE",
+    "MATERIALIZED VIEW": "MATERIALIZED_VIEW",
+}
+
+# MEMO: Data Lineage API has a per minute quota of requests, which concurrent searches easily exhaust.
+# Back off exponentially while the quota is exhausted or the service is unavailable.
+LINEAGE_API_RETRY = Retry(
+    predicate=if_exception_type(ResourceExhausted, ServiceUnavailable, DeadlineExceeded),
+    initial=1.0,
+    maximum=60.0,
+    multiplier=2.0,
+    timeout=600.0,
+)
+
 
 class BigQueryClient:
     """Client to interact with the BigQuery API."""
 
     def __init__(self, credentials: Credentials, project_id: str) -> None:
         """Initialize the BigQuery client with provided credentials."""
+        self.credentials = credentials
         self.client = self.__initialize(credentials=credentials, project_id=project_id)
+        self._bqstorage_client = None
 
     def __initialize(self, credentials: Credentials, project_id: str) -> Client:
         return Client(credentials=credentials, project=project_id)
 
+    def read_record_batches(self, rows: RowIterator) -> Iterator["pyarrow.RecordBatch"]:
+        """
+        Read the result of a finished query job as Arrow record batches through BigQuery Storage Read API.
+        It requires google-cloud-bigquery-storage and pyarrow,
+        which are installed with `quollio-core[bigquery-storage]`.
+        """
+        from google.cloud import bigquery_storage
+
+        # MEMO: The read client is shared by all jobs because it opens a gRPC channel when it is created.
+        if self._bqstorage_client is None:
+            self._bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=self.credentials)
+        yield from rows.to_arrow_iterable(bqstorage_client=self._bqstorage_client)
+
+    def get_dataset_location(self, dataset_id: str) -> str:
+        """Get the location of the dataset. The dataset id can be qualified with its project id."""
+        return self.client.get_dataset(dataset_id).location
+
     def list_dataset_ids(self) -> List[str]:
         """List all dataset ids in the project."""
         datasets = list(self.client.list_datasets())
@@ -57,6 +100,40 @@ class BigQueryClient:
                 all_columns[dataset_id][table_id] = {"columns": columns, "table_type": table_type}
         return all_columns
 
+    def query_information_schema(self, regions: List[str]) -> List[Dict[str, Any]]:
+        """Get all tables in the project with one INFORMATION_SCHEMA query per region."""
+        rows = []
+        for region in regions:
+            query = """
+            SELECT
+                table_schema AS dataset_id
+                , table_name AS table_id
+                , table_type
+            FROM
+                `{project}`.`region-{region}`.INFORMATION_SCHEMA.TABLES
+            ORDER BY
+                table_schema
+                , table_name
+            """.format(
+                project=self.client.project, region=region.lower()
+            )
+            region_rows = [dict(row) for row in self.client.query(query).result()]
+            logger.debug("Found %s tables in region %s", len(region_rows), region)
+            rows.extend(region_rows)
+        return rows
+
+    def list_tables_from_information_schema(self, regions: List[str]) -> List[Dict[str, str]]:
+        """List all tables in the project in the same form as list_tables."""
+        return [
+            {
+                "table_id": row["table_id"],
+                "table_type": to_api_table_type(row["table_type"]),
+                "project": self.client.project,
+                "dataset_id": row["dataset_id"],
+            }
+            for row in self.query_information_schema(regions)
+        ]
+
 
 class GCPLineageClient:
     """Client to interact with the GCP Lineage API."""
@@ -70,9 +147,26 @@ class GCPLineageClient:
 
     def get_links(self, request: SearchLinksRequest) -> list:
         """Search for links between entities (tables)."""
-        response = self.client.search_links(request)
+        response = self.client.search_links(request, retry=LINEAGE_API_RETRY)
         return response.links
 
+    def list_process_names(self, project_id: str, region: str) -> List[str]:
+        """List all lineage processes recorded in the project location."""
+        processes = self.client.list_processes(
+            parent=f"projects/{project_id}/locations/{region.lower()}", retry=LINEAGE_API_RETRY
+        )
+        return [process.name for process in processes]
+
+    def get_process_links(self, process_name: str) -> Iterator[Any]:
+        """Yield links of all lineage events of all runs of the process."""
+        for run in self.client.list_runs(parent=process_name, retry=LINEAGE_API_RETRY):
+            for event in self.client.list_lineage_events(parent=run.name, retry=LINEAGE_API_RETRY):
+                yield from event.links
+
+
+def to_api_table_type(table_type: str) -> str:
+    return INFORMATION_SCHEMA_TABLE_TYPES.get(table_type, table_type)
+
 
 def get_entitiy_reference() -> EntityReference:
     return EntityReference()
@@ -0,0 +1,37 @@
+import logging
+from typing import Optional
+
+from quollio_core.repository.sqlite import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStore(SQLiteStore):
+    """
+    Local store of named checkpoints, e.g. the last change time of lineage which was completely ingested.
+    It is kept apart from FingerprintStore so that removing fingerprints doesn't reset incremental loads.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            name TEXT PRIMARY KEY
+            , value TEXT NOT NULL
+            , updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """
+
+    def get_checkpoint(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, name: str, value: str) -> None:
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO checkpoints (name, value) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+                """,
+                (name, value),
+            )
+            self._commit()
@@ -1,10 +1,17 @@
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from dataclasses import asdict, dataclass
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 
 from databricks.sdk.core import Config, HeaderFactory, oauth_service_principal
 from databricks.sql.client import Connection, connect
 
+if TYPE_CHECKING:
+    import pyarrow
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,8 +62,110 @@ class DatabricksQueryExecutor:
                 results_asdict.append(row.asDict())
         return results_asdict
 
+    def iter_query_results(self, query: str, chunk_size: int = 10000) -> Iterator[List[Dict[str, str]]]:
+        """
+        Yield the query result in chunks of up to `chunk_size` rows instead of fetching all of it at once.
+        """
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute(query)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield [row.asDict() for row in rows]
+            except Exception as e:
+                logger.error(query, exc_info=True)
+                logger.error("databricks iter_query_results failed. %s", e)
+                raise
+
+    def iter_record_batches(self, query: str, batch_size: int = 100000) -> Iterator["pyarrow.RecordBatch"]:
+        """
+        Yield the query result as Arrow record batches of up to `batch_size` rows.
+        """
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute(query)
+                while True:
+                    table = cur.fetchmany_arrow(batch_size)
+                    if table.num_rows == 0:
+                        break
+                    yield from table.to_batches()
+            except Exception as e:
+                logger.error(query, exc_info=True)
+                logger.error("databricks iter_record_batches failed. %s", e)
+                raise
+
     def credential_provider(self) -> Optional[HeaderFactory]:
         config = Config(
             host=f"https://{self.config.host}", client_id=self.config.client_id, client_secret=self.config.client_secret
         )
         return oauth_service_principal(config)
+
+
+class DatabricksExecutorPool:
+    """
+    Pool of DatabricksQueryExecutor which share OAuth handshakes and SQL warehouse sessions among many queries.
+    Executors are connected lazily up to `size`, and each of them is used by one thread at a time.
+    """
+
+    def __init__(self, config: DatabricksConnectionConfig, size: int = 1) -> None:
+        self.config = config
+        self.size = max(1, size)
+        self._executors: List[DatabricksQueryExecutor] = []
+        self._idle: "queue.Queue[DatabricksQueryExecutor]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextmanager
+    def executor(self) -> Iterator[DatabricksQueryExecutor]:
+        executor = self.__acquire()
+        try:
+            yield executor
+        finally:
+            self._idle.put(executor)
+
+    def __acquire(self) -> DatabricksQueryExecutor:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._executors) < self.size:
+                executor = DatabricksQueryExecutor(config=self.config)
+                self._executors.append(executor)
+                logger.debug("Databricks connection %s/%s is opened.", len(self._executors), self.size)
+                return executor
+        return self._idle.get()
+
+    def get_query_results(self, query: str) -> List[Dict[str, str]]:
+        with self.executor() as executor:
+            return executor.get_query_results(query)
+
+    def iter_record_batches(self, query: str, batch_size: int = 100000) -> Iterator["pyarrow.RecordBatch"]:
+        with self.executor() as executor:
+            yield from executor.iter_record_batches(query=query, batch_size=batch_size)
+
+    def get_query_results_concurrently(self, queries: Dict[str, str]) -> Iterator[Tuple[str, List[Dict[str, str]]]]:
+        """
+        Run queries on the pooled connections and yield (key, result) in the order they finish.
+        """
+        if self.size == 1:
+            for key, query in queries.items():
+                yield (key, self.get_query_results(query))
+            return
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            futures = {pool.submit(self.get_query_results, query): key for key, query in queries.items()}
+            for future in as_completed(futures):
+                yield (futures[future], future.result())
+
+    def close(self) -> None:
+        with self._lock:
+            for executor in self._executors:
+                executor.conn.close()
+            self._executors = []
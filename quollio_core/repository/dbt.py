@@ -5,6 +5,22 @@ from dbt.cli.main import dbtRunner, dbtRunnerResult
 
 logger = logging.getLogger(__name__)
 
+# MEMO: quollio_stats_columns has this number of shard models including itself.
+# They divide the stats views among them so that dbt creates the views in parallel threads.
+# models/quollio_stats_columns_shard_{1..MAX_STATS_SHARDS-1}.sql must exist in every dbt project.
+MAX_STATS_SHARDS = 8
+STATS_SHARD_MODEL = "quollio_stats_columns_shard_{index}"
+
+
+def get_stats_shard_count(threads: int) -> int:
+    return max(1, min(threads, MAX_STATS_SHARDS))
+
+
+def get_stats_shard_models(shard_count: int) -> List[str]:
+    # MEMO: dbt matches a glob in `--select` against the fully qualified name of a node (e.g. project.model),
+    # so the shard models are selected by their names.
+    return [STATS_SHARD_MODEL.format(index=index) for index in range(1, get_stats_shard_count(shard_count))]
+
 
 class DBTClient:
     def __init__(self) -> None:
@@ -0,0 +1,71 @@
+import json
+import logging
+from typing import Dict, Optional
+
+from blake3 import blake3
+
+from quollio_core.repository.sqlite import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintStore(SQLiteStore):
+    """
+    Local store of the payloads which were successfully ingested to QDC.
+    Each asset is keyed by its kind (lineage or stats) and global id, and keeps a blake3 hash of its payload,
+    so that an unchanged payload doesn't need to be sent again in the next run.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            kind TEXT NOT NULL
+            , global_id TEXT NOT NULL
+            , fingerprint TEXT NOT NULL
+            , updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            , PRIMARY KEY (kind, global_id)
+        );
+    """
+
+    def get(self, kind: str, global_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT fingerprint FROM fingerprints WHERE kind = ? AND global_id = ?", (kind, global_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_unchanged(self, kind: str, global_id: str, fingerprint: str) -> bool:
+        return self.get(kind=kind, global_id=global_id) == fingerprint
+
+    def record(self, kind: str, global_id: str, fingerprint: str) -> None:
+        with self._lock:
+            self._write(
+                """
+                INSERT INTO fingerprints (kind, global_id, fingerprint) VALUES (?, ?, ?)
+                ON CONFLICT (kind, global_id) DO UPDATE SET
+                    fingerprint = excluded.fingerprint
+                    , updated_at = CURRENT_TIMESTAMP
+                """,
+                (kind, global_id, fingerprint),
+            )
+
+
+def gen_fingerprint(payload: Dict) -> str:
+    serialized = json.dumps(_canonicalize(payload), sort_keys=True, separators=(",", ":"), default=str)
+    return blake3(serialized.encode()).hexdigest()
+
+
+# MEMO: The order of upstream ids doesn't matter to QDC, but it changes run by run
+# because some of them are built from sets. Sort them not to treat the same lineage as changed one.
+# Other lists keep their order because it can be meaningful.
+UNORDERED_FIELDS = {"upstream"}
+
+
+def _canonicalize(obj, is_unordered: bool = False):
+    if isinstance(obj, dict):
+        return {key: _canonicalize(value, is_unordered=key in UNORDERED_FIELDS) for key, value in obj.items()}
+    if isinstance(obj, list):
+        items = [_canonicalize(item) for item in obj]
+        if is_unordered:
+            return sorted(items, key=lambda item: json.dumps(item, sort_keys=True, default=str))
+        return items
+    return obj
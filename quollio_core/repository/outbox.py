@@ -0,0 +1,141 @@
+import json
+import logging
+from typing import Dict
+
+from quollio_core.repository.sqlite import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox(SQLiteStore):
+    """
+    Append-only journal of an ingestion run, kept in a local SQLite file.
+    It records payloads before they are sent, global ids which QDC acknowledged, and units of work
+    (e.g. stats views) which are completely ingested, so that a crashed run can be resumed where it stopped.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT
+            , command TEXT NOT NULL
+            , started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            , finished_at TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS outbox (
+            run_id INTEGER NOT NULL
+            , kind TEXT NOT NULL
+            , global_id TEXT NOT NULL
+            , payload TEXT NOT NULL
+            , acked_at TIMESTAMP
+            , PRIMARY KEY (run_id, kind, global_id)
+        );
+        CREATE TABLE IF NOT EXISTS units (
+            run_id INTEGER NOT NULL
+            , unit TEXT NOT NULL
+            , PRIMARY KEY (run_id, unit)
+        );
+    """
+
+    def __init__(self, path: str, command: str, resume: bool = False, commit_interval: int = 100) -> None:
+        super().__init__(path=path, commit_interval=commit_interval)
+        self.command = command
+        self.run_id = self.__start_run(resume=resume)
+        self.__prune_stale_runs()
+
+    def __start_run(self, resume: bool) -> int:
+        if resume:
+            row = self.conn.execute(
+                "SELECT MAX(run_id) FROM runs WHERE command = ? AND finished_at IS NULL", (self.command,)
+            ).fetchone()
+            if row[0] is not None:
+                acked, pending = self.conn.execute(
+                    "SELECT COUNT(acked_at), COUNT(*) - COUNT(acked_at) FROM outbox WHERE run_id = ?", (row[0],)
+                ).fetchone()
+                logger.info(
+                    "Resume the run %s of `%s`. %s assets are already ingested and %s assets are pending.",
+                    row[0],
+                    self.command,
+                    acked,
+                    pending,
+                )
+                return row[0]
+            logger.info("No unfinished run of `%s` is found. Start a new run.", self.command)
+        cur = self.conn.execute("INSERT INTO runs (command) VALUES (?)", (self.command,))
+        self._commit()
+        return cur.lastrowid
+
+    def __prune_stale_runs(self) -> None:
+        # MEMO: Only the latest unfinished run can be resumed. Older unfinished runs of the command are removed.
+        stale_runs = "SELECT run_id FROM runs WHERE command = ? AND finished_at IS NULL AND run_id < ?"
+        params = (self.command, self.run_id)
+        self.conn.execute(f"DELETE FROM outbox WHERE run_id IN ({stale_runs})", params)
+        self.conn.execute(f"DELETE FROM units WHERE run_id IN ({stale_runs})", params)
+        cur = self.conn.execute(f"DELETE FROM runs WHERE run_id IN ({stale_runs})", params)
+        self._commit()
+        if cur.rowcount > 0:
+            logger.info("%s stale unfinished runs of `%s` are removed.", cur.rowcount, self.command)
+
+    def append(self, kind: str, global_id: str, payload: Dict) -> None:
+        # MEMO: Appends and acks are committed every `commit_interval`. The assets whose ack is lost by a crash
+        # are sent again on resume, which is harmless because a PUT of the same payload is idempotent.
+        with self._lock:
+            self._write(
+                """
+                INSERT INTO outbox (run_id, kind, global_id, payload) VALUES (?, ?, ?, ?)
+                ON CONFLICT (run_id, kind, global_id) DO UPDATE SET payload = excluded.payload
+                """,
+                (self.run_id, kind, global_id, json.dumps(payload, default=str)),
+            )
+
+    def ack(self, kind: str, global_id: str) -> None:
+        with self._lock:
+            self._write(
+                "UPDATE outbox SET acked_at = CURRENT_TIMESTAMP WHERE run_id = ? AND kind = ? AND global_id = ?",
+                (self.run_id, kind, global_id),
+            )
+
+    def is_acked(self, kind: str, global_id: str) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT acked_at FROM outbox WHERE run_id = ? AND kind = ? AND global_id = ?",
+                (self.run_id, kind, global_id),
+            ).fetchone()
+        return row is not None and row[0] is not None
+
+    def is_unit_done(self, unit: str) -> bool:
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM units WHERE run_id = ? AND unit = ?", (self.run_id, unit)).fetchone()
+        return row is not None
+
+    def mark_unit_done(self, unit: str) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO units (run_id, unit) VALUES (?, ?)",
+                (self.run_id, unit),
+            )
+            self._commit()
+
+    def finish(self) -> bool:
+        """
+        Mark the run finished and remove its journal, unless some assets were sent but not acknowledged.
+        Then the run is left open so that `--resume` retries them, and False is returned.
+        """
+        with self._lock:
+            pending = self.conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE run_id = ? AND acked_at IS NULL", (self.run_id,)
+            ).fetchone()[0]
+            if pending > 0:
+                self._commit()
+                logger.warning(
+                    "%s assets of the run %s of `%s` failed to be ingested. Run again with `--resume` to retry them.",
+                    pending,
+                    self.run_id,
+                    self.command,
+                )
+                return False
+            # MEMO: The payloads of a finished run are never replayed. Remove them to keep the journal small.
+            self.conn.execute("UPDATE runs SET finished_at = CURRENT_TIMESTAMP WHERE run_id = ?", (self.run_id,))
+            self.conn.execute("DELETE FROM outbox WHERE run_id = ?", (self.run_id,))
+            self.conn.execute("DELETE FROM units WHERE run_id = ?", (self.run_id,))
+            self._commit()
+        return True
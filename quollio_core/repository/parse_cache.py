@@ -0,0 +1,70 @@
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+
+from quollio_core.repository.sqlite import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class ParseCache(SQLiteStore):
+    """
+    Two tier cache of SQL parse results, keyed by a content hash which the caller computes.
+    Recently used results are kept in an in-memory LRU, and all results are persisted to a local SQLite file
+    so that the same statements in the next run don't need to be parsed again.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS parse_results (
+            cache_key TEXT PRIMARY KEY
+            , result TEXT NOT NULL
+            , updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_items: int = 10000, commit_interval: int = 1000) -> None:
+        super().__init__(path=path, commit_interval=commit_interval)
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if self.conn is not None:
+                row = self.conn.execute("SELECT result FROM parse_results WHERE cache_key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self.__put_memory(key=key, value=value)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self.__put_memory(key=key, value=value)
+            if self.conn is None:
+                return
+            self._write(
+                """
+                INSERT INTO parse_results (cache_key, result) VALUES (?, ?)
+                ON CONFLICT (cache_key) DO UPDATE SET result = excluded.result, updated_at = CURRENT_TIMESTAMP
+                """,
+                (key, json.dumps(value)),
+            )
+
+    def __put_memory(self, key: str, value: Any) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def close(self) -> None:
+        logger.info("SQL parse cache: %s hits and %s misses.", self.hits, self.misses)
+        super().close()
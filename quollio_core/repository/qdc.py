@@ -1,21 +1,84 @@
 import base64
 import json
 import logging
+import threading
 import time
-from typing import Dict, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import jwt
 import requests  # type: ignore
 from requests.exceptions import ConnectionError, HTTPError, RequestException, Timeout
 
+from quollio_core.repository.fingerprint import FingerprintStore, gen_fingerprint
+from quollio_core.repository.outbox import Outbox
+
 logger = logging.getLogger(__name__)
 
 
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every request sent through a QDCExternalAPIClient.
+    The rate is halved when the API answers with 429 and grows back gradually on success,
+    so concurrent workers slow down together instead of retrying on their own.
+    """
+
+    def __init__(self, rate: float, min_rate: float = 0.1, recovery_step: float = 0.1):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0.")
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.recovery_step = recovery_step
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(1.0, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if now >= self._blocked_until and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait_sec = max(self._blocked_until - now, (1.0 - self._tokens) / self.rate)
+            time.sleep(wait_sec)
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        logger.warning("QDC API is throttling requests. Request rate is lowered to %.2f req/sec.", self.rate)
+
+    def recover(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+
 class QDCExternalAPIClient:
-    def __init__(self, base_url: str, client_id: str, client_secret: str):
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        max_workers: int = 1,
+        rate_limit: float = 2.0,
+        fingerprint_store: Optional[FingerprintStore] = None,
+        outbox: Optional[Outbox] = None,
+    ):
         self.base_url = base_url
         self.client_id = client_id
         self.client_secret = client_secret
+        self.max_workers = max(1, max_workers)
+        self.fingerprint_store = fingerprint_store
+        self.outbox = outbox
+        self.rate_limiter = RateLimiter(rate=rate_limit)
+        self._token_lock = threading.Lock()
         self.auth_token = self._get_auth_token()
         self.session = self._gen_session()
 
@@ -56,24 +119,78 @@ class QDCExternalAPIClient:
             raise
 
     def _refresh_token_if_expired(self):
-        decoded_data = jwt.decode(self.auth_token, options={"verify_signature": False})
-        if decoded_data.get("exp") < time.time():
-            self.auth_token = self._get_auth_token()
+        with self._token_lock:
+            decoded_data = jwt.decode(self.auth_token, options={"verify_signature": False})
+            if decoded_data.get("exp") < time.time():
+                self.auth_token = self._get_auth_token()
 
     def _gen_session(self) -> requests.Session:
         retry = requests.adapters.Retry(total=9, backoff_factor=1, status_forcelist=[429, 500, 503, 504])
+        # MEMO: Keep one pooled connection per worker so that concurrent requests don't wait for a free connection.
+        pool_size = max(10, self.max_workers)
         session = requests.Session()
-        session.mount("http://", requests.adapters.HTTPAdapter(max_retries=retry))
-        session.mount("https://", requests.adapters.HTTPAdapter(max_retries=retry))
+        session.mount(
+            "http://",
+            requests.adapters.HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size),
+        )
+        session.mount(
+            "https://",
+            requests.adapters.HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size),
+        )
         return session
 
+    def _put(self, endpoint: str, headers: Dict[str, str], payload: Dict[str, List[str]]) -> requests.Response:
+        self.rate_limiter.acquire()
+        try:
+            res = self.session.put(endpoint, headers=headers, json=payload)
+        except requests.exceptions.RetryError:
+            # MEMO: Retries were exhausted because the API kept answering with 429 or 5xx. Back off in both cases.
+            self.rate_limiter.throttle()
+            raise
+        self._observe_rate_limit(res)
+        return res
+
+    def _observe_rate_limit(self, res: requests.Response) -> None:
+        retries = getattr(res.raw, "retries", None)
+        retry_history = getattr(retries, "history", None) or ()
+        is_throttled = res.status_code == 429 or any(history.status == 429 for history in retry_history)
+        if is_throttled:
+            self.rate_limiter.throttle(retry_after=parse_retry_after(res.headers.get("Retry-After")))
+        elif res.ok:
+            self.rate_limiter.recover()
+
+    def _put_concurrently(
+        self, update_func: Callable[..., int], payloads: Iterable[Tuple[str, Dict[str, List[str]]]]
+    ) -> Iterator[Tuple[str, int]]:
+        if self.max_workers == 1:
+            for global_id, payload in payloads:
+                yield global_id, update_func(global_id=global_id, payload=payload)
+            return
+
+        def _update(global_id: str, payload: Dict[str, List[str]]) -> Tuple[str, int]:
+            return global_id, update_func(global_id=global_id, payload=payload)
+
+        # MEMO: Bound the number of in-flight requests so that a huge iterable of payloads is not submitted at once.
+        max_in_flight = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = set()
+            for global_id, payload in payloads:
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                in_flight.add(executor.submit(_update, global_id, payload))
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
     def update_stats_by_id(self, global_id: str, payload: Dict[str, List[str]]) -> int:
         self._refresh_token_if_expired()
         headers = {"content-type": "application/json", "authorization": f"Bearer {self.auth_token}"}
         endpoint = f"{self.base_url}/v2/assets/{global_id}/stats"
         try:
-            time.sleep(0.5)
-            res = self.session.put(endpoint, headers=headers, json=payload)
+            res = self._put(endpoint=endpoint, headers=headers, payload=payload)
             res.raise_for_status()
         except ConnectionError as ce:
             logger.error(f"Connection Error: {ce} global_id: {global_id}.")
@@ -91,8 +208,7 @@ class QDCExternalAPIClient:
         headers = {"content-type": "application/json", "authorization": f"Bearer {self.auth_token}"}
         endpoint = f"{self.base_url}/v2/lineage/{global_id}"
         try:
-            time.sleep(0.5)
-            res = self.session.put(endpoint, headers=headers, json=payload)
+            res = self._put(endpoint=endpoint, headers=headers, payload=payload)
             res.raise_for_status()
         except ConnectionError as ce:
             logger.error(f"Connection Error: {ce} downstream_global_id: {global_id}.")
@@ -105,10 +221,110 @@ class QDCExternalAPIClient:
         else:
             return res.status_code
 
+    def update_stats_by_ids(self, payloads: Iterable[Tuple[str, Dict[str, List[str]]]]) -> Iterator[Tuple[str, int]]:
+        """
+        Update stats of many assets using `max_workers` threads.
+        Yields a tuple of global_id and status code in the order the requests complete.
+        Assets are skipped if they are not changed since the last ingestion or acked before the resume.
+        """
+        return self._update_by_ids(kind="stats", update_func=self.update_stats_by_id, payloads=payloads)
+
+    def update_lineage_by_ids(self, payloads: Iterable[Tuple[str, Dict[str, List[str]]]]) -> Iterator[Tuple[str, int]]:
+        """
+        Update lineage of many downstream assets using `max_workers` threads.
+        Yields a tuple of downstream global_id and status code in the order the requests complete.
+        Assets are skipped if they are not changed since the last ingestion or acked before the resume.
+        """
+        return self._update_by_ids(kind="lineage", update_func=self.update_lineage_by_id, payloads=payloads)
+
+    def _update_by_ids(
+        self,
+        kind: str,
+        update_func: Callable[..., int],
+        payloads: Iterable[Tuple[str, Dict[str, List[str]]]],
+    ) -> Iterator[Tuple[str, int]]:
+        fingerprints: Dict[str, str] = dict()
+        if self.fingerprint_store is not None:
+            payloads = self._skip_unchanged(kind=kind, payloads=payloads, fingerprints=fingerprints)
+        if self.outbox is not None:
+            payloads = self._skip_acked(kind=kind, payloads=payloads)
+
+        for global_id, status_code in self._put_concurrently(update_func=update_func, payloads=payloads):
+            fingerprint = fingerprints.pop(global_id, None)
+            if status_code == 200:
+                if self.outbox is not None:
+                    self.outbox.ack(kind=kind, global_id=global_id)
+                if fingerprint is not None:
+                    self.fingerprint_store.record(kind=kind, global_id=global_id, fingerprint=fingerprint)
+            yield global_id, status_code
+
+    def _skip_acked(
+        self, kind: str, payloads: Iterable[Tuple[str, Dict[str, List[str]]]]
+    ) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+        skip_count = 0
+        for global_id, payload in payloads:
+            if self.outbox.is_acked(kind=kind, global_id=global_id):
+                skip_count += 1
+                continue
+            self.outbox.append(kind=kind, global_id=global_id, payload=payload)
+            yield global_id, payload
+        if skip_count > 0:
+            logger.info(f"{skip_count} {kind} requests are skipped because they were ingested before the resume.")
+
+    def _skip_unchanged(
+        self,
+        kind: str,
+        payloads: Iterable[Tuple[str, Dict[str, List[str]]]],
+        fingerprints: Dict[str, str],
+    ) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+        skip_count = 0
+        for global_id, payload in payloads:
+            fingerprint = gen_fingerprint(payload)
+            if self.fingerprint_store.is_unchanged(kind=kind, global_id=global_id, fingerprint=fingerprint):
+                logger.debug(f"Skip {kind} of {global_id} because it is not changed since the last ingestion.")
+                skip_count += 1
+                continue
+            fingerprints[global_id] = fingerprint
+            yield global_id, payload
+        if skip_count > 0:
+            logger.info(
+                f"{skip_count} {kind} requests are skipped because they are not changed since the last ingestion."
+            )
 
-def initialize_qdc_client(api_url: str, client_id: str, client_secret: str) -> QDCExternalAPIClient:
-    return QDCExternalAPIClient(base_url=api_url, client_id=client_id, client_secret=client_secret)
+
+def initialize_qdc_client(
+    api_url: str,
+    client_id: str,
+    client_secret: str,
+    max_workers: int = 1,
+    rate_limit: float = 2.0,
+    fingerprint_store: Optional[FingerprintStore] = None,
+    outbox: Optional[Outbox] = None,
+) -> QDCExternalAPIClient:
+    return QDCExternalAPIClient(
+        base_url=api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+        max_workers=max_workers,
+        rate_limit=rate_limit,
+        fingerprint_store=fingerprint_store,
+        outbox=outbox,
+    )
 
 
 def is_valid_domain(domain: str) -> bool:
     return domain.endswith(".com")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # MEMO: Retry-After is either delay seconds or an HTTP date.
+    # https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Retry-After
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -1,11 +1,14 @@
 import logging
 from dataclasses import asdict, dataclass
 from enum import Enum
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
 
 from redshift_connector import Connection, connect
 from redshift_connector.error import ProgrammingError
 
+if TYPE_CHECKING:
+    import pyarrow
+
 logger = logging.getLogger(__name__)
 
 
@@ -90,3 +93,43 @@ class RedshiftQueryExecutor:
                 logger.error(query)
                 logger.error("Failed to get query results. error: {err}".format(err=e))
                 raise
+
+    def iter_query_results(self, query: str, chunk_size: int = 10000) -> Iterator[Tuple[List[str], ...]]:
+        """
+        Yield the query result in chunks of up to `chunk_size` rows instead of fetching all of it at once.
+        """
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute(query)
+                while True:
+                    rows: tuple = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            except Exception as e:
+                logger.error(" ".join(query.split()))
+                logger.error("Failed to get query results. error: {err}".format(err=e))
+                raise
+
+    def iter_record_batches(self, query: str, batch_size: int = 100000) -> Iterator["pyarrow.RecordBatch"]:
+        """
+        Yield the query result as Arrow record batches of up to `batch_size` rows.
+        redshift_connector has no native Arrow fetch, so each `fetchmany` chunk is converted column by column.
+        It requires pyarrow, which is installed with `quollio-core[arrow]`.
+        """
+        import pyarrow
+
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute(query)
+                names = [desc[0] for desc in cur.description]
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    columns = [pyarrow.array(column) for column in zip(*rows)]
+                    yield pyarrow.RecordBatch.from_arrays(columns, names=names)
+            except Exception as e:
+                logger.error(" ".join(query.split()))
+                logger.error("Failed to fetch record batches. error: {err}".format(err=e))
+                raise
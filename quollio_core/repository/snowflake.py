@@ -1,10 +1,14 @@
 import logging
+import time
 from dataclasses import asdict, dataclass
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
 
 from snowflake.connector import DictCursor, connect, errors
 from snowflake.connector.connection import SnowflakeConnection
 
+if TYPE_CHECKING:
+    import pyarrow
+
 logger = logging.getLogger(__name__)
 
 
@@ -56,3 +60,108 @@ class SnowflakeQueryExecutor:
                 return ([], e)
             except Exception as e:
                 return ([], e)
+
+    def iter_query_results(
+        self, query: str, chunk_size: int = 10000
+    ) -> Iterator[Tuple[List[Dict[str, str]], Exception]]:
+        """
+        Yield (rows, error) with up to `chunk_size` rows at a time so that callers can process a large result
+        without holding all of it. When the query fails, ([], error) is yielded and the iteration stops.
+        """
+        with self.conn.cursor(DictCursor) as cur:
+            try:
+                cur.execute(query)
+                while True:
+                    rows: List[Dict[str, str]] = cur.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    yield (rows, None)
+            except errors.ProgrammingError as e:
+                yield ([], e)
+            except Exception as e:
+                yield ([], e)
+
+    def iter_record_batches(self, query: str, batch_size: int = 100000) -> Iterator["pyarrow.RecordBatch"]:
+        """
+        Yield the query result as Arrow record batches of up to `batch_size` rows.
+        It requires pyarrow, which is installed with `quollio-core[arrow]`.
+        """
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute(query)
+                yield from _to_record_batches(cur.fetch_arrow_batches(), batch_size=batch_size)
+            except Exception as e:
+                logger.error(" ".join(query.split()))
+                logger.error("Failed to fetch record batches. error: {err}".format(err=e))
+                raise
+
+    def get_query_results_concurrently(
+        self, queries: Dict[str, str], concurrency: int = 4, poll_interval: float = 0.5, as_arrow: bool = False
+    ) -> Iterator[Tuple[str, List[Dict[str, str]], Exception]]:
+        """
+        Submit queries as Snowflake async queries keeping `concurrency` of them running at a time,
+        and yield (key, result, error) in the order they finish.
+        With `as_arrow`, each result is a list of Arrow record batches instead of dicts.
+        """
+        pending = iter(queries.items())
+        running: Dict[str, str] = {}
+        while True:
+            while len(running) < concurrency:
+                item = next(pending, None)
+                if item is None:
+                    break
+                key, query = item
+                query_id, err = self.__submit_query(query=query)
+                if err is not None:
+                    yield (key, [], err)
+                    continue
+                running[query_id] = key
+            if len(running) == 0:
+                return
+
+            finished = [query_id for query_id in running if not self.__is_still_running(query_id=query_id)]
+            if len(finished) == 0:
+                time.sleep(poll_interval)
+                continue
+            for query_id in finished:
+                key = running.pop(query_id)
+                result, err = self.__get_async_query_results(query_id=query_id, as_arrow=as_arrow)
+                yield (key, result, err)
+
+    def __submit_query(self, query: str) -> Tuple[str, Exception]:
+        with self.conn.cursor(DictCursor) as cur:
+            try:
+                cur.execute_async(query)
+                return (cur.sfqid, None)
+            except Exception as e:
+                return (None, e)
+
+    def __is_still_running(self, query_id: str) -> bool:
+        try:
+            return self.conn.is_still_running(self.conn.get_query_status(query_id))
+        except Exception as e:
+            # MEMO: Let the result fetch raise the error instead of polling it forever.
+            logger.debug(f"Failed to get the status of query {query_id}. {e}")
+            return False
+
+    def __get_async_query_results(
+        self, query_id: str, as_arrow: bool = False
+    ) -> Tuple[List[Dict[str, str]], Exception]:
+        with self.conn.cursor(DictCursor) as cur:
+            try:
+                self.conn.get_query_status_throw_if_error(query_id)
+                cur.get_results_from_sfqid(query_id)
+                if as_arrow:
+                    return (list(_to_record_batches(cur.fetch_arrow_batches())), None)
+                result: List[Dict[str, str]] = cur.fetchall()
+                return (result, None)
+            except errors.ProgrammingError as e:
+                return ([], e)
+            except Exception as e:
+                return ([], e)
+
+
+def _to_record_batches(tables: Iterator["pyarrow.Table"], batch_size: int = 100000) -> Iterator["pyarrow.RecordBatch"]:
+    # MEMO: Snowflake returns an Arrow table per result chunk, whose size is decided by the server.
+    for table in tables:
+        yield from table.to_batches(max_chunksize=batch_size)
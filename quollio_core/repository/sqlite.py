@@ -0,0 +1,53 @@
+import sqlite3
+import threading
+from typing import Any, Optional, Tuple
+
+
+class SQLiteStore:
+    """
+    Base of the local stores kept in a SQLite file and shared by threads.
+    Subclasses define their tables in `schema`. Writes are committed every `commit_interval` of them
+    and when the store is closed. Without `path`, no file is opened and `conn` is None.
+    """
+
+    schema = ""
+
+    def __init__(self, path: Optional[str], commit_interval: int = 1000) -> None:
+        self.path = path
+        self.commit_interval = commit_interval
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self.conn = self.__connect() if path else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # MEMO: WAL keeps committed records even if the process is killed, without fsync on every commit.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.schema)
+        conn.commit()
+        return conn
+
+    def _write(self, sql: str, params: Tuple[Any, ...] = ()) -> None:
+        # MEMO: Callers hold `_lock` so that a write and the commit after it are not interleaved by other threads.
+        self.conn.execute(sql, params)
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_interval:
+            self._commit()
+
+    def _commit(self) -> None:
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self.conn is not None:
+                self._commit()
+                self.conn.close()
+                self.conn = None
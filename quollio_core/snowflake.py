@@ -1,7 +1,10 @@
 import argparse
+import functools
 import logging
 import os
 import shutil
+from datetime import datetime
+from typing import Callable, Optional
 
 from quollio_core.helper.core import setup_dbt_profile
 from quollio_core.helper.env_default import env_default
@@ -14,6 +17,10 @@ from quollio_core.profilers.snowflake import (
 )
 from quollio_core.profilers.stats import get_column_stats_items
 from quollio_core.repository import dbt, qdc, snowflake
+from quollio_core.repository.checkpoint import CheckpointStore
+from quollio_core.repository.fingerprint import FingerprintStore
+from quollio_core.repository.outbox import Outbox
+from quollio_core.repository.parse_cache import ParseCache
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +31,10 @@ def build_view(
     target_tables: str = "",
     log_level: str = "info",
     dbt_macro_source: str = "hub",
+    stats_materialization: str = "view",
+    stats_profiling_mode: str = "union",
+    lineage_lookback_hours: int = 3,
+    full_refresh: bool = False,
 ) -> None:
     logger.info("Build profiler views using dbt")
     # set parameters
@@ -32,9 +43,18 @@ def build_view(
     project_path = f"{current_dir}/dbt_projects/snowflake"
     template_path = f"{current_dir}/dbt_projects/snowflake/profiles"
     template_name = "profiles_template.yml"
-    options = '{{"query_role": {query_role}, "sample_method": {sample_method}}}'.format(
+    stats_shard_count = dbt.get_stats_shard_count(conn.threads)
+    options = (
+        '{{"query_role": {query_role}, "sample_method": {sample_method}, '
+        '"stats_profiling_mode": {stats_profiling_mode}, "stats_materialization": {stats_materialization}, '
+        '"lineage_lookback_hours": {lineage_lookback_hours}, "stats_shard_count": {stats_shard_count}}}'
+    ).format(
         query_role=conn.account_query_role,
         sample_method=stats_sample_method,
+        stats_profiling_mode=stats_profiling_mode,
+        stats_materialization=stats_materialization,
+        lineage_lookback_hours=lineage_lookback_hours,
+        stats_shard_count=stats_shard_count,
     )
     new_package_file = f"{project_path}/packages.yml"
     if dbt_macro_source == "local":
@@ -59,9 +79,14 @@ def build_view(
         options=["--no-use-colors", "--log-level", log_level, "--vars", options, "--source", dbt_macro_source],
     )
     run_options = ["--no-use-colors", "--log-level", log_level, "--vars", options]
+    if full_refresh:
+        # MEMO: Lineage models are built incrementally from ACCESS_HISTORY, and stats views are skipped
+        # if their fingerprints are not changed. Rebuild them from scratch.
+        run_options.append("--full-refresh")
     if target_tables is not None:
         if "quollio_stats_columns" in target_tables:
             target_tables.append("quollio_stats_profiling_columns")
+            target_tables.extend(dbt.get_stats_shard_models(stats_shard_count))
         target_tables_str = " ".join(target_tables)
         run_options.append("--select")
         run_options.append(target_tables_str)
@@ -82,23 +107,34 @@ def load_lineage(
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
     enable_column_lineage: bool = False,
+    since: Optional[str] = None,
+    checkpoint_store: Optional[CheckpointStore] = None,
+    use_arrow: bool = False,
 ) -> None:
     logger.info("Generate Snowflake table to table lineage.")
 
-    snowflake_table_to_table_lineage(
+    _load_lineage_since(
+        load_func=functools.partial(snowflake_table_to_table_lineage, use_arrow=use_arrow),
+        checkpoint_name="snowflake:table_lineage",
         conn=conn,
         qdc_client=qdc_client,
         tenant_id=tenant_id,
+        since=since,
+        checkpoint_store=checkpoint_store,
     )
 
     if enable_column_lineage:
         logger.info(
             f"enable_column_lineage is set to {enable_column_lineage}.Generate Snowflake column to column lineage."
         )
-        snowflake_column_to_column_lineage(
+        _load_lineage_since(
+            load_func=snowflake_column_to_column_lineage,
+            checkpoint_name="snowflake:column_lineage",
             conn=conn,
             qdc_client=qdc_client,
             tenant_id=tenant_id,
+            since=since,
+            checkpoint_store=checkpoint_store,
         )
     else:
         logger.info("Skip column lineage ingestion. Set enable_column_lineage to True if you ingest column lineage.")
@@ -108,11 +144,34 @@ def load_lineage(
     return
 
 
+def _load_lineage_since(
+    load_func: Callable[..., Optional[str]],
+    checkpoint_name: str,
+    conn: snowflake.SnowflakeConnectionConfig,
+    qdc_client: qdc.QDCExternalAPIClient,
+    tenant_id: str,
+    since: Optional[str] = None,
+    checkpoint_store: Optional[CheckpointStore] = None,
+) -> None:
+    # MEMO: An explicit `since` wins over the stored checkpoint. Without both, all lineage is loaded.
+    if since is None and checkpoint_store is not None:
+        since = checkpoint_store.get_checkpoint(checkpoint_name)
+    if since is not None:
+        logger.info(f"Load lineage changed since {since}.")
+    checkpoint = load_func(conn=conn, qdc_client=qdc_client, tenant_id=tenant_id, since=since)
+    if checkpoint is not None and checkpoint_store is not None:
+        checkpoint_store.set_checkpoint(checkpoint_name, checkpoint)
+
+
 def load_stats(
     conn: snowflake.SnowflakeConnectionConfig,
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
     stats_items: str,
+    outbox: Optional[Outbox] = None,
+    concurrency: int = 1,
+    stats_source: str = "view",
+    use_arrow: bool = False,
 ) -> None:
     logger.info("Generate Snowflake stats.")
 
@@ -125,6 +184,10 @@ def load_stats(
         qdc_client=qdc_client,
         tenant_id=tenant_id,
         stats_items=stats_items,
+        outbox=outbox,
+        concurrency=concurrency,
+        stats_source=stats_source,
+        use_arrow=use_arrow,
     )
 
     logger.info("Stats data is successfully finished.")
@@ -136,12 +199,16 @@ def load_sqllineage(
     conn: snowflake.SnowflakeConnectionConfig,
     qdc_client: qdc.QDCExternalAPIClient,
     tenant_id: str,
+    parse_cache: Optional[ParseCache] = None,
+    parse_processes: int = 1,
 ) -> None:
     logger.info("Generate Snowflake sqllineage.")
     snowflake_table_level_sqllineage(
         conn=conn,
         qdc_client=qdc_client,
         tenant_id=tenant_id,
+        parse_cache=parse_cache,
+        parse_processes=parse_processes,
     )
 
     logger.info("sqllineage data is successfully finished.")
@@ -245,6 +312,35 @@ if __name__ == "__main__":
         required=False,
         help="The method to sample data for stats",
     )
+    parser.add_argument(
+        "--stats_profiling_mode",
+        type=str,
+        choices=["union", "single_scan"],
+        action=env_default("SNOWFLAKE_STATS_PROFILING_MODE"),
+        default="union",
+        required=False,
+        help="How stats views aggregate column values. `union` scans a table once per column. \
+              `single_scan` aggregates all columns of a table in one scan and reshapes them with FLATTEN, \
+              which reduces warehouse usage for wide tables. Default value is union",
+    )
+    parser.add_argument(
+        "--lineage_lookback_hours",
+        type=int,
+        action=env_default("SNOWFLAKE_LINEAGE_LOOKBACK_HOURS"),
+        default=3,
+        required=False,
+        help="How many hours before the latest merged query `build_view` reads ACCESS_HISTORY again \
+              when it updates lineage tables incrementally. ACCESS_HISTORY lags up to 3 hours. Default value is 3",
+    )
+    parser.add_argument(
+        "--full_refresh",
+        type=bool,
+        action=env_default("SNOWFLAKE_FULL_REFRESH", store_true=True),
+        default=False,
+        required=False,
+        help="Whether `build_view` rebuilds lineage tables from the whole ACCESS_HISTORY \
+              and recreates all stats views even if their columns are not changed or not. Default value is False",
+    )
     parser.add_argument(
         "--tenant_id",
         type=str,
@@ -290,6 +386,77 @@ if __name__ == "__main__":
         required=False,
         help="The client secrete that is created on Quollio console to let clients access Quollio External API",
     )
+    parser.add_argument(
+        "--qdc_max_workers",
+        type=int,
+        action=env_default("QDC_MAX_WORKERS"),
+        default=1,
+        required=False,
+        help="The number of threads that send requests to Quollio External API concurrently. Default value is 1",
+    )
+    parser.add_argument(
+        "--qdc_rate_limit",
+        type=float,
+        action=env_default("QDC_RATE_LIMIT"),
+        default=2.0,
+        required=False,
+        help="The maximum number of requests per second sent to Quollio External API. \
+              The rate is lowered automatically while the API responds with 429. Default value is 2.0",
+    )
+    parser.add_argument(
+        "--fingerprint_db",
+        type=str,
+        action=env_default("QUOLLIO_FINGERPRINT_DB"),
+        required=False,
+        help="The path to a local SQLite file that keeps fingerprints of the ingested lineage and stats. \
+              When it is set, assets whose payload is not changed since the last successful ingestion are skipped. \
+              Remove the file if you want to ingest all assets again.",
+    )
+    parser.add_argument(
+        "--stats_materialization",
+        type=str,
+        choices=["view", "table"],
+        action=env_default("SNOWFLAKE_STATS_MATERIALIZATION"),
+        default="view",
+        required=False,
+        help="How `build_view` materializes column stats, and where `load_stats` reads them. \
+              `view` creates a view per table which aggregates stats on every `load_stats`. \
+              `table` writes aggregated stats into a table and refreshes only changed tables. Default value is view",
+    )
+    parser.add_argument(
+        "--sqllineage_cache_db",
+        type=str,
+        action=env_default("QUOLLIO_SQLLINEAGE_CACHE_DB"),
+        required=False,
+        help="The path to a local SQLite file that caches the lineage resolved from SQL statements. \
+              When it is set, statements parsed in previous runs of `load_sqllineage` are not parsed again.",
+    )
+    parser.add_argument(
+        "--sqllineage_processes",
+        type=int,
+        action=env_default("QUOLLIO_SQLLINEAGE_PROCESSES"),
+        default=1,
+        required=False,
+        help="The number of processes that parse SQL statements for `load_sqllineage`. \
+              0 uses all CPU cores. Default value is 1",
+    )
+    parser.add_argument(
+        "--journal_db",
+        type=str,
+        action=env_default("QUOLLIO_JOURNAL_DB"),
+        required=False,
+        help="The path to a local SQLite file that journals the payloads of `load_stats` and the assets \
+              which QDC acknowledged. Use it with `--resume` to restart a failed run where it stopped.",
+    )
+    parser.add_argument(
+        "--resume",
+        type=bool,
+        action=env_default("QUOLLIO_RESUME", store_true=True),
+        default=False,
+        required=False,
+        help="Whether to resume the last unfinished run recorded in `--journal_db` or not. \
+              A run is left unfinished when it stops or some assets fail to be ingested. Default value is False",
+    )
     parser.add_argument(
         "--enable_column_lineage",
         type=bool,
@@ -298,6 +465,24 @@ if __name__ == "__main__":
         required=False,
         help="Whether to ingest column lineage into QDIC or not. Default value is False",
     )
+    parser.add_argument(
+        "--since",
+        type=str,
+        action=env_default("SNOWFLAKE_LINEAGE_SINCE"),
+        required=False,
+        help="ISO 8601 timestamp. `load_lineage` loads only lineage whose upstreams changed after it. \
+              When it is not set and `--checkpoint_db` is set, the checkpoint of the last successful \
+              `load_lineage` stored in the file is used.",
+    )
+    parser.add_argument(
+        "--checkpoint_db",
+        type=str,
+        action=env_default("QUOLLIO_CHECKPOINT_DB"),
+        required=False,
+        help="The path to a local SQLite file that keeps the checkpoint of the last successful `load_lineage`. \
+              When it is set, `load_lineage` loads only lineage changed after the checkpoint. \
+              Remove the file if you want to load all lineage again.",
+    )
 
     stats_items = get_column_stats_items()
     parser.add_argument(
@@ -311,8 +496,35 @@ if __name__ == "__main__":
         help="The items for statistic values.\
               You can choose the items to be aggregated for stats. All items are selected by default.",
     )
+    parser.add_argument(
+        "--stats_concurrency",
+        type=int,
+        action=env_default("SNOWFLAKE_STATS_CONCURRENCY"),
+        default=1,
+        required=False,
+        help="The number of stats queries submitted to Snowflake concurrently as async queries. \
+              Use a value larger than 1 with a multi-cluster warehouse. Default value is 1",
+    )
+    parser.add_argument(
+        "--use_arrow",
+        type=bool,
+        action=env_default("SNOWFLAKE_USE_ARROW", store_true=True),
+        default=False,
+        required=False,
+        help="Whether to fetch table lineage and stats views as Arrow record batches instead of a dict per row or not. \
+              It requires `quollio-core[arrow]`. Default value is False",
+    )
     args = parser.parse_args()
+
+    if args.resume and not args.journal_db:
+        parser.error("--journal_db is required when --resume is used")
+    if args.since is not None:
+        try:
+            datetime.fromisoformat(args.since)
+        except ValueError:
+            parser.error("--since must be an ISO 8601 timestamp like 2024-01-01T00:00:00+00:00")
     set_log_level(level=args.log_level)
+    fingerprint_store = FingerprintStore(args.fingerprint_db) if args.fingerprint_db else None
 
     conn = snowflake.SnowflakeConnectionConfig(
         account_id=args.account_id,
@@ -335,39 +547,76 @@ if __name__ == "__main__":
             target_tables=args.target_tables,
             log_level=args.log_level,
             dbt_macro_source=args.dbt_macro_source,
+            stats_profiling_mode=args.stats_profiling_mode,
+            stats_materialization=args.stats_materialization,
+            lineage_lookback_hours=args.lineage_lookback_hours,
+            full_refresh=args.full_refresh,
         )
     if "load_lineage" in args.commands:
         qdc_client = qdc.QDCExternalAPIClient(
             base_url=args.api_url,
             client_id=args.client_id,
             client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
         )
+        checkpoint_store = CheckpointStore(args.checkpoint_db) if args.checkpoint_db else None
         load_lineage(
             conn=conn,
             qdc_client=qdc_client,
             tenant_id=args.tenant_id,
             enable_column_lineage=args.enable_column_lineage,
+            since=args.since,
+            checkpoint_store=checkpoint_store,
+            use_arrow=args.use_arrow,
         )
+        if checkpoint_store is not None:
+            checkpoint_store.close()
     if "load_stats" in args.commands:
+        outbox = (
+            Outbox(args.journal_db, command="snowflake:load_stats", resume=args.resume) if args.journal_db else None
+        )
         qdc_client = qdc.QDCExternalAPIClient(
             base_url=args.api_url,
             client_id=args.client_id,
             client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
+            outbox=outbox,
         )
         load_stats(
             conn=conn,
             qdc_client=qdc_client,
             tenant_id=args.tenant_id,
             stats_items=args.target_stats_items,
+            outbox=outbox,
+            concurrency=args.stats_concurrency,
+            stats_source=args.stats_materialization,
+            use_arrow=args.use_arrow,
         )
+        if outbox is not None:
+            outbox.finish()
+            outbox.close()
     if "load_sqllineage" in args.commands:
         qdc_client = qdc.QDCExternalAPIClient(
             base_url=args.api_url,
             client_id=args.client_id,
             client_secret=args.client_secret,
+            max_workers=args.qdc_max_workers,
+            rate_limit=args.qdc_rate_limit,
+            fingerprint_store=fingerprint_store,
         )
+        parse_cache = ParseCache(path=args.sqllineage_cache_db)
         load_sqllineage(
             conn=conn,
             qdc_client=qdc_client,
             tenant_id=args.tenant_id,
+            parse_cache=parse_cache,
+            parse_processes=args.sqllineage_processes,
         )
+        parse_cache.close()
+
+    if fingerprint_store is not None:
+        fingerprint_store.close()
@@ -5,7 +5,7 @@ from typing import Any, Dict, List, Union
 
 sys.path.insert(0, os.path.abspath("../.."))
 
-from quollio_core.helper.core import new_global_id, setup_dbt_profile, trim_prefix
+from quollio_core.helper.core import GlobalIdFactory, new_global_id, setup_dbt_profile, trim_prefix
 from quollio_core.repository.redshift import RedshiftConnectionConfig
 from quollio_core.repository.snowflake import SnowflakeConnectionConfig
 
@@ -45,6 +45,23 @@ class TestHelper(unittest.TestCase):
             )
             self.assertEqual(res, test_case["expect"])
 
+    def test_global_id_factory(self) -> None:
+        factory = GlobalIdFactory(tenant_id="tenant1", cluster_id="snowflake-test-endpoint", max_cache_size=2)
+        data_ids = ["SIMPSONSSIMPSONS_DATAVOTES_RAW", "DBSCHEMATABLE", "SIMPSONSSIMPSONS_DATAVOTES_RAW", "DBSCHEMAVIEW"]
+        expected = [
+            new_global_id(tenant_id="tenant1", cluster_id="snowflake-test-endpoint", data_id=data_id, data_type="table")
+            for data_id in data_ids
+        ]
+        self.assertEqual(expected[0], "tbl-a6b74bc53229fe1c743a13762213f6d0")
+        self.assertEqual(factory.new_global_ids(data_ids=data_ids, data_type="table"), expected)
+        self.assertEqual(factory.new_global_id(data_id=data_ids[0], data_type="table"), expected[0])
+        self.assertEqual(
+            factory.new_global_id(data_id=data_ids[0], data_type="column"),
+            new_global_id(
+                tenant_id="tenant1", cluster_id="snowflake-test-endpoint", data_id=data_ids[0], data_type="column"
+            ),
+        )
+
     def test_setup_dbt_profile(self):
         test_cases: List[Dict[str, Union[str, Dict[str, Any]]]] = [
             {
@@ -1,12 +1,12 @@
 import unittest
 from unittest.mock import Mock, patch
 
+from google.api_core.exceptions import BadRequest, PermissionDenied
 from google.auth.credentials import Credentials
 
 from quollio_core.profilers.bigquery import (
     bigquery_table_lineage,
     bigquery_table_stats,
-    column_stats_from_dataplex,
     generate_lineage_links,
     generate_table_list,
 )
@@ -71,7 +71,130 @@ class TestBigQueryProfilers(unittest.TestCase):
         )
 
         mock_bq_client.client.query.assert_called_once()
-        mock_qdc_client.update_stats_by_id.assert_called_once()
+        mock_qdc_client.update_stats_by_ids.assert_called_once()
+
+    def test_bigquery_table_stats_concurrently_in_batches(self):
+        mock_bq_client = Mock()
+        mock_qdc_client = Mock()
+        mock_outbox = Mock()
+        mock_outbox.is_unit_done.side_effect = lambda unit: unit == "done_table"
+        mock_bq_client.client.query.return_value.result.return_value = [
+            {
+                "DB_NAME": "db",
+                "SCHEMA_NAME": "schema",
+                "TABLE_NAME": "table",
+                "COLUMN_NAME": "column",
+                "MIN_VALUE": 1,
+                "MAX_VALUE": 100,
+                "AVG_VALUE": 50,
+                "MEDIAN_VALUE": 50,
+                "STDDEV_VALUE": 10,
+                "MODE_VALUE": 50,
+                "NULL_COUNT": 0,
+                "CARDINALITY": 100,
+            }
+        ]
+        mock_qdc_client.update_stats_by_ids.side_effect = lambda requests: [
+            (global_id, 200) for global_id, _ in requests
+        ]
+
+        bigquery_table_stats(
+            qdc_client=mock_qdc_client,
+            bq_client=mock_bq_client,
+            tenant_id="tenant_id",
+            org_id="org_id",
+            dataplex_stats_tables=["done_table", "table1", "table2", "table3"],
+            outbox=mock_outbox,
+            concurrency=2,
+            batch_size=2,
+        )
+
+        queries = sorted(call.args[0] for call in mock_bq_client.client.query.call_args_list)
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(any("FROM `table1`" in q and "UNION ALL" in q and "FROM `table2`" in q for q in queries))
+        self.assertTrue(any("FROM `table3`" in q and "UNION ALL" not in q for q in queries))
+        self.assertEqual(mock_qdc_client.update_stats_by_ids.call_count, 2)
+        self.assertEqual(
+            sorted(call.kwargs["unit"] for call in mock_outbox.mark_unit_done.call_args_list),
+            ["table1", "table2", "table3"],
+        )
+
+    def test_bigquery_table_stats_batches_by_location(self):
+        mock_bq_client = Mock()
+        mock_qdc_client = Mock()
+        mock_bq_client.get_dataset_location.side_effect = lambda dataset_id: "EU" if dataset_id == "p.eu" else "US"
+
+        def _query(query):
+            job = Mock()
+            if "`p.us.broken`" in query and "UNION ALL" in query:
+                job.result.side_effect = BadRequest("Not found: Table p:us.broken")
+            else:
+                job.result.return_value = []
+            return job
+
+        mock_bq_client.client.query.side_effect = _query
+        mock_qdc_client.update_stats_by_ids.side_effect = lambda requests: list(requests)
+
+        bigquery_table_stats(
+            qdc_client=mock_qdc_client,
+            bq_client=mock_bq_client,
+            tenant_id="tenant_id",
+            org_id="org_id",
+            dataplex_stats_tables=["p.us.t1", "p.eu.t2", "p.us.t3", "p.us.broken"],
+            concurrency=2,
+            batch_size=3,
+        )
+
+        queries = [call.args[0] for call in mock_bq_client.client.query.call_args_list]
+        # tables in EU and US are never UNION ALLed, and the failed batch is retried table by table.
+        self.assertEqual(len(queries), 5)
+        self.assertEqual(mock_bq_client.get_dataset_location.call_count, 2)
+        self.assertFalse(any("`p.eu.t2`" in q and "`p.us.t1`" in q for q in queries))
+        self.assertEqual(sum("UNION ALL" not in q and "`p.us.broken`" in q for q in queries), 1)
+        self.assertEqual(mock_qdc_client.update_stats_by_ids.call_count, 4)
+
+    def test_bigquery_table_stats_with_storage_api(self):
+        import pyarrow
+
+        row = {
+            "DB_NAME": "db",
+            "SCHEMA_NAME": "schema",
+            "TABLE_NAME": "table",
+            "COLUMN_NAME": "column",
+            "MIN_VALUE": "1",
+            "MAX_VALUE": "100",
+            "AVG_VALUE": 50.0,
+            "MEDIAN_VALUE": 50.0,
+            "STDDEV_VALUE": 10.0,
+            "MODE_VALUE": "50",
+            "NULL_COUNT": 0,
+            "CARDINALITY": 100,
+        }
+        batch = pyarrow.RecordBatch.from_pylist([row])
+
+        def _ingest(use_storage_api: bool) -> list:
+            mock_bq_client = Mock()
+            mock_qdc_client = Mock()
+            mock_bq_client.client.query.return_value.result.return_value = [row]
+            mock_bq_client.read_record_batches.return_value = iter([batch])
+            payloads = []
+            mock_qdc_client.update_stats_by_ids.side_effect = lambda requests: [
+                payloads.append(request) or (request[0], 200) for request in requests
+            ]
+            bigquery_table_stats(
+                qdc_client=mock_qdc_client,
+                bq_client=mock_bq_client,
+                tenant_id="tenant_id",
+                org_id="org_id",
+                dataplex_stats_tables=["dataplex_stats_table"],
+                use_storage_api=use_storage_api,
+            )
+            self.assertEqual(mock_bq_client.read_record_batches.call_count, int(use_storage_api))
+            return payloads
+
+        payloads = _ingest(use_storage_api=True)
+        self.assertEqual(len(payloads), 1)
+        self.assertEqual(payloads, _ingest(use_storage_api=False))
 
     @patch("quollio_core.profilers.bigquery.BigQueryClient")
     def test_generate_table_list(self, MockBigQueryClient):
@@ -112,64 +235,72 @@ class TestBigQueryProfilers(unittest.TestCase):
         )
         mock_lineage_client.get_links.assert_called_once_with(request=mock_search_request)
 
-    @patch("quollio_core.profilers.bigquery.logger")
-    @patch("quollio_core.profilers.bigquery.BigQueryClient")
-    def test_column_stats_from_dataplex(self, MockBigQueryClient, mock_logger):
-        mock_bq_client = MockBigQueryClient.return_value
-        mock_bq_client.client.query.return_value.result.return_value = [
-            {
-                "DB_NAME": "db",
-                "SCHEMA_NAME": "schema",
-                "TABLE_NAME": "table",
-                "COLUMN_NAME": "column",
-                "MIN_VALUE": 1,
-                "MAX_VALUE": 100,
-                "AVG_VALUE": 50,
-                "MEDIAN_VALUE": 50,
-                "STDDEV_VALUE": 10,
-                "MODE_VALUE": 50,
-                "NULL_COUNT": 0,
-                "CARDINALITY": 100,
-            }
-        ]
+    def test_generate_lineage_links_concurrently(self):
+        def link(source: str, target: str) -> Mock:
+            lineage = Mock()
+            lineage.source.fully_qualified_name = f"bigquery:{source}"
+            lineage.target.fully_qualified_name = f"bigquery:{target}"
+            return lineage
 
-        results = column_stats_from_dataplex(mock_bq_client, "dataplex_stats_table")
+        links = {
+            ("p.d.t1", "us"): [link("p.d.s1", "p.d.t1"), link("p.d.s2", "p.d.t1")],
+            ("p.d.t1", "eu"): [link("p.d.s1", "p.d.t1")],
+            ("p.d.t2", "us"): [link("p.d.s3", "p.d.t2")],
+        }
+        mock_lineage_client = Mock()
+        mock_lineage_client.get_links.side_effect = lambda request: links.get(
+            (request.target.fully_qualified_name.replace("bigquery:", ""), request.parent.split("/")[-1]), []
+        )
 
-        expected_results = [
-            {
-                "DB_NAME": "db",
-                "SCHEMA_NAME": "schema",
-                "TABLE_NAME": "table",
-                "COLUMN_NAME": "column",
-                "MIN_VALUE": 1,
-                "MAX_VALUE": 100,
-                "AVG_VALUE": 50,
-                "MEDIAN_VALUE": 50,
-                "STDDEV_VALUE": 10,
-                "MODE_VALUE": 50,
-                "NULL_COUNT": 0,
-                "CARDINALITY": 100,
-            }
-        ]
+        lineage_links = generate_lineage_links(
+            all_tables=["p.d.t1", "p.d.t2", "p.d.t3", "p.quollio.t4"],
+            lineage_client=mock_lineage_client,
+            project_id="p",
+            regions=["us", "eu"],
+            max_workers=4,
+        )
 
-        self.assertEqual(results, expected_results)
-        mock_bq_client.client.query.assert_called_once()
-        mock_logger.debug.assert_called_once_with(
-            "Executing Query: \n"
-            "    SELECT\n"
-            "        data_source.table_project_id AS DB_NAME,\n"
-            "        data_source.dataset_id AS SCHEMA_NAME,\n"
-            "        data_source.table_id AS TABLE_NAME,\n"
-            "        column_name AS COLUMN_NAME,\n"
-            "        min_value AS MIN_VALUE,\n"
-            "        max_value AS MAX_VALUE,\n"
-            "        average_value AS AVG_VALUE,\n"
-            "        quartile_median AS MEDIAN_VALUE,\n"
-            "        standard_deviation AS STDDEV_VALUE,\n"
-            "        top_n[0][0] AS MODE_VALUE,\n"
-            "        CAST((percent_null / 100) * job_rows_scanned AS INT) as NULL_COUNT,\n"
-            "        CAST((percent_unique / 100) * job_rows_scanned AS INT) as CARDINALITY\n"
-            "    FROM `dataplex_stats_table`\n    "
+        self.assertEqual(lineage_links, {"p.d.t1": {"p.d.s1", "p.d.s2"}, "p.d.t2": {"p.d.s3"}})
+        self.assertEqual(mock_lineage_client.get_links.call_count, 6)
+
+    def test_generate_lineage_links_bulk(self):
+        def link(source: str, target: str) -> Mock:
+            lineage = Mock()
+            lineage.source.fully_qualified_name = f"bigquery:{source}"
+            lineage.target.fully_qualified_name = f"bigquery:{target}"
+            return lineage
+
+        def list_process_names(project_id: str, region: str) -> list:
+            if region == "eu":
+                raise PermissionDenied("denied")
+            return ["process1", "process2"]
+
+        process_links = {
+            "process1": [link("p.d.s1", "p.d.t1"), link("p.d.s1", "other.d.t9")],
+            "process2": [link("p.d.s2", "p.d.t1"), link("p.d.t1", "p.quollio.t4")],
+        }
+        mock_lineage_client = Mock()
+        mock_lineage_client.list_process_names.side_effect = list_process_names
+        mock_lineage_client.get_process_links.side_effect = lambda process_name: iter(process_links[process_name])
+        mock_lineage_client.get_links.side_effect = lambda request: (
+            [link("p.d.s3", "p.d.t2")] if request.target.fully_qualified_name == "bigquery:p.d.t2" else []
+        )
+
+        for max_workers in [1, 2]:
+            lineage_links = generate_lineage_links(
+                all_tables=["p.d.t1", "p.d.t2", "p.quollio.t4"],
+                lineage_client=mock_lineage_client,
+                project_id="p",
+                regions=["us", "eu"],
+                max_workers=max_workers,
+                discovery_mode="bulk",
+            )
+            self.assertEqual(lineage_links, {"p.d.t1": {"p.d.s1", "p.d.s2"}, "p.d.t2": {"p.d.s3"}})
+
+        # Tables are searched one by one only in the region where the enumeration failed.
+        self.assertEqual(
+            [call.kwargs["request"].parent for call in mock_lineage_client.get_links.call_args_list],
+            ["projects/p/locations/eu"] * 4,
         )
 
 
@@ -0,0 +1,29 @@
+import unittest
+
+from quollio_core.profilers.databricks import _gen_column_stats_queries
+from quollio_core.profilers.stats import get_column_stats_items
+
+
+class TestDatabricksProfilers(unittest.TestCase):
+    def test_gen_column_stats_queries(self):
+        tables = [
+            {"table_fqdn": "catalog.schema.table{}_profile_metrics".format(i), "table_name": "table{}".format(i)}
+            for i in range(3)
+        ]
+
+        queries = _gen_column_stats_queries(tables=tables, stats_items=get_column_stats_items(), batch_size=1)
+        self.assertEqual(
+            list(queries.keys()), ["catalog.schema.table0", "catalog.schema.table1", "catalog.schema.table2"]
+        )
+        self.assertNotIn("UNION ALL", queries["catalog.schema.table0"])
+
+        queries = _gen_column_stats_queries(tables=tables, stats_items=get_column_stats_items(), batch_size=2)
+        self.assertEqual(len(queries), 2)
+        batched_query = list(queries.values())[0]
+        self.assertEqual(batched_query.count("UNION ALL"), 1)
+        self.assertIn("FROM\n                catalog.schema.table0_profile_metrics", batched_query)
+        self.assertIn("FROM\n                catalog.schema.table1_profile_metrics", batched_query)
+
+
+if __name__ == "__main__":
+    unittest.main()
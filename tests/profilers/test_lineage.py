@@ -8,8 +8,11 @@ from quollio_core.profilers.lineage import (
     LineageInput,
     LineageInputs,
     gen_column_lineage_payload,
+    gen_sorted_table_lineage_payload_inputs,
     gen_table_lineage_payload,
+    gen_table_lineage_payload_from_record_batches,
     gen_table_lineage_payload_inputs,
+    merge_lineage_inputs,
     parse_snowflake_results,
 )
 
@@ -187,7 +190,7 @@ class TestLineage(unittest.TestCase):
             res = gen_table_lineage_payload(
                 tenant_id=test_input["tenant_id"], endpoint=test_input["ENDPOINT"], tables=test_input["TABLE_INPUT"]
             )
-            self.assertEqual(res, test_case["expect"])
+            self.assertEqual(list(res), test_case["expect"])
 
     def test_gen_column_lineage_payload(self):
         test_cases = [
@@ -370,7 +373,7 @@ class TestLineage(unittest.TestCase):
             res = gen_column_lineage_payload(
                 tenant_id=test_input["tenant_id"], endpoint=test_input["ENDPOINT"], columns=test_input["COLUMN_INPUT"]
             )
-            self.assertEqual(res, test_case["expect"])
+            self.assertEqual(list(res), test_case["expect"])
 
     def test_gen_lineage_payload_inputs(self):
         test_cases = [
@@ -411,6 +414,16 @@ class TestLineage(unittest.TestCase):
             res = gen_table_lineage_payload_inputs(test_case["input"])
             self.assertEqual(res, test_case["expect"])
 
+    def test_gen_sorted_table_lineage_payload_inputs(self):
+        rows = [
+            ["dev.public.table_dest1", "dev.public.table_src1"],
+            ["dev.public.table_dest2", "dev.public.table_src3"],
+            ["dev.public.table_dest1", "dev.public.table_src2"],
+            ["dev.public.table_dest2", "dev.public.table_src4"],
+        ]
+        res = gen_sorted_table_lineage_payload_inputs(iter(sorted(rows)))
+        self.assertEqual(list(res), gen_table_lineage_payload_inputs(rows))
+
     def test_parse_snowflake_results(self):
         test_cases = [
             {
@@ -443,7 +456,7 @@ class TestLineage(unittest.TestCase):
         ]
         for test_case in test_cases:
             res = parse_snowflake_results(test_case["input"])
-            self.assertEqual(res, test_case["expect"])
+            self.assertEqual(list(res), test_case["expect"])
 
     def test_parse_bigquery_table_lineage(self):
         # Define test input and expected output
@@ -479,6 +492,61 @@ class TestLineage(unittest.TestCase):
         # Assert the result matches the expected output
         self.assertEqual(result, expected_output)
 
+    def test_merge_lineage_inputs(self):
+        def lineage_inputs(downstream: str, upstreams: list) -> LineageInputs:
+            return LineageInputs(
+                downstream_global_id=downstream,
+                downstream_database_name="db",
+                downstream_schema_name="schema",
+                downstream_table_name=downstream,
+                downstream_column_name="",
+                upstreams=LineageInput(upstream=upstreams),
+            )
+
+        res = merge_lineage_inputs(
+            [
+                lineage_inputs("tbl-a", ["tbl-1", "tbl-2"]),
+                lineage_inputs("tbl-b", ["tbl-3"]),
+                lineage_inputs("tbl-a", ["tbl-2", "tbl-4"]),
+            ]
+        )
+        expected = [lineage_inputs("tbl-a", ["tbl-1", "tbl-2", "tbl-4"]), lineage_inputs("tbl-b", ["tbl-3"])]
+        self.assertEqual(res, expected)
+
+    def test_gen_table_lineage_payload_from_record_batches(self):
+        import pyarrow
+
+        results = [
+            {
+                "DOWNSTREAM_TABLE_NAME": "TEST_DB.TEST_SCHEMA.TABLE_A",
+                "DOWNSTREAM_TABLE_DOMAIN": "TABLE",
+                "UPSTREAM_TABLES": '[{"upstream_object_name": "TEST_DB.TEST_SCHEMA.TABLE_B"}]',
+            },
+            {
+                "DOWNSTREAM_TABLE_NAME": "INVALID_NAME",
+                "DOWNSTREAM_TABLE_DOMAIN": "TABLE",
+                "UPSTREAM_TABLES": "[]",
+            },
+            {
+                "DOWNSTREAM_TABLE_NAME": "TEST_DB.TEST_SCHEMA.TABLE_C",
+                "DOWNSTREAM_TABLE_DOMAIN": "VIEW",
+                "UPSTREAM_TABLES": '[{"upstream_object_name": "TEST_DB.TEST_SCHEMA.TABLE_A"}, '
+                '{"upstream_object_name": "TEST_DB.TEST_SCHEMA.TABLE_B"}]',
+            },
+        ]
+        res = gen_table_lineage_payload_from_record_batches(
+            tenant_id="tenant1",
+            endpoint="snowflake-test-endpoint",
+            batches=[pyarrow.RecordBatch.from_pylist(results[:1]), pyarrow.RecordBatch.from_pylist(results[1:])],
+        )
+        expected = list(
+            gen_table_lineage_payload(
+                tenant_id="tenant1", endpoint="snowflake-test-endpoint", tables=parse_snowflake_results(results)
+            )
+        )
+        self.assertEqual(list(res), expected)
+        self.assertEqual(len(expected), 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,17 @@
 import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
 
 from snowflake.connector import errors
 
-from quollio_core.profilers.snowflake import handle_error
+from quollio_core.profilers.snowflake import (
+    _get_materialized_stats_results,
+    _iter_query_rows,
+    handle_error,
+    snowflake_table_to_table_lineage,
+)
+from quollio_core.profilers.stats import get_is_target_stats_items
+from quollio_core.repository.snowflake import SnowflakeConnectionConfig
 
 
 class TestSnowflakeProfilers(unittest.TestCase):
@@ -64,6 +73,135 @@ class TestSnowflakeProfilers(unittest.TestCase):
                         err=test.get("input").get("error"), force_skip=test.get("input").get("force_skip")
                     )
 
+    def test_get_materialized_stats_results(self):
+        conn = SnowflakeConnectionConfig(
+            account_id="account",
+            account_user="user",
+            account_password="password",
+            account_build_role="build",
+            account_query_role="query",
+            account_warehouse="warehouse",
+            account_database="QUOLLIO",
+            account_schema="PROFILER",
+        )
+        rows = [
+            {"DB_NAME": "DB", "SCHEMA_NAME": "SC", "TABLE_NAME": "T1", "COLUMN_NAME": "C1"},
+            {"DB_NAME": "DB", "SCHEMA_NAME": "SC", "TABLE_NAME": "T2", "COLUMN_NAME": "C1"},
+            {"DB_NAME": "DB", "SCHEMA_NAME": "SC", "TABLE_NAME": "T1", "COLUMN_NAME": "C2"},
+        ]
+        sf_executor = MagicMock()
+        sf_executor.get_query_results.return_value = (rows, None)
+        outbox = MagicMock()
+        outbox.is_unit_done.side_effect = lambda unit: unit == '"DB"."SC"."T2"'
+
+        res = list(
+            _get_materialized_stats_results(
+                sf_executor=sf_executor,
+                conn=conn,
+                is_aggregate_items=get_is_target_stats_items(stats_items=["max"]),
+                outbox=outbox,
+            )
+        )
+
+        self.assertEqual(res, [('"DB"."SC"."T1"', [rows[0], rows[2]], None)])
+        sf_executor.get_query_results.assert_called_once()
+        self.assertIn("QUOLLIO.PROFILER.QUOLLIO_STATS_COLUMNS", sf_executor.get_query_results.call_args.kwargs["query"])
+
+    def test_iter_query_rows(self):
+        sf_executor = MagicMock()
+        sf_executor.iter_query_results.return_value = iter([([{"ID": 1}, {"ID": 2}], None), ([{"ID": 3}], None)])
+        self.assertEqual(
+            list(_iter_query_rows(sf_executor=sf_executor, query="SELECT 1")), [{"ID": 1}, {"ID": 2}, {"ID": 3}]
+        )
+
+        err = errors.ProgrammingError(msg="denied", errno=2003)
+        sf_executor.iter_query_results.return_value = iter([([{"ID": 1}], None), ([], err)])
+        self.assertEqual(list(_iter_query_rows(sf_executor=sf_executor, query="SELECT 1")), [{"ID": 1}])
+
+    @patch("quollio_core.profilers.snowflake.snowflake.SnowflakeQueryExecutor")
+    def test_snowflake_table_to_table_lineage_since(self, mock_executor):
+        conn = SnowflakeConnectionConfig(
+            account_id="account",
+            account_user="user",
+            account_password="password",
+            account_build_role="build",
+            account_query_role="query",
+            account_warehouse="warehouse",
+            account_database="QUOLLIO",
+            account_schema="PROFILER",
+        )
+        rows = [
+            {
+                "DOWNSTREAM_TABLE_NAME": "DB.SC.T{}".format(i),
+                "DOWNSTREAM_TABLE_DOMAIN": "Table",
+                "UPSTREAM_TABLES": '[{"upstream_object_name": "DB.SC.SRC"}]',
+                "LAST_CHANGED_AT": datetime(2024, 1, i, tzinfo=timezone.utc),
+            }
+            for i in [2, 3, 1]
+        ]
+        sf_executor = mock_executor.return_value.__enter__.return_value
+        sf_executor.iter_query_results.return_value = iter([(rows, None)])
+        qdc_client = MagicMock()
+        qdc_client.update_lineage_by_ids.side_effect = lambda payloads: [(gid, 200) for gid, _ in payloads]
+
+        res = snowflake_table_to_table_lineage(
+            conn=conn, qdc_client=qdc_client, tenant_id="tenant", since="2024-01-01T00:00:00+00:00"
+        )
+
+        self.assertEqual(res, "2024-01-03T00:00:00+00:00")
+        query = sf_executor.iter_query_results.call_args.kwargs["query"]
+        self.assertIn("QUOLLIO.PROFILER.QUOLLIO_LINEAGE_TABLE_LEVEL", query)
+        self.assertIn("WHERE LAST_CHANGED_AT > '2024-01-01T00:00:00+00:00'::TIMESTAMP_LTZ", query)
+
+        # The checkpoint doesn't move when some lineage fails to be ingested.
+        sf_executor.iter_query_results.return_value = iter([(rows, None)])
+        qdc_client.update_lineage_by_ids.side_effect = lambda payloads: [(gid, 500) for gid, _ in payloads]
+        self.assertIsNone(snowflake_table_to_table_lineage(conn=conn, qdc_client=qdc_client, tenant_id="tenant"))
+        self.assertNotIn("WHERE", sf_executor.iter_query_results.call_args.kwargs["query"])
+
+    @patch("quollio_core.profilers.snowflake.snowflake.SnowflakeQueryExecutor")
+    def test_snowflake_table_to_table_lineage_with_arrow(self, mock_executor):
+        import pyarrow
+
+        conn = SnowflakeConnectionConfig(
+            account_id="account",
+            account_user="user",
+            account_password="password",
+            account_build_role="build",
+            account_query_role="query",
+            account_warehouse="warehouse",
+            account_database="QUOLLIO",
+            account_schema="PROFILER",
+        )
+        rows = [
+            {
+                "DOWNSTREAM_TABLE_NAME": "DB.SC.T{}".format(i),
+                "DOWNSTREAM_TABLE_DOMAIN": "Table",
+                "UPSTREAM_TABLES": '[{"upstream_object_name": "DB.SC.SRC"}]',
+                "LAST_CHANGED_AT": datetime(2024, 1, i, tzinfo=timezone.utc),
+            }
+            for i in [2, 3, 1]
+        ]
+        sf_executor = mock_executor.return_value.__enter__.return_value
+        sf_executor.iter_query_results.return_value = iter([(rows, None)])
+        sf_executor.iter_record_batches.return_value = iter(
+            [pyarrow.RecordBatch.from_pylist(rows[:2]), pyarrow.RecordBatch.from_pylist(rows[2:])]
+        )
+        uploaded = {}
+        qdc_client = MagicMock()
+        qdc_client.update_lineage_by_ids.side_effect = lambda payloads: [
+            (gid, 200) for gid, _ in uploaded.setdefault(len(uploaded), list(payloads))
+        ]
+
+        expected = snowflake_table_to_table_lineage(conn=conn, qdc_client=qdc_client, tenant_id="tenant")
+        res = snowflake_table_to_table_lineage(conn=conn, qdc_client=qdc_client, tenant_id="tenant", use_arrow=True)
+
+        self.assertEqual(res, expected)
+        self.assertEqual(res, "2024-01-03T00:00:00+00:00")
+        self.assertEqual(uploaded[1], uploaded[0])
+        self.assertEqual(len(uploaded[1]), 3)
+        sf_executor.iter_record_batches.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
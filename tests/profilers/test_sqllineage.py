@@ -1,6 +1,8 @@
 import os
 import sys
+import tempfile
 import unittest
+from unittest.mock import patch
 
 from sqlglot.errors import ParseError
 
@@ -9,6 +11,7 @@ sys.path.insert(0, os.path.abspath("../.."))
 from quollio_core.helper.core import new_global_id
 from quollio_core.profilers.lineage import LineageInput, LineageInputs
 from quollio_core.profilers.sqllineage import SQLLineage, Table
+from quollio_core.repository.parse_cache import ParseCache
 
 
 class TestSQLLineage(unittest.TestCase):
@@ -1361,6 +1364,56 @@ class TestSQLLineage(unittest.TestCase):
             test_case["expect"].upstreams.upstream.sort()
             self.assertEqual(lineage_inputs, test_case["expect"])
 
+    def test_get_table_level_lineage_source_with_cache(self):
+        sql = "create table dest_table as select * from test1 a inner join test2 b on a.id = b.id"
+        expected = (
+            {
+                Table(db="TEST_DB", db_schema="PUBLIC", table="TEST1"),
+                Table(db="TEST_DB", db_schema="PUBLIC", table="TEST2"),
+            },
+            Table(db="DEST_DB", db_schema="PUBLIC", table="DEST_TABLE"),
+        )
+        args = dict(dialect="snowflake", src_db="test_db", src_schema="public", dest_db="dest_db", dest_schema="public")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "parse_cache.db")
+            with ParseCache(path=path) as cache:
+                res = SQLLineage(cache=cache).get_table_level_lineage_source(sql=sql, **args)
+                self.assertEqual(res, expected)
+
+            # the statement reformatted is resolved from the persisted cache without parsing it.
+            with ParseCache(path=path) as cache:
+                with patch("quollio_core.profilers.sqllineage.sqlglot.parse_one") as mock_parse_one:
+                    res = SQLLineage(cache=cache).get_table_level_lineage_source(sql=sql.replace(" ", "\n    "), **args)
+                    mock_parse_one.assert_not_called()
+                self.assertEqual(res, expected)
+                self.assertEqual(cache.hits, 1)
+
+    def test_get_table_level_lineage_sources(self):
+        statements = [
+            dict(sql="insert into dest{i} select * from src{i}".format(i=i), dialect="redshift", dest_db="db")
+            for i in range(4)
+        ]
+        expected = [
+            (
+                i,
+                {Table(db="", db_schema="", table="src{i}".format(i=i))},
+                Table(db="db", db_schema="", table="dest{i}".format(i=i)),
+            )
+            for i in range(4)
+        ]
+        with ParseCache() as cache:
+            client = SQLLineage(cache=cache)
+            # dest1 and dest3 are resolved from the cache, but the results keep the input order.
+            list(client.get_table_level_lineage_sources(statements=[statements[1], statements[3]]))
+            res = list(client.get_table_level_lineage_sources(statements=statements, processes=2, chunksize=1))
+            self.assertEqual(res, expected)
+
+            res = client.get_table_level_lineage_sources(statements=statements, processes=2, ordered=False)
+            self.assertEqual(sorted(res, key=lambda r: r[0]), expected)
+
+        with self.assertRaises(ParseError):
+            list(self.client.get_table_level_lineage_sources(statements=[dict(sql="select (", dialect="redshift")]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -12,6 +12,7 @@ from quollio_core.profilers.stats import (
     StatsRequest,
     TableStatsInput,
     gen_table_stats_payload,
+    gen_table_stats_payload_from_record_batches,
     gen_table_stats_payload_from_tuple,
     get_column_stats_items,
     get_is_target_stats_items,
@@ -213,7 +214,7 @@ class TestStats(unittest.TestCase):
             res = gen_table_stats_payload(
                 tenant_id=test_input["tenant_id"], endpoint=test_input["ENDPOINT"], stats=test_input["STATS"]
             )
-            self.assertEqual(res, test_case["expect"])
+            self.assertEqual(list(res), test_case["expect"])
 
     def test_gen_table_stats_payload_from_tuple(self):
         test_cases = [
@@ -276,7 +277,34 @@ class TestStats(unittest.TestCase):
             res = gen_table_stats_payload_from_tuple(
                 tenant_id=test_input["tenant_id"], endpoint=test_input["ENDPOINT"], stats=test_input["STATS"]
             )
-            self.assertEqual(res, test_case["expect"])
+            self.assertEqual(list(res), test_case["expect"])
+
+    def test_gen_table_stats_payload_from_record_batches(self):
+        import pyarrow
+
+        stats = [
+            {
+                "db_name": "TEST_DB1",
+                "schema_name": "TEST_SCHEMA1",
+                "table_name": "TEST_TABLE1",
+                "column_name": column,
+                "max_value": "10",
+                "min_value": "1",
+                "null_count": 2,
+                "cardinality": 3,
+                "avg_value": "4.2",
+                "median_value": None,
+                "mode_value": "6",
+                "stddev_value": None,
+            }
+            for column in ["TEST_COLUMN1", "TEST_COLUMN2", "TEST_COLUMN3"]
+        ]
+        batches = [pyarrow.RecordBatch.from_pylist(stats[:2]), pyarrow.RecordBatch.from_pylist(stats[2:])]
+        res = gen_table_stats_payload_from_record_batches(
+            tenant_id="tenant1", endpoint="snowflake-test-endpoint", batches=batches
+        )
+        expected = gen_table_stats_payload(tenant_id="tenant1", endpoint="snowflake-test-endpoint", stats=stats)
+        self.assertEqual(list(res), list(expected))
 
     def test_render_sql_for_stats(self):
         test_cases = [
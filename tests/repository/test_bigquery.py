@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, Mock, patch
 
 from google.cloud.datacatalog_lineage_v1 import SearchLinksRequest
 from google.oauth2.service_account import Credentials
@@ -71,6 +71,30 @@ class TestBigQueryClient(unittest.TestCase):
         self.bq_client.list_tables.assert_called_once_with("test_dataset")
         self.bq_client.get_columns.assert_called_once_with("test_table", "test_dataset")
 
+    def test_list_tables_from_information_schema(self):
+        rows = {
+            "us": [
+                {"dataset_id": "ds1", "table_id": "t1", "table_type": "BASE TABLE"},
+                {"dataset_id": "ds1", "table_id": "v1", "table_type": "VIEW"},
+            ],
+            "eu": [{"dataset_id": "ds2", "table_id": "mv1", "table_type": "MATERIALIZED VIEW"}],
+        }
+        self.mock_bq_client.query.side_effect = lambda query: Mock(
+            result=Mock(return_value=rows["us" if "`region-us`" in query else "eu"])
+        )
+
+        tables = self.bq_client.list_tables_from_information_schema(["US", "eu"])
+
+        self.assertEqual(
+            tables,
+            [
+                {"table_id": "t1", "table_type": "TABLE", "project": "test-project", "dataset_id": "ds1"},
+                {"table_id": "v1", "table_type": "VIEW", "project": "test-project", "dataset_id": "ds1"},
+                {"table_id": "mv1", "table_type": "MATERIALIZED_VIEW", "project": "test-project", "dataset_id": "ds2"},
+            ],
+        )
+        self.assertEqual(self.mock_bq_client.query.call_count, 2)
+
 
 class TestGCPLineageClient(unittest.TestCase):
     @patch("quollio_core.repository.bigquery.LineageClient")
@@ -88,7 +112,22 @@ class TestGCPLineageClient(unittest.TestCase):
         links = self.lineage_client.get_links(request)
 
         self.assertEqual(links, ["link1", "link2"])
-        self.mock_lineage_client.search_links.assert_called_once_with(request)
+        self.mock_lineage_client.search_links.assert_called_once_with(request, retry=ANY)
+
+    def test_get_process_links(self):
+        runs = [Mock(), Mock()]
+        runs[0].name = "run1"
+        runs[1].name = "run2"
+        events = {"run1": [Mock(links=["link1", "link2"])], "run2": [Mock(links=["link3"]), Mock(links=[])]}
+        self.mock_lineage_client.list_runs.return_value = runs
+        self.mock_lineage_client.list_lineage_events.side_effect = lambda parent, retry: events[parent]
+
+        links = list(self.lineage_client.get_process_links("projects/p/locations/us/processes/process1"))
+
+        self.assertEqual(links, ["link1", "link2", "link3"])
+        self.mock_lineage_client.list_runs.assert_called_once_with(
+            parent="projects/p/locations/us/processes/process1", retry=ANY
+        )
 
 
 class TestUtilityFunctions(unittest.TestCase):
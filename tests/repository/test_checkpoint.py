@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+
+from quollio_core.repository.checkpoint import CheckpointStore
+
+
+class TestCheckpointStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "checkpoints.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_checkpoint(self):
+        with CheckpointStore(self.path) as store:
+            self.assertIsNone(store.get_checkpoint("snowflake:table_lineage"))
+            store.set_checkpoint("snowflake:table_lineage", "2024-01-01T00:00:00+00:00")
+            store.set_checkpoint("snowflake:table_lineage", "2024-01-02T00:00:00+00:00")
+
+        with CheckpointStore(self.path) as store:
+            self.assertEqual(store.get_checkpoint("snowflake:table_lineage"), "2024-01-02T00:00:00+00:00")
+            self.assertIsNone(store.get_checkpoint("snowflake:column_lineage"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import patch
+
+from quollio_core.repository.databricks import DatabricksConnectionConfig, DatabricksExecutorPool
+
+
+class TestDatabricksExecutorPool(unittest.TestCase):
+    def setUp(self):
+        self.config = DatabricksConnectionConfig(
+            host="dummy.cloud.databricks.com",
+            http_path="/sql/1.0/warehouses/dummy",
+            client_id="client_id",
+            client_secret="client_secret",
+            catalog="catalog",
+            schema="schema",
+        )
+
+    @patch("quollio_core.repository.databricks.DatabricksQueryExecutor.get_query_results")
+    @patch("quollio_core.repository.databricks.connect")
+    def test_get_query_results_concurrently(self, mock_connect, mock_get_query_results):
+        mock_get_query_results.side_effect = lambda query: [{"query": query}]
+        queries = {"tbl{}".format(i): "query{}".format(i) for i in range(10)}
+
+        for size, expected_connections in [(1, 1), (3, 3)]:
+            mock_connect.reset_mock()
+            with DatabricksExecutorPool(config=self.config, size=size) as pool:
+                res = dict(pool.get_query_results_concurrently(queries))
+                # connections are reused for the following queries.
+                pool.get_query_results("query")
+
+            self.assertEqual(res, {key: [{"query": query}] for key, query in queries.items()})
+            self.assertLessEqual(mock_connect.call_count, expected_connections)
+            self.assertEqual(mock_connect.return_value.close.call_count, mock_connect.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+import glob
+import hashlib
+import os
+import random
+import re
+import unittest
+
+import yaml
+from dbt.graph.selector_methods import is_selected_node
+from jinja2 import Environment
+
+from quollio_core.repository import dbt
+
+DBT_PROJECTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "quollio_core", "dbt_projects")
+
+
+class TestStatsShardModels(unittest.TestCase):
+    def _load_models(self, project: str):
+        with open(os.path.join(DBT_PROJECTS_DIR, project, "dbt_project.yml")) as f:
+            project_name = yaml.safe_load(f)["name"]
+        models = {}
+        for path in glob.glob(os.path.join(DBT_PROJECTS_DIR, project, "models", "*.sql")):
+            with open(path) as f:
+                models[os.path.splitext(os.path.basename(path))[0]] = f.read()
+        return project_name, models
+
+    def test_shard_models_match_max_stats_shards(self):
+        for project in ["snowflake", "redshift"]:
+            _, models = self._load_models(project)
+            shard_models = {
+                name: sql for name, sql in models.items() if name.startswith("quollio_stats_columns_shard_")
+            }
+            self.assertEqual(sorted(shard_models), sorted(dbt.get_stats_shard_models(dbt.MAX_STATS_SHARDS)))
+            for name, sql in shard_models.items():
+                self.assertEqual(re.search(r"shard_index=(\d+)", sql).group(1), name.rsplit("_", 1)[1])
+
+    def test_select_shard_models(self):
+        for project in ["snowflake", "redshift"]:
+            project_name, models = self._load_models(project)
+            for shard_count in range(1, dbt.MAX_STATS_SHARDS + 1):
+                selectors = ["quollio_stats_columns"] + dbt.get_stats_shard_models(shard_count)
+                selected = [
+                    name
+                    for name in models
+                    if any(is_selected_node([project_name, name], selector, False) for selector in selectors)
+                ]
+                self.assertEqual(len(selected), shard_count)
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+
+class _Config(dict):
+    def get(self, key, default=None):
+        return super().get(key, default)
+
+
+class _Relation:
+    @staticmethod
+    def create(identifier, schema, database, type):
+        return "{}.{}.{}".format(database, schema, identifier)
+
+
+class _Api:
+    Relation = _Relation
+
+
+class _Adapter:
+    def commit(self):
+        return ""
+
+
+class FakeRedshift:
+    """
+    Renders the Redshift `divided_view` materialization against in-memory view comments.
+    """
+
+    def __init__(self, columns, source_watermarks=None):
+        self.columns = columns
+        self.source_watermarks = source_watermarks or {}
+        self.view_comments = {}
+        self.stats_watermarks = {}
+        self.statements = []
+
+    def build(self, variables):
+        path = os.path.join(DBT_PROJECTS_DIR, "redshift", "macros", "materialization", "divided_view.sql")
+        with open(path) as f:
+            body = f.read().split("\n", 1)[1].rsplit("{%- endmaterialization -%}", 1)[0]
+        self.statements = []
+        self.granted = []
+        # MEMO: Tables come in order, but the columns of a table come in any order.
+        columns = sorted(self.columns, key=lambda column: (column[:3], random.random()))
+        context = dict(
+            model={"alias": "quollio_stats_columns", "name": "quollio_stats_columns"},
+            config=_Config(shard_index=0, stats_view_prefix="quollio_stats_columns"),
+            var=lambda name, default=None: variables.get(name, default),
+            run_hooks=lambda *args, **kwargs: "",
+            pre_hooks=[],
+            post_hooks=[],
+            ref=lambda name: name,
+            run_query=lambda sql: self._run_query(sql, columns),
+            statement=self._statement,
+            log=lambda msg, info=False: "",
+            api=_Api,
+            adapter=_Adapter(),
+            should_full_refresh=lambda: False,
+            should_revoke=lambda relation, full_refresh_mode: False,
+            apply_grants=lambda relation, grant_config, should_revoke: self.granted.append(relation),
+            get_replace_view_sql=lambda relation, sql: "create or replace view {} as {};".format(relation, sql),
+            local_md5=lambda s: hashlib.md5(s.encode("utf-8")).hexdigest(),
+            execute=True,
+            database="db",
+            schema="quollio",
+            target_relation=None,
+        )
+        context["return"] = lambda value: ""
+        Environment(extensions=["jinja2.ext.do"]).from_string(body).render(**context)
+
+    def _run_query(self, sql, columns):
+        if "is_bool" in sql:
+            return _Rows(columns)
+        if "pg_description" in sql:
+            return _Rows(list(self.view_comments.items()))
+        if "svv_table_info" in sql:
+            return _Rows([(*table.split("."), watermark) for table, watermark in self.source_watermarks.items()])
+        if "source_watermark FROM" in sql:
+            return _Rows([(*table.split("."), watermark) for table, watermark in self.stats_watermarks.items()])
+        deleted = re.search(r"db_name = '(\w+)' AND schema_name = '(\w+)' AND table_name = '(\w+)'", sql)
+        if sql.strip().startswith("DELETE") and deleted:
+            self.stats_watermarks.pop(".".join(deleted.groups()), None)
+        return _Rows([])
+
+    def _statement(self, name, caller):
+        sql = caller()
+        self.statements.append(sql)
+        for identifier, comment in re.findall(r"comment on view \S+\.(\S+) is '([^']+)';", sql):
+            self.view_comments[identifier] = comment
+        if "INSERT INTO" in sql:
+            table = re.findall(r"'(\w+)'::varchar as (?:db|schema|table)_name", sql)[:3]
+            self.stats_watermarks[".".join(table)] = re.search(r"'([^']*)'\s*, getdate\(\)", sql).group(1)
+        return ""
+
+    def created_views(self):
+        return [view for sql in self.statements for view in re.findall(r"create or replace view (\S+) as", sql)]
+
+    def profiled_tables(self):
+        return [
+            ".".join(re.findall(r"'(\w+)'::varchar as (?:db|schema|table)_name", sql)[:3])
+            for sql in self.statements
+            if "INSERT INTO" in sql
+        ]
+
+
+class TestRedshiftDividedView(unittest.TestCase):
+    columns = [
+        ("db", "public", "orders", column_name, False, True) for column_name in ["amount", "id", "status", "user_id"]
+    ] + [("db", "public", "users", column_name, False, False) for column_name in ["email", "id", "name"]]
+
+    def test_unchanged_views_are_skipped(self):
+        redshift = FakeRedshift(columns=self.columns)
+        redshift.build(variables={"aggregate_all": True})
+        self.assertEqual(
+            redshift.created_views(),
+            ["db.quollio.quollio_stats_columns_db_public_orders", "db.quollio.quollio_stats_columns_db_public_users"],
+        )
+        fingerprints = dict(redshift.view_comments)
+
+        for _ in range(3):
+            redshift.build(variables={"aggregate_all": True})
+            self.assertEqual(redshift.created_views(), [])
+            self.assertEqual(redshift.view_comments, fingerprints)
+
+    def test_grants_are_applied_to_skipped_views(self):
+        redshift = FakeRedshift(columns=self.columns)
+        redshift.build(variables={"aggregate_all": True})
+        redshift.build(variables={"aggregate_all": True})
+        self.assertEqual(redshift.created_views(), [])
+        self.assertEqual(
+            redshift.granted,
+            ["db.quollio.quollio_stats_columns_db_public_orders", "db.quollio.quollio_stats_columns_db_public_users"],
+        )
+
+    def test_changed_views_are_recreated(self):
+        redshift = FakeRedshift(columns=self.columns)
+        redshift.build(variables={"aggregate_all": True})
+        redshift.columns = self.columns + [("db", "public", "users", "created_at", False, True)]
+        redshift.build(variables={"aggregate_all": True})
+        self.assertEqual(redshift.created_views(), ["db.quollio.quollio_stats_columns_db_public_users"])
+
+    def test_unchanged_tables_keep_watermarks(self):
+        variables = {"aggregate_all": True, "stats_materialization": "table"}
+        redshift = FakeRedshift(
+            columns=self.columns, source_watermarks={"db.public.orders": "100/5", "db.public.users": "10/5"}
+        )
+        redshift.build(variables=variables)
+        self.assertEqual(redshift.profiled_tables(), ["db.public.orders", "db.public.users"])
+        watermarks = dict(redshift.stats_watermarks)
+
+        for _ in range(3):
+            redshift.build(variables=variables)
+            self.assertEqual(redshift.profiled_tables(), [])
+            self.assertEqual(redshift.stats_watermarks, watermarks)
+
+        redshift.source_watermarks["db.public.orders"] = "120/5"
+        redshift.build(variables=variables)
+        self.assertEqual(redshift.profiled_tables(), ["db.public.orders"])
+        self.assertEqual(redshift.stats_watermarks["db.public.users"], watermarks["db.public.users"])
+
+
+if __name__ == "__main__":
+    unittest.main()
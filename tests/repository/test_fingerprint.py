@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from quollio_core.repository.fingerprint import FingerprintStore, gen_fingerprint
+
+
+class TestFingerprintStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "fingerprints.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_record_and_is_unchanged(self):
+        fingerprint = gen_fingerprint({"upstream": ["tbl-1", "tbl-2"]})
+        with FingerprintStore(self.path) as store:
+            self.assertFalse(store.is_unchanged(kind="lineage", global_id="tbl-0", fingerprint=fingerprint))
+            store.record(kind="lineage", global_id="tbl-0", fingerprint=fingerprint)
+            self.assertTrue(store.is_unchanged(kind="lineage", global_id="tbl-0", fingerprint=fingerprint))
+            # the same global id of another kind is not affected.
+            self.assertFalse(store.is_unchanged(kind="stats", global_id="tbl-0", fingerprint=fingerprint))
+
+        # fingerprints are persisted after the store is closed.
+        with FingerprintStore(self.path) as store:
+            self.assertEqual(store.get(kind="lineage", global_id="tbl-0"), fingerprint)
+            new_fingerprint = gen_fingerprint({"upstream": ["tbl-1"]})
+            store.record(kind="lineage", global_id="tbl-0", fingerprint=new_fingerprint)
+            self.assertFalse(store.is_unchanged(kind="lineage", global_id="tbl-0", fingerprint=fingerprint))
+
+    def test_gen_fingerprint(self):
+        test_cases = [
+            {
+                "name": "upstream order is ignored",
+                "input": ({"upstream": ["tbl-1", "tbl-2"]}, {"upstream": ["tbl-2", "tbl-1"]}),
+                "expect": True,
+            },
+            {
+                "name": "order of other lists is kept",
+                "input": ({"column_stats": {"mode": ["a", "b"]}}, {"column_stats": {"mode": ["b", "a"]}}),
+                "expect": False,
+            },
+            {
+                "name": "key order is ignored",
+                "input": ({"column_stats": {"max": "1", "min": "0"}}, {"column_stats": {"min": "0", "max": "1"}}),
+                "expect": True,
+            },
+            {
+                "name": "value changes",
+                "input": ({"column_stats": {"max": "1", "min": "0"}}, {"column_stats": {"max": "2", "min": "0"}}),
+                "expect": False,
+            },
+        ]
+        for test_case in test_cases:
+            left, right = test_case["input"]
+            self.assertEqual(gen_fingerprint(left) == gen_fingerprint(right), test_case["expect"], test_case["name"])
+
+
+if __name__ == "__main__":
+    unittest.main()
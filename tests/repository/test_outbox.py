@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from quollio_core.repository.outbox import Outbox
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "journal.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resume_unfinished_run(self):
+        with Outbox(self.path, command="snowflake:load_stats") as outbox:
+            run_id = outbox.run_id
+            outbox.append(kind="stats", global_id="clmn-1", payload={"column_stats": {"max": "1"}})
+            outbox.append(kind="stats", global_id="clmn-2", payload={"column_stats": {"max": "2"}})
+            outbox.ack(kind="stats", global_id="clmn-1")
+            outbox.mark_unit_done(unit="db.schema.table")
+
+        # the crashed run is resumed with its acknowledged assets and finished units.
+        with Outbox(self.path, command="snowflake:load_stats", resume=True) as outbox:
+            self.assertEqual(outbox.run_id, run_id)
+            self.assertTrue(outbox.is_acked(kind="stats", global_id="clmn-1"))
+            self.assertFalse(outbox.is_acked(kind="stats", global_id="clmn-2"))
+            self.assertTrue(outbox.is_unit_done(unit="db.schema.table"))
+            outbox.append(kind="stats", global_id="clmn-2", payload={"column_stats": {"max": "2"}})
+            outbox.ack(kind="stats", global_id="clmn-2")
+            self.assertTrue(outbox.finish())
+
+        # a finished run is never resumed.
+        with Outbox(self.path, command="snowflake:load_stats", resume=True) as outbox:
+            self.assertNotEqual(outbox.run_id, run_id)
+            self.assertFalse(outbox.is_acked(kind="stats", global_id="clmn-1"))
+            self.assertFalse(outbox.is_unit_done(unit="db.schema.table"))
+
+    def test_start_new_run_without_resume(self):
+        with Outbox(self.path, command="redshift:load_stats") as outbox:
+            run_id = outbox.run_id
+            outbox.append(kind="stats", global_id="clmn-1", payload={})
+            outbox.ack(kind="stats", global_id="clmn-1")
+
+        with Outbox(self.path, command="redshift:load_stats") as outbox:
+            self.assertNotEqual(outbox.run_id, run_id)
+            self.assertFalse(outbox.is_acked(kind="stats", global_id="clmn-1"))
+
+        # the run of another command is not resumed.
+        with Outbox(self.path, command="snowflake:load_stats", resume=True) as outbox:
+            self.assertNotEqual(outbox.run_id, run_id)
+
+    def test_keep_run_with_failed_assets(self):
+        with Outbox(self.path, command="bigquery:load_stats") as outbox:
+            run_id = outbox.run_id
+            outbox.append(kind="stats", global_id="clmn-1", payload={})
+            outbox.append(kind="stats", global_id="clmn-2", payload={})
+            outbox.ack(kind="stats", global_id="clmn-1")
+            # clmn-2 was not acknowledged, so the run stays open to be resumed.
+            self.assertFalse(outbox.finish())
+
+        with Outbox(self.path, command="bigquery:load_stats", resume=True) as outbox:
+            self.assertEqual(outbox.run_id, run_id)
+            self.assertTrue(outbox.is_acked(kind="stats", global_id="clmn-1"))
+            self.assertFalse(outbox.is_acked(kind="stats", global_id="clmn-2"))
+
+    def test_prune_stale_runs(self):
+        for _ in range(3):
+            with Outbox(self.path, command="databricks:load_stats") as outbox:
+                outbox.append(kind="stats", global_id="clmn-1", payload={})
+        with Outbox(self.path, command="snowflake:load_stats") as outbox:
+            outbox.append(kind="stats", global_id="clmn-1", payload={})
+
+        with Outbox(self.path, command="databricks:load_stats") as outbox:
+            runs = outbox.conn.execute("SELECT command, COUNT(*) FROM runs GROUP BY command").fetchall()
+            self.assertEqual(dict(runs), {"databricks:load_stats": 1, "snowflake:load_stats": 1})
+            run_ids = outbox.conn.execute("SELECT DISTINCT run_id FROM outbox").fetchall()
+            self.assertEqual(len(run_ids), 1)
+
+    def test_commit_interval(self):
+        with Outbox(self.path, command="snowflake:load_stats", commit_interval=2) as outbox:
+            outbox.append(kind="stats", global_id="clmn-1", payload={})
+            self.assertEqual(outbox._uncommitted, 1)
+            outbox.ack(kind="stats", global_id="clmn-1")
+            self.assertEqual(outbox._uncommitted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+from quollio_core.repository.parse_cache import ParseCache
+
+
+class TestParseCache(unittest.TestCase):
+    def test_memory_lru(self):
+        cache = ParseCache(max_memory_items=2)
+        cache.put(key="a", value={"src": [], "dest": ["db", "schema", "a"]})
+        cache.put(key="b", value={"src": [], "dest": ["db", "schema", "b"]})
+        cache.get(key="a")
+        cache.put(key="c", value={"src": [], "dest": ["db", "schema", "c"]})
+
+        # b is evicted because a was used more recently.
+        self.assertIsNone(cache.get(key="b"))
+        self.assertEqual(cache.get(key="a"), {"src": [], "dest": ["db", "schema", "a"]})
+        self.assertEqual(cache.get(key="c"), {"src": [], "dest": ["db", "schema", "c"]})
+        cache.close()
+
+    def test_persisted_results(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "parse_cache.db")
+            with ParseCache(path=path, max_memory_items=1) as cache:
+                cache.put(key="a", value={"src": [["db", "schema", "src"]], "dest": ["db", "schema", "a"]})
+                cache.put(key="b", value={"src": [], "dest": ["db", "schema", "b"]})
+                # a is evicted from memory but still found on disk.
+                self.assertEqual(cache.get(key="a"), {"src": [["db", "schema", "src"]], "dest": ["db", "schema", "a"]})
+
+            with ParseCache(path=path) as cache:
+                self.assertEqual(cache.get(key="b"), {"src": [], "dest": ["db", "schema", "b"]})
+                self.assertIsNone(cache.get(key="c"))
+                self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
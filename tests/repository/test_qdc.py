@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 import unittest
 from unittest.mock import patch
 
@@ -7,7 +8,15 @@ import responses
 
 sys.path.insert(0, os.path.abspath("../.."))
 
-from quollio_core.repository.qdc import QDCExternalAPIClient, initialize_qdc_client, is_valid_domain
+from quollio_core.repository.fingerprint import FingerprintStore
+from quollio_core.repository.outbox import Outbox
+from quollio_core.repository.qdc import (
+    QDCExternalAPIClient,
+    RateLimiter,
+    initialize_qdc_client,
+    is_valid_domain,
+    parse_retry_after,
+)
 
 
 class TestQDCExternalAPIClient(unittest.TestCase):
@@ -212,6 +221,79 @@ class TestQDCExternalAPIClient(unittest.TestCase):
             self.assertEqual(test_case["expect"]["execution_count"], len(responses.calls))
             responses.reset()
 
+    @responses.activate
+    @patch("quollio_core.repository.qdc.QDCExternalAPIClient._refresh_token_if_expired", return_value=None)
+    def test_update_lineage_by_ids(self, mock_refresh_token_if_expired):
+        test_cases = [
+            {"name": "sequential", "max_workers": 1},
+            {"name": "concurrent", "max_workers": 4},
+        ]
+        global_ids = ["tbl-{}".format(i) for i in range(10)]
+        for global_id in global_ids:
+            status = 404 if global_id == "tbl-3" else 200
+            responses.add(
+                responses.PUT,
+                "{base_url}/v2/lineage/{global_id}".format(base_url=self.client.base_url, global_id=global_id),
+                json={},
+                status=status,
+            )
+        for test_case in test_cases:
+            self.client.max_workers = test_case["max_workers"]
+            self.client.rate_limiter = RateLimiter(rate=1000)
+            payloads = ((global_id, {"upstream": ["tbl-upstream"]}) for global_id in global_ids)
+            res = dict(self.client.update_lineage_by_ids(payloads))
+            expect = {global_id: 200 for global_id in global_ids}
+            expect["tbl-3"] = None
+            self.assertEqual(res, expect, test_case["name"])
+
+    @responses.activate
+    @patch("quollio_core.repository.qdc.QDCExternalAPIClient._refresh_token_if_expired", return_value=None)
+    def test_update_stats_by_ids_skips_unchanged(self, mock_refresh_token_if_expired):
+        self.client.rate_limiter = RateLimiter(rate=1000)
+        for global_id, status in [("clmn-1", 200), ("clmn-2", 400)]:
+            responses.add(
+                responses.PUT,
+                "{base_url}/v2/assets/{global_id}/stats".format(base_url=self.client.base_url, global_id=global_id),
+                json={},
+                status=status,
+            )
+        payloads = [("clmn-1", {"column_stats": {"max": "1"}}), ("clmn-2", {"column_stats": {"max": "2"}})]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with FingerprintStore(os.path.join(tmp_dir, "fingerprints.db")) as store:
+                self.client.fingerprint_store = store
+                res = dict(self.client.update_stats_by_ids(payloads))
+                self.assertEqual(res, {"clmn-1": 200, "clmn-2": None})
+
+                # clmn-1 is skipped because it was ingested, but clmn-2 is sent again because it failed.
+                res = dict(self.client.update_stats_by_ids(payloads))
+                self.assertEqual(res, {"clmn-2": None})
+                self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    @patch("quollio_core.repository.qdc.QDCExternalAPIClient._refresh_token_if_expired", return_value=None)
+    def test_update_stats_by_ids_skips_acked(self, mock_refresh_token_if_expired):
+        self.client.rate_limiter = RateLimiter(rate=1000)
+        for global_id in ["clmn-1", "clmn-2"]:
+            responses.add(
+                responses.PUT,
+                "{base_url}/v2/assets/{global_id}/stats".format(base_url=self.client.base_url, global_id=global_id),
+                json={},
+                status=200,
+            )
+        payloads = [("clmn-1", {"column_stats": {"max": "1"}}), ("clmn-2", {"column_stats": {"max": "2"}})]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "journal.db")
+            with Outbox(path, command="snowflake:load_stats") as outbox:
+                outbox.append(kind="stats", global_id="clmn-1", payload=payloads[0][1])
+                outbox.ack(kind="stats", global_id="clmn-1")
+
+            with Outbox(path, command="snowflake:load_stats", resume=True) as outbox:
+                self.client.outbox = outbox
+                res = dict(self.client.update_stats_by_ids(payloads))
+                self.assertEqual(res, {"clmn-2": 200})
+                self.assertTrue(outbox.is_acked(kind="stats", global_id="clmn-2"))
+                self.assertEqual(len(responses.calls), 1)
+
     @patch("quollio_core.repository.qdc.QDCExternalAPIClient._get_auth_token", return_value="fake_token")
     def test_initialize_qdc_client(self, mock_get_auth_token):
         res = initialize_qdc_client(
@@ -237,5 +319,37 @@ class TestQDCExternalAPIClient(unittest.TestCase):
             self.assertEqual(res, test_case["expect"])
 
 
+class TestRateLimiter(unittest.TestCase):
+    def test_throttle_and_recover(self):
+        rate_limiter = RateLimiter(rate=4.0, min_rate=1.0, recovery_step=0.5)
+        rate_limiter.throttle()
+        self.assertEqual(rate_limiter.rate, 2.0)
+        rate_limiter.throttle()
+        rate_limiter.throttle()
+        self.assertEqual(rate_limiter.rate, 1.0)
+        for _ in range(10):
+            rate_limiter.recover()
+        self.assertEqual(rate_limiter.rate, 4.0)
+
+    @patch("time.sleep")
+    def test_acquire_waits_for_retry_after(self, mock_sleep):
+        rate_limiter = RateLimiter(rate=1000.0)
+        rate_limiter.throttle(retry_after=30)
+        mock_sleep.side_effect = lambda _: setattr(rate_limiter, "_blocked_until", 0.0)
+        rate_limiter.acquire()
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 30, delta=1)
+
+    def test_parse_retry_after(self):
+        test_cases = [
+            {"input": None, "expect": None},
+            {"input": "", "expect": None},
+            {"input": "120", "expect": 120.0},
+            {"input": "Wed, 21 Oct 2015 07:28:00 GMT", "expect": 0.0},
+            {"input": "invalid", "expect": None},
+        ]
+        for test_case in test_cases:
+            self.assertEqual(parse_retry_after(test_case["input"]), test_case["expect"])
+
+
 if __name__ == "__main__":
     unittest.main()
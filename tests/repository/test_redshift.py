@@ -1,10 +1,11 @@
 import os
 import sys
 import unittest
+from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.abspath("../.."))
 
-from quollio_core.repository.redshift import RedshiftConnectionConfig, RedshiftErrorCode
+from quollio_core.repository.redshift import RedshiftConnectionConfig, RedshiftErrorCode, RedshiftQueryExecutor
 
 
 class TestRedshiftErrorCode(unittest.TestCase):
@@ -114,5 +115,33 @@ class TestRedshiftConnectionConfig(unittest.TestCase):
             self.assertEqual(res.as_dict(), test_case["expect"])
 
 
+class TestRedshiftQueryExecutor(unittest.TestCase):
+    @patch("quollio_core.repository.redshift.connect")
+    def test_iter_record_batches(self, mock_connect):
+        cur = MagicMock()
+        cur.description = [("table_name",), ("row_count",)]
+        cur.fetchmany.side_effect = [[("a", 1), ("b", None)], [("c", 3)], []]
+        mock_connect.return_value.cursor.return_value.__enter__.return_value = cur
+        config = RedshiftConnectionConfig(
+            host="host",
+            build_user="build_user",
+            query_user="query_user",
+            build_password="build_password",
+            query_password="query_password",
+            database="db",
+            schema="schema",
+        )
+        with RedshiftQueryExecutor(config) as executor:
+            batches = list(executor.iter_record_batches("SELECT 1", batch_size=2))
+
+        cur.fetchmany.assert_called_with(2)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(batches[0].schema.names, ["table_name", "row_count"])
+        self.assertEqual(
+            batches[0].to_pylist(), [{"table_name": "a", "row_count": 1}, {"table_name": "b", "row_count": None}]
+        )
+        self.assertEqual(batches[1].to_pylist(), [{"table_name": "c", "row_count": 3}])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,9 @@
 import os
 import sys
 import unittest
+from unittest.mock import patch
+
+from quollio_core.repository.snowflake import SnowflakeConnectionConfig, SnowflakeQueryExecutor
 
 sys.path.insert(0, os.path.abspath("../.."))
 
@@ -34,3 +37,74 @@ quollio_intelligence_snowflake:
             os.remove(self.profile_file)
         if os.path.exists(self.template_file):
             os.remove(self.template_file)
+
+
+class TestSnowflakeQueryExecutor(unittest.TestCase):
+    @patch("quollio_core.repository.snowflake.time.sleep", return_value=None)
+    @patch("quollio_core.repository.snowflake.connect")
+    def test_get_query_results_concurrently(self, mock_connect, mock_sleep):
+        mock_conn = mock_connect.return_value
+        cursor = mock_conn.cursor.return_value.__enter__.return_value
+        submitted = []
+
+        def execute_async(query):
+            submitted.append(query)
+            cursor.sfqid = "qid-{}".format(query)
+
+        cursor.execute_async.side_effect = execute_async
+        # qid-q1 is still running at the first poll, so qid-q2 finishes first.
+        polls = {"qid-q1": [True, False], "qid-q2": [False], "qid-q3": [False]}
+        mock_conn.get_query_status.side_effect = lambda query_id: query_id
+        mock_conn.is_still_running.side_effect = lambda query_id: polls[query_id].pop(0)
+        cursor.fetchall.side_effect = lambda: [{"QUERY_ID": cursor.get_results_from_sfqid.call_args[0][0]}]
+
+        config = SnowflakeConnectionConfig(
+            account_id="account",
+            account_user="user",
+            account_password="password",
+            account_build_role="build",
+            account_query_role="query",
+            account_warehouse="warehouse",
+            account_database="db",
+            account_schema="schema",
+        )
+        with SnowflakeQueryExecutor(config) as executor:
+            res = list(
+                executor.get_query_results_concurrently(
+                    queries={"tbl1": "q1", "tbl2": "q2", "tbl3": "q3"}, concurrency=2
+                )
+            )
+
+        self.assertEqual(
+            res,
+            [
+                ("tbl2", [{"QUERY_ID": "qid-q2"}], None),
+                ("tbl1", [{"QUERY_ID": "qid-q1"}], None),
+                ("tbl3", [{"QUERY_ID": "qid-q3"}], None),
+            ],
+        )
+        self.assertEqual(submitted, ["q1", "q2", "q3"])
+        mock_sleep.assert_not_called()
+
+    @patch("quollio_core.repository.snowflake.connect")
+    def test_iter_query_results(self, mock_connect):
+        cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchmany.side_effect = [[{"ID": 1}, {"ID": 2}], [{"ID": 3}], []]
+        config = SnowflakeConnectionConfig(
+            account_id="account",
+            account_user="user",
+            account_password="password",
+            account_build_role="build",
+            account_query_role="query",
+            account_warehouse="warehouse",
+            account_database="db",
+            account_schema="schema",
+        )
+        with SnowflakeQueryExecutor(config) as executor:
+            res = list(executor.iter_query_results(query="SELECT 1", chunk_size=2))
+            self.assertEqual(res, [([{"ID": 1}, {"ID": 2}], None), ([{"ID": 3}], None)])
+            cursor.fetchmany.assert_called_with(2)
+
+            err = Exception("failed")
+            cursor.execute.side_effect = err
+            self.assertEqual(list(executor.iter_query_results(query="SELECT 1")), [([], err)])
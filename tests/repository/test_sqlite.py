@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from quollio_core.repository.sqlite import SQLiteStore
+
+
+class KeyValueStore(SQLiteStore):
+    schema = "CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v TEXT NOT NULL);"
+
+    def put(self, k: str, v: str) -> None:
+        with self._lock:
+            self._write("INSERT INTO kv (k, v) VALUES (?, ?)", (k, v))
+
+
+class TestSQLiteStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "store.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _count(self) -> int:
+        with sqlite3.connect(self.path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+    def test_commit_interval(self):
+        with KeyValueStore(self.path, commit_interval=2) as store:
+            store.put("a", "1")
+            self.assertEqual(self._count(), 0)
+            store.put("b", "2")
+            self.assertEqual(self._count(), 2)
+            store.put("c", "3")
+            self.assertEqual(self._count(), 2)
+        # the rest is committed when the store is closed.
+        self.assertEqual(self._count(), 3)
+        self.assertIsNone(store.conn)
+
+    def test_without_path(self):
+        with KeyValueStore(None) as store:
+            self.assertIsNone(store.conn)
+
+
+if __name__ == "__main__":
+    unittest.main()